@@ -1,11 +1,23 @@
 from __future__ import annotations
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, url_for
 import sqlalchemy as sa
 
 from app import db
 from app.models import Location, SavedRoute, User
-from app.nsga_core import get_optimized_routes, recalculate_route_geometry
+from app.nsga_core import recalculate_route_geometry
+from app.distance_matrix import get_distance_matrix
+from app.route_order import RouteOrderError, exact_order
+from app.route_cache import get_cached_optimized_routes, get_route_cache, get_single_flight
+from app.optimize_jobs import QueueFullError, get_job_manager
+from app.optimize_stream import stream_optimization
+from app.nsga_eval import memo_stats
+from app.candidate_pool import SearchAreaError, parse_search_area
+from app.search_budget import BudgetError, parse_budget
+from app.geometry_cache import get_geometry_cache, get_leg_cache
+from app.population_cache import get_population_cache, optimizer_client_token
+from app.provider_client import provider_stats
+from app.polyline import GeometryFormatError, parse_geometry_format
 from app.api_utils import (
     generate_api_token,
     get_api_user,
@@ -90,13 +102,98 @@ def api_optimize_routes():
     user_preferences = data.get("preferences", [])
     required_stops = data.get("required_stops", [])
     travel_mode = data.get("travel_mode", "walking")
+    try:
+        search_area = parse_search_area(data)
+        budget = parse_budget(data)
+        geometry_format = parse_geometry_format(data)
+    except (SearchAreaError, BudgetError, GeometryFormatError) as exc:
+        return jsonify({"error": str(exc)}), 400
 
+    run_info = {}
     try:
-        optimized_routes = get_optimized_routes(user_preferences, required_stops, travel_mode)
+        optimized_routes = get_cached_optimized_routes(user_preferences, required_stops, travel_mode, run_info=run_info,
+                                                       search_area=search_area, client_token=optimizer_client_token(), budget=budget)
     except Exception as exc:
         return jsonify({"error": "route optimization failed", "detail": str(exc)}), 500
 
-    return jsonify({"routes": optimized_routes})
+    return jsonify({"routes": geometry_format.format_routes(optimized_routes), "optimization": run_info})
+
+
+@api_bp.post("/routes/optimize/stream")
+def api_optimize_routes_stream():
+    data = request.get_json() or {}
+    if "preferences" not in data:
+        return jsonify({"error": "preferences not provided"}), 400
+    try:
+        search_area = parse_search_area(data)
+        budget = parse_budget(data)
+    except (SearchAreaError, BudgetError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    try:
+        events = stream_optimization(
+            data.get("preferences", []),
+            data.get("required_stops", []),
+            data.get("travel_mode", "walking"),
+            search_area,
+            optimizer_client_token(),
+            budget,
+        )
+    except QueueFullError as exc:
+        return jsonify({"error": "optimizer is busy, try again shortly", "detail": str(exc)}), 503
+    return Response(events, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@api_bp.post("/routes/optimize/jobs")
+def api_create_optimize_job():
+    data = request.get_json() or {}
+    if "preferences" not in data:
+        return jsonify({"error": "preferences not provided"}), 400
+
+    try:
+        job = get_job_manager().submit(
+            data.get("preferences", []),
+            data.get("required_stops", []),
+            data.get("travel_mode", "walking"),
+            parse_search_area(data),
+            optimizer_client_token(),
+            parse_budget(data),
+        )
+    except (SearchAreaError, BudgetError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    except QueueFullError as exc:
+        return jsonify({"error": "optimizer is busy, try again shortly", "detail": str(exc)}), 503
+
+    response = jsonify({"job": job.to_dict()})
+    response.status_code = 202
+    response.headers["Location"] = url_for("api_v1.api_optimize_job_detail", job_id=job.id)
+    return response
+
+
+@api_bp.get("/routes/optimize/jobs/<job_id>")
+def api_optimize_job_detail(job_id: str):
+    job = get_job_manager().get(job_id)
+    if not job:
+        return jsonify({"error": "job not found or expired"}), 404
+    return jsonify({"job": job.to_dict()})
+
+
+@api_bp.get("/optimizer/stats")
+def api_optimizer_stats():
+    route_cache = get_route_cache()
+    return jsonify({
+        "route_cache": route_cache.stats() if route_cache else None,
+        "single_flight": get_single_flight().stats(),
+        "jobs": get_job_manager().stats(),
+        "fitness_memo": memo_stats(),
+        "population_cache": get_population_cache().stats() if get_population_cache() else None,
+        "geometry_cache": get_geometry_cache().stats() if get_geometry_cache() else None,
+        "leg_cache": get_leg_cache().stats() if get_leg_cache() else None,
+        "providers": provider_stats(),
+    })
 
 
 @api_bp.post("/routes/recalculate")
@@ -107,13 +204,65 @@ def api_recalculate_route():
 
     location_ids = data.get("location_ids") or []
     travel_mode = data.get("travel_mode", "walking")
+    try:
+        geometry_format = parse_geometry_format(data)
+    except GeometryFormatError as exc:
+        return jsonify({"error": str(exc)}), 400
 
     try:
         route_details = recalculate_route_geometry(location_ids, travel_mode)
     except Exception as exc:
         return jsonify({"error": "route recalculation failed", "detail": str(exc)}), 500
 
-    return jsonify(route_details)
+    return jsonify(geometry_format.format_route(route_details) if route_details else route_details)
+
+
+@api_bp.post("/routes/reorder")
+def api_reorder_route():
+    data = request.get_json() or {}
+    if "location_ids" not in data:
+        return jsonify({"error": "location_ids not provided"}), 400
+
+    try:
+        location_ids = [int(loc_id) for loc_id in data.get("location_ids") or []]
+        start_id = int(data["start_id"]) if data.get("start_id") is not None else None
+        end_id = int(data["end_id"]) if data.get("end_id") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "location_ids, start_id and end_id must be integers"}), 400
+    travel_mode = data.get("travel_mode", "walking")
+    try:
+        geometry_format = parse_geometry_format(data)
+    except GeometryFormatError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if len(set(location_ids)) != len(location_ids):
+        return jsonify({"error": "location_ids must not repeat"}), 400
+    for fixed in (start_id, end_id):
+        if fixed is not None and fixed not in location_ids:
+            return jsonify({"error": f"stop {fixed} is not in location_ids"}), 400
+
+    distance_matrix = get_distance_matrix()
+    unknown = [loc_id for loc_id in location_ids if loc_id not in distance_matrix.index]
+    if unknown:
+        return jsonify({"error": "unknown locations", "location_ids": unknown}), 404
+
+    try:
+        ordered_ids, distance = exact_order(location_ids, distance_matrix, start_id, end_id)
+    except RouteOrderError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    try:
+        route_details = recalculate_route_geometry(ordered_ids, travel_mode)
+    except Exception as exc:
+        return jsonify({"error": "route recalculation failed", "detail": str(exc)}), 500
+
+    return jsonify({
+        "location_ids": ordered_ids,
+        "straight_line_distance": {
+            "original": distance_matrix.route_distance(location_ids) if len(location_ids) > 1 else 0.0,
+            "optimized": distance,
+        },
+        "route": geometry_format.format_route(route_details) if route_details else route_details,
+    })
 
 
 @api_bp.post("/routes/save")
@@ -0,0 +1,110 @@
+import os
+import numpy as np
+from app.distance_matrix import EARTH_RADIUS_M
+
+# --- Candidate preselection configuration ---
+preselect_by_category = os.environ.get('NSGA_CANDIDATE_CATEGORIES', '1') != '0' #only search locations in the user's preferred categories (plus required stops)
+default_radius_m = float(os.environ.get('NSGA_CANDIDATE_RADIUS_M', '0')) #radius around the start point / required stops used when a request gives no area, 0 = no area limit
+candidate_limit = int(os.environ.get('NSGA_CANDIDATE_LIMIT', '0')) #largest candidate pool handed to the optimiser, 0 = no cap
+min_candidates = int(os.environ.get('NSGA_MIN_CANDIDATES', '12')) #filters are relaxed (category first, then area) when they leave fewer optional locations than this
+candidate_overlap = int(os.environ.get('NSGA_CANDIDATE_OVERLAP', '16')) #routes of a full population a candidate may be in on average before the category filter is relaxed
+
+METRES_PER_DEGREE = np.pi * EARTH_RADIUS_M / 180
+
+
+class SearchAreaError(ValueError): #Raised for a malformed start / radius_m / bbox in an optimise request
+    pass
+
+
+def _coordinate(value, name):
+    if isinstance(value, dict):
+        value = (value.get('latitude', value.get('lat')), value.get('longitude', value.get('lng', value.get('lon'))))
+    try:
+        latitude, longitude = (float(v) for v in value)
+    except (TypeError, ValueError):
+        raise SearchAreaError(f"{name} must be a latitude/longitude pair")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise SearchAreaError(f"{name} is outside the valid latitude/longitude range")
+    return latitude, longitude
+
+
+def candidate_floor(population_size, max_length): #Fewest optional locations a category-filtered pool may hold - smaller pools make the population collapse onto a few routes
+    return max(min_candidates, population_size * max_length // max(candidate_overlap, 1))
+
+
+def parse_search_area(data): #Reads the optional start, radius_m and bbox fields of an optimise request body; None when none are given
+    start, radius_m, bbox = data.get('start'), data.get('radius_m'), data.get('bbox')
+    if start is None and radius_m is None and bbox is None:
+        return None
+    area = {}
+    if start is not None:
+        area['start'] = list(_coordinate(start, 'start'))
+    if radius_m is not None:
+        try:
+            area['radius_m'] = float(radius_m)
+        except (TypeError, ValueError):
+            raise SearchAreaError("radius_m must be a number")
+        if area['radius_m'] <= 0:
+            raise SearchAreaError("radius_m must be positive")
+    if bbox is not None:
+        try:
+            south, west, north, east = (float(v) for v in bbox)
+        except (TypeError, ValueError):
+            raise SearchAreaError("bbox must be [south, west, north, east]")
+        if south > north or west > east:
+            raise SearchAreaError("bbox must be [south, west, north, east] with south <= north and west <= east")
+        area['bbox'] = [south, west, north, east]
+    return area
+
+
+def radius_bbox(anchors, radius_m): #[south, west, north, east] enclosing a circle of radius_m around every anchor, for the SQL prefilter
+    latitudes = np.array([lat for lat, _ in anchors])
+    longitudes = np.array([lon for _, lon in anchors])
+    d_lat = radius_m / METRES_PER_DEGREE
+    d_lon = radius_m / (METRES_PER_DEGREE * np.maximum(np.cos(np.radians(latitudes)), 1e-6))
+    return [
+        float((latitudes - d_lat).min()), float((longitudes - d_lon).min()),
+        float((latitudes + d_lat).max()), float((longitudes + d_lon).max()),
+    ]
+
+
+def distance_to_anchors(locations_dict, location_ids, anchors): #Haversine metres from each location to its closest anchor
+    lat = np.radians([locations_dict[loc_id]['latitude'] for loc_id in location_ids])[:, None]
+    lon = np.radians([locations_dict[loc_id]['longitude'] for loc_id in location_ids])[:, None]
+    anchor_lat = np.radians([a[0] for a in anchors])[None, :]
+    anchor_lon = np.radians([a[1] for a in anchors])[None, :]
+    a = np.sin((anchor_lat - lat) / 2) ** 2 + np.cos(lat) * np.cos(anchor_lat) * np.sin((anchor_lon - lon) / 2) ** 2
+    return (2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))).min(axis=1)
+
+
+def narrow_candidates(locations_dict, required_stops, anchors, radius_m=None, limit=0, user_preferences=()):
+    """
+    Drops locations further than radius_m from every anchor, then caps the
+    pool at `limit` locations, keeping the ones closest to the anchors (or,
+    without anchors, preferred categories and the best sentiment first).
+    Required stops are always kept.
+    """
+    required = set(required_stops)
+    optional = [loc_id for loc_id in locations_dict if loc_id not in required]
+    distances = distance_to_anchors(locations_dict, optional, anchors) if anchors and optional else None
+
+    if radius_m and distances is not None:
+        inside = distances <= radius_m
+        optional = [loc_id for loc_id, keep in zip(optional, inside) if keep]
+        distances = distances[inside]
+
+    room = limit - len(required)
+    if limit > 0 and len(optional) > max(room, 0):
+        if distances is not None:
+            order = np.lexsort((np.asarray(optional), distances))
+        else:
+            preferred = set(int(p) for p in user_preferences)
+            order = sorted(range(len(optional)), key=lambda i: (
+                locations_dict[optional[i]]['category_id'] not in preferred,
+                -(locations_dict[optional[i]].get('sentiment') or 0),
+                optional[i],
+            ))
+        optional = [optional[i] for i in order[:max(room, 0)]]
+
+    keep = required.union(optional)
+    return {loc_id: loc for loc_id, loc in locations_dict.items() if loc_id in keep}
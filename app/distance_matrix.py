@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+import sqlalchemy as sa
+from app import db
+from app.models import Location
+
+EARTH_RADIUS_M = 6371008.8 #mean Earth radius in metres
+matrix_block_rows = 512 #rows computed at once while building a matrix - float64 temporaries stay block_rows x N instead of N x N
+
+_local_version = 0 #bumped by add_location so this worker rebuilds straight away
+_cached_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def bump_location_version(): #Called whenever a location is inserted so the next request rebuilds the matrix
+    global _local_version
+    with _matrix_lock:
+        _local_version += 1
+
+
+def get_location_version(): #Cheap fingerprint of the Location table - row count and highest id change whenever any worker inserts a row, the id-weighted coordinate sums when one is moved
+    count, max_id, latitude_sum, longitude_sum = db.session.execute(sa.select(
+        sa.func.count(Location.id), sa.func.max(Location.id),
+        sa.func.sum(Location.id * Location.latitude), sa.func.sum(Location.id * Location.longitude),
+    )).one()
+    return (count, max_id or 0, float(latitude_sum or 0), float(longitude_sum or 0), _local_version)
+
+
+def haversine_matrix(latitudes, longitudes, block_rows=None): #Great-circle distance in metres between every pair of points, as an N x N float32 array built block_rows rows at a time
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    block_rows = max(block_rows or matrix_block_rows, 1)
+    matrix = np.empty((len(lat), len(lat)), dtype=np.float32)
+    for start in range(0, len(lat), block_rows):
+        stop = start + block_rows
+        d_lat = lat[start:stop, None] - lat[None, :]
+        d_lon = lon[start:stop, None] - lon[None, :]
+        a = np.sin(d_lat / 2) ** 2 + cos_lat[start:stop, None] * cos_lat[None, :] * np.sin(d_lon / 2) ** 2
+        matrix[start:stop] = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return matrix
+
+
+class LocationDistanceMatrix:
+    """
+    Pairwise haversine distances for every row of the Location table.
+
+    Built once per location-set version; optimisation runs look distances up
+    by location id instead of recomputing the geometry on every evaluation.
+    """
+
+    def __init__(self, location_ids, latitudes, longitudes, version=None):
+        self.location_ids = list(location_ids)
+        self.index = {loc_id: i for i, loc_id in enumerate(self.location_ids)} #location id -> matrix row
+        self.matrix = haversine_matrix(latitudes, longitudes)
+        self.version = version
+
+    def __len__(self):
+        return len(self.location_ids)
+
+    def rows(self, location_ids): #Matrix rows for a list of location ids, in the same order
+        return np.fromiter((self.index[loc_id] for loc_id in location_ids), dtype=np.int64, count=len(location_ids))
+
+    def distance(self, from_id, to_id):
+        return float(self.matrix[self.index[from_id], self.index[to_id]])
+
+    def route_distance(self, location_ids): #Total length in metres of visiting the locations in order
+        if len(location_ids) < 2:
+            return float('inf')
+        rows = self.rows(location_ids)
+        return float(self.matrix[rows[:-1], rows[1:]].sum(dtype=np.float64))
+
+
+def get_distance_matrix(): #Returns the cached matrix, rebuilding it lazily when the location set has changed
+    global _cached_matrix
+    version = get_location_version()
+    cached = _cached_matrix
+    if cached is not None and cached.version == version:
+        return cached
+
+    with _matrix_lock:
+        if _cached_matrix is not None and _cached_matrix.version == version: #another thread rebuilt it while we waited
+            return _cached_matrix
+        rows = db.session.execute(
+            sa.select(Location.id, Location.latitude, Location.longitude).order_by(Location.id)
+        ).all()
+        _cached_matrix = LocationDistanceMatrix(
+            [row.id for row in rows],
+            [row.latitude for row in rows],
+            [row.longitude for row in rows],
+            version=version,
+        )
+        print(f"--- Built {len(_cached_matrix)}x{len(_cached_matrix)} distance matrix (version {version}) ---")
+        return _cached_matrix
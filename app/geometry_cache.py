@@ -0,0 +1,210 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from flask import current_app, has_app_context
+from app.routing_pool import submit
+
+coordinate_precision = 5 #decimal places kept in cache keys, about 1 m - closer stops share an entry
+evict_to = 0.9 #share of max_bytes left after an eviction, so the next writes do not evict again straight away
+max_pending_refreshes = 64 #stale keys queued for a background refresh at once, further stale hits are served without one
+
+
+class GeometryCache:
+    """
+    Routed distance and geometry from ORS / Google kept in a local SQLite
+    file, so every worker on the host shares them and they survive restarts.
+    Entries are keyed by travel mode and the rounded coordinate sequence.
+    An entry is fresh for `ttl` seconds; for `stale_ttl` seconds after that
+    it is still served, and a background refresh is queued on the shared
+    routing pool (stale-while-revalidate) - at most one per key, and at
+    most max_pending_refreshes in total. The least recently used entries are evicted
+    once the stored geometry exceeds `max_bytes`; triggers keep the total
+    size in a one-row table, so a write only scans the table when it has
+    to evict. Failed lookups (None) are never cached. Each thread keeps
+    its own connection.
+    """
+
+    def __init__(self, path, max_bytes, ttl, stale_ttl, table='geometry_cache'):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.table = table
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._refreshing = set() #keys with a background refresh in flight
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL") #stored in the file, every later connection uses it
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_used_at ON {self.table} (used_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_sizes (name TEXT PRIMARY KEY, bytes INTEGER NOT NULL)")
+            conn.execute(f"INSERT OR IGNORE INTO cache_sizes (name, bytes) SELECT ?, COALESCE(SUM(size), 0) FROM {self.table}", (self.table,))
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {self.table}_size_insert AFTER INSERT ON {self.table} BEGIN UPDATE cache_sizes SET bytes = bytes + NEW.size WHERE name = '{self.table}'; END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {self.table}_size_update AFTER UPDATE OF size ON {self.table} BEGIN UPDATE cache_sizes SET bytes = bytes + NEW.size - OLD.size WHERE name = '{self.table}'; END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {self.table}_size_delete AFTER DELETE ON {self.table} BEGIN UPDATE cache_sizes SET bytes = bytes - OLD.size WHERE name = '{self.table}'; END")
+
+    def _connect(self): #One connection per thread, opened on first use - sqlite3 connections must stay on the thread that made them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(coordinates, travel_mode):
+        rounded = [[round(float(lon), coordinate_precision), round(float(lat), coordinate_precision)] for lon, lat in coordinates]
+        return hashlib.sha256(json.dumps([travel_mode or 'walking', rounded]).encode('utf-8')).hexdigest()
+
+    def get(self, key): #Returns (value, is_stale), or None when missing or past the stale window
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            age = now - row[1]
+            if age > self.ttl + self.stale_ttl:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            conn.execute(f"UPDATE {self.table} SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), age > self.ttl
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items): #Stores (key, value) pairs in one transaction with a single eviction check
+        now = time.time()
+        rows = []
+        for key, value in items:
+            payload = json.dumps(value)
+            rows.append((key, payload, len(payload), now, now))
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO {self.table} (key, value, size, stored_at, used_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, stored_at = excluded.stored_at, used_at = excluded.used_at",
+                rows,
+            ) #an upsert rather than INSERT OR REPLACE, whose implicit delete would skip the size trigger
+            self._evict(conn, now)
+
+    def _evict(self, conn, now): #Only when the tracked size is over max_bytes: drops expired entries, then the least recently used down to evict_to * max_bytes
+        if self._size(conn) <= self.max_bytes:
+            return
+        conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl - self.stale_ttl,))
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS kept FROM {self.table}) WHERE kept > ?)",
+            (int(self.max_bytes * evict_to),),
+        )
+
+    def _size(self, conn):
+        row = conn.execute("SELECT bytes FROM cache_sizes WHERE name = ?", (self.table,)).fetchone()
+        return row[0] if row else 0
+
+    def lookup(self, key): #get() that also counts hits, stale hits and misses
+        entry = self.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            elif entry[1]:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def refresh(self, key, coordinates, travel_mode, fetch): #Background re-fetch of a stale entry on the routing pool's 'refresh' level, at most one per key at a time
+        with self._lock:
+            if key in self._refreshing or len(self._refreshing) >= max_pending_refreshes:
+                return
+            self._refreshing.add(key)
+            self.refreshes += 1
+
+        def run():
+            try:
+                value = fetch(coordinates, travel_mode)
+                if value is not None:
+                    self.set(key, value)
+            except Exception as e:
+                print(f"Geometry cache refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        try:
+            submit(run, 'refresh')
+        except RuntimeError: #the pool is shutting down with the interpreter
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def fetch(self, coordinates, travel_mode, fetch): #fetch(coordinates, travel_mode) is only called on a miss, or in the background for a stale entry
+        key = self.key(coordinates, travel_mode)
+        entry = self.lookup(key)
+        if entry is not None:
+            value, stale = entry
+            if stale:
+                self.refresh(key, coordinates, travel_mode, fetch)
+            return value
+
+        value = fetch(coordinates, travel_mode)
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        with self._connect() as conn:
+            entries = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            size = self._size(conn)
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+_caches = {}
+_geometry_cache_lock = threading.Lock()
+
+
+def _configured_cache(table, size_setting): #One GeometryCache per table in the GEOMETRY_CACHE_PATH file, built on first use; None outside an app context or when its size setting is 0
+    cache = _caches.get(table)
+    if cache is not None:
+        return cache
+    if not has_app_context():
+        return None
+    config = current_app.config
+    max_mb = config.get(size_setting, 64)
+    if max_mb <= 0:
+        return None
+    with _geometry_cache_lock:
+        if table not in _caches:
+            _caches[table] = GeometryCache(
+                config['GEOMETRY_CACHE_PATH'],
+                int(max_mb * 2 ** 20),
+                config.get('GEOMETRY_CACHE_TTL', 60 * 60 * 24 * 7),
+                config.get('GEOMETRY_CACHE_STALE_TTL', 60 * 60 * 24 * 30),
+                table=table,
+            )
+    return _caches[table]
+
+
+def get_geometry_cache(): #Whole routes, keyed by mode and every stop
+    return _configured_cache('geometry_cache', 'GEOMETRY_CACHE_MAX_MB')
+
+
+def get_leg_cache(): #Single stop-to-stop legs, keyed by mode and the two stops, see route_legs.py
+    return _configured_cache('route_legs', 'LEG_CACHE_MAX_MB')
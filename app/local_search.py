@@ -0,0 +1,129 @@
+import os
+import numpy as np
+from app.nsga_selection import sel_nsga2, select_nsga2
+
+# --- Memetic local search configuration ---
+local_search_interval = int(os.environ.get('NSGA_LOCAL_SEARCH_INTERVAL', '5')) #run 2-opt on the elite every this many generations, 0 = off
+local_search_elite = int(os.environ.get('NSGA_LOCAL_SEARCH_ELITE', '10')) #best individuals (NSGA-II order) improved per step
+local_search_passes = int(os.environ.get('NSGA_LOCAL_SEARCH_PASSES', '5')) #improving moves applied per route per step at most
+
+
+def two_opt(routes, lengths, matrix_rows, matrix, passes):
+    """
+    Best-improvement 2-opt on open paths, for many routes at once. routes are
+    column positions padded with -1 and matrix_rows maps a column position to
+    its distance-matrix row. Every pass scores all segment reversals of every
+    route still improving in one NumPy expression and applies the best one.
+    Returns the new routes, the metres saved per route and the number of moves
+    scored.
+    """
+    routes = routes.copy()
+    n, width = routes.shape
+    saved = np.zeros(n)
+    checked = 0
+    if n == 0 or width < 3:
+        return routes, saved, checked
+
+    def leg(a, b):
+        return matrix[a, b].astype(np.float64)
+
+    first, last = np.triu_indices(width, 1) #reverse the stops first..last inclusive
+    has_prev = first > 0
+    positions = np.arange(width)
+    active = np.arange(n)
+    for _ in range(passes):
+        rows = matrix_rows[np.maximum(routes[active], 0)] #padding maps to an arbitrary row and is masked below
+        length = lengths[active][:, None]
+        valid = last[None, :] < length
+        has_next = last[None, :] + 1 < length
+        prev = rows[:, np.maximum(first - 1, 0)]
+        start = rows[:, first]
+        end = rows[:, last]
+        following = rows[:, np.minimum(last + 1, width - 1)]
+        before = np.where(has_prev, leg(prev, start), 0.0) + np.where(has_next, leg(end, following), 0.0)
+        after = np.where(has_prev, leg(prev, end), 0.0) + np.where(has_next, leg(start, following), 0.0)
+        delta = np.where(valid, after - before, 0.0) #legs inside the segment keep their length, distances are symmetric
+        checked += int(valid.sum())
+
+        best = delta.argmin(axis=1)
+        gain = delta[np.arange(len(active)), best]
+        improving = gain < -1e-3 #at least a millimetre, ignores float32 rounding
+        if not improving.any():
+            break
+        rows_to_change = active[improving]
+        lo = first[best[improving]][:, None]
+        hi = last[best[improving]][:, None]
+        order = np.where((positions >= lo) & (positions <= hi), lo + hi - positions, positions)
+        routes[rows_to_change] = np.take_along_axis(routes[rows_to_change], order, axis=1)
+        saved[rows_to_change] -= gain[improving]
+        active = rows_to_change
+    return routes, saved, checked
+
+
+class LocalSearch:
+    """
+    Memetic step for the NSGA-II loops: every `interval` generations the
+    `elite` best individuals get their stop order improved by 2-opt against
+    the run's distance matrix. Reordering never changes satisfaction, so an
+    improved route dominates the one it replaces. Improved routes are
+    re-scored by the evaluator so their fitness matches a normal evaluation.
+    """
+
+    def __init__(self, evaluator, interval=None, elite=None, passes=None):
+        self.evaluator = evaluator
+        self.interval = local_search_interval if interval is None else interval
+        self.elite = local_search_elite if elite is None else elite
+        self.passes = local_search_passes if passes is None else passes
+        self.location_ids = np.asarray(evaluator.location_ids)
+        self.improved = 0 #routes made shorter
+        self.saved_m = 0.0 #total metres removed from those routes
+        self.moves_checked = 0 #2-opt moves scored from the matrix, each far cheaper than an evaluation
+        self.evaluations = 0 #routes re-scored by the evaluator after improvement
+
+    @property
+    def enabled(self):
+        return self.interval > 0 and self.elite > 0 and self.passes > 0 and self.evaluator.distance_matrix is not None
+
+    def due(self, generation):
+        return self.enabled and generation % self.interval == 0
+
+    def _improve(self, routes, lengths): #Runs 2-opt on position arrays and records the totals, returns (new routes, mask of rows that changed)
+        new_routes, saved, checked = two_opt(routes, lengths, self.evaluator.matrix_rows, self.evaluator.distance_matrix.matrix, self.passes)
+        changed = saved > 0
+        self.moves_checked += checked
+        self.improved += int(changed.sum())
+        self.saved_m += float(saved.sum())
+        self.evaluations += int(changed.sum())
+        return new_routes, changed
+
+    def improve(self, individuals): #Reorders DEAP individuals in place and re-scores the ones that got shorter
+        individuals = [ind for ind in individuals if len(ind) >= 3]
+        if not individuals:
+            return
+        packed, mask, lengths = self.evaluator.pack(individuals)
+        new_routes, changed = self._improve(np.where(mask, packed, -1), lengths)
+        improved = []
+        for row in np.nonzero(changed)[0].tolist():
+            individuals[row][:] = self.location_ids[new_routes[row, :lengths[row]]].tolist()
+            improved.append(individuals[row])
+        self.evaluator.assign_fitness(improved)
+
+    def step(self, pop, generation): #Memetic step for a list population - improves the elite when the generation is due
+        if self.due(generation):
+            self.improve(sel_nsga2(pop, min(self.elite, len(pop))))
+
+    def step_array(self, engine, pop, generation): #Memetic step for an ArrayPopulation from nsga_array.py
+        if not self.due(generation):
+            return
+        rows = select_nsga2(pop.objectives, min(self.elite, len(pop)))
+        new_routes, changed = self._improve(pop.routes[rows], pop.lengths[rows])
+        pop.routes[rows[changed]] = new_routes[changed] #same stops in a new order, so membership is unchanged
+        engine.evaluate(pop, rows[changed])
+
+    def stats(self):
+        return {
+            'local_search_improved': self.improved,
+            'local_search_saved_m': round(self.saved_m, 1),
+            'local_search_moves_checked': self.moves_checked,
+            'local_search_evaluations': self.evaluations,
+        }
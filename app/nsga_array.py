@@ -0,0 +1,342 @@
+import random
+import numpy as np
+from app import nsga_core
+from app.spatial_index import neighbour_mutation_rate
+from app.nsga_selection import nondominated_sort_2d, select_nsga2
+
+
+class ArrayPopulation:
+    """
+    A population stored as a fixed-width integer array instead of a list of
+    DEAP individuals.
+
+    routes      (P, W) column positions into the run's location arrays, -1 padded
+    lengths     (P,)   number of stops in each route
+    membership  (P, N) True where location n is on route p
+    objectives  (P, 2) distance and satisfaction, filled in by evaluation
+    """
+
+    def __init__(self, routes, lengths, membership, objectives=None):
+        self.routes = routes
+        self.lengths = lengths
+        self.membership = membership
+        self.objectives = objectives if objectives is not None else np.full((len(routes), 2), np.nan)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def take(self, rows): #Copies the chosen rows - plain array indexing, no per-individual deep copies
+        return ArrayPopulation(self.routes[rows], self.lengths[rows], self.membership[rows], self.objectives[rows])
+
+    @staticmethod
+    def concat(first, second):
+        return ArrayPopulation(
+            np.concatenate((first.routes, second.routes)),
+            np.concatenate((first.lengths, second.lengths)),
+            np.concatenate((first.membership, second.membership)),
+            np.concatenate((first.objectives, second.objectives)),
+        )
+
+    def valid_mask(self):
+        return self.routes >= 0
+
+
+def compact(routes, keep): #Moves the kept stops of every row to the front, preserving their order, and pads with -1
+    order = np.argsort(~keep, axis=1, kind='stable')
+    compacted = np.take_along_axis(routes, order, axis=1)
+    kept = np.take_along_axis(keep, order, axis=1)
+    compacted[~kept] = -1
+    return compacted, kept.sum(axis=1)
+
+
+def random_pick(rng, allowed): #Uniformly picks one True column per row, returns (columns, rows that had any choice)
+    keys = rng.random(allowed.shape)
+    keys[~allowed] = -1.0
+    return keys.argmax(axis=1), allowed.any(axis=1)
+
+
+class ArrayEngine:
+    """
+    NSGA-II with the population held in NumPy arrays. Crossover, mutation and
+    required-stop repair are applied to every selected row at once through
+    membership bitmaps, so there are no `loc not in individual` list scans and
+    no deep copies of individuals. It follows the same operators as the DEAP
+    loop in nsga_core (ordered crossover into the first child, add/remove/swap
+    mutation, required stops appended then surplus optional stops trimmed).
+    Before each survivor selection, routes visiting the same stops as a
+    shorter one are dropped and fresh random routes fill the gap, so the
+    population cannot collapse onto copies of a few routes.
+    """
+
+    def __init__(self, evaluator, required_stops, rng=None, neighbour_table=None):
+        self.evaluator = evaluator
+        self.neighbour_table = neighbour_table #(N, k) nearest locations in column positions, -1 padded, see spatial_index.py
+        self.n_locations = len(evaluator.location_ids)
+        self.location_ids = np.asarray(evaluator.location_ids)
+        self.required = np.asarray([evaluator.index[stop_id] for stop_id in required_stops], dtype=np.int64)
+        self.required_mask = np.zeros(self.n_locations, dtype=bool)
+        self.required_mask[self.required] = True
+        self.min_length = nsga_core.min_locations
+        self.max_length = nsga_core.max_locations
+        self.width = max(self.max_length, len(self.required))
+        self.rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64)) #follows random.seed so runs stay reproducible
+
+    def _membership(self, routes):
+        membership = np.zeros((len(routes), self.n_locations), dtype=bool)
+        rows, cols = np.nonzero(routes >= 0)
+        membership[rows, routes[rows, cols]] = True
+        return membership
+
+    def initial_population(self, size, seeds=()): #Seed routes first, the rest with the same distribution as generate_individual - required stops plus random extras up to a random length, shuffled
+        seeds = list(seeds)[:size]
+        if seeds:
+            seeded = self.from_routes(seeds)
+            return ArrayPopulation.concat(seeded, self.initial_population(size - len(seeds)))
+        rng = self.rng
+        n_required = len(self.required)
+        targets = rng.integers(self.min_length, self.max_length + 1, size)
+        extras = np.clip(targets - n_required, 0, None)
+        extras[extras > self.n_locations - n_required] = 0 #not enough locations to fill the route, keep only the required stops
+        most = int(extras.max()) if size else 0
+
+        routes = np.full((size, self.width), -1, dtype=np.int64)
+        routes[:, :n_required] = self.required
+        if most:
+            keys = rng.random((size, self.n_locations))
+            keys[:, self.required] = -1.0
+            top = np.argpartition(-keys, most - 1, axis=1)[:, :most]
+            top = np.take_along_axis(top, np.argsort(-np.take_along_axis(keys, top, axis=1), axis=1), axis=1) #highest random keys first
+            picked = np.arange(most) < extras[:, None]
+            block = np.where(picked, top, -1)
+            routes[:, n_required:n_required + most] = block[:, :self.width - n_required]
+
+        lengths = n_required + extras
+        shuffle_keys = rng.random(routes.shape)
+        shuffle_keys[routes < 0] = np.inf #padding stays at the end
+        routes = np.take_along_axis(routes, np.argsort(shuffle_keys, axis=1), axis=1)
+        return ArrayPopulation(routes, lengths, self._membership(routes))
+
+    def from_routes(self, routes): #Packs lists of location ids (at most max_length stops each) into an ArrayPopulation
+        index = self.evaluator.index
+        packed = np.full((len(routes), self.width), -1, dtype=np.int64)
+        for row, route in enumerate(routes):
+            packed[row, :len(route)] = [index[loc_id] for loc_id in route]
+        lengths = np.fromiter((len(route) for route in routes), dtype=np.int64, count=len(routes))
+        return ArrayPopulation(packed, lengths, self._membership(packed))
+
+    def evaluate(self, pop, rows=None): #Scores the given rows (all rows by default) in one batch
+        rows = np.arange(len(pop)) if rows is None else rows
+        if len(rows) == 0:
+            return 0
+        routes = pop.routes[rows]
+        lengths = pop.lengths[rows]
+
+        def compute(positions):
+            chosen = routes[positions]
+            mask = chosen >= 0
+            return self.evaluator.evaluate_packed(np.where(mask, chosen, 0), mask, lengths[positions])
+
+        keys = [tuple(self.location_ids[route[:length]].tolist()) for route, length in zip(routes, lengths)] if self.evaluator.memo is not None else [None] * len(rows)
+        pop.objectives[rows] = np.asarray(self.evaluator.evaluate_memoized(keys, compute), dtype=np.float64)
+        return len(rows)
+
+    def crossover(self, pop, probability): #Ordered crossover on consecutive pairs, the child replaces the first parent of each pair
+        rng = self.rng
+        n_pairs = len(pop) // 2
+        first = np.arange(n_pairs) * 2
+        first = first[rng.random(n_pairs) < probability]
+        if len(first) == 0:
+            return first
+        second = first + 1
+        first_shorter = pop.lengths[first] < pop.lengths[second]
+        short = np.where(first_shorter, first, second) #parent1 - donates the slice
+        long = np.where(first_shorter, second, first) #parent2 - donates the remaining order
+        short_len = pop.lengths[short]
+
+        a = rng.integers(0, short_len)
+        b = rng.integers(0, np.maximum(short_len - 1, 1))
+        b = b + (b >= a)
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        slice_len = hi - lo + 1
+
+        cols = np.arange(pop.routes.shape[1])
+        short_routes = pop.routes[short]
+        long_routes = pop.routes[long]
+        in_slice = (cols >= lo[:, None]) & (cols <= hi[:, None])
+        slice_members = np.zeros((len(first), self.n_locations), dtype=bool)
+        rows, slice_cols = np.nonzero(in_slice)
+        slice_members[rows, short_routes[rows, slice_cols]] = True
+
+        kept = (long_routes >= 0) & ~np.take_along_axis(slice_members, np.where(long_routes >= 0, long_routes, 0), axis=1)
+        rank = np.cumsum(kept, axis=1) - 1
+        remaining = kept.sum(axis=1)
+        slice_start = np.minimum(lo, remaining)
+
+        children = np.full((len(first), self.width), -1, dtype=np.int64)
+        kept_dest = np.where(rank < lo[:, None], rank, rank + slice_len[:, None])
+        rows, kept_cols = np.nonzero(kept & (kept_dest < self.max_length))
+        children[rows, kept_dest[rows, kept_cols]] = long_routes[rows, kept_cols]
+        slice_dest = slice_start[:, None] + (cols - lo[:, None])
+        rows, slice_cols = np.nonzero(in_slice & (slice_dest < self.max_length))
+        children[rows, slice_dest[rows, slice_cols]] = short_routes[rows, slice_cols]
+
+        pop.routes[first] = children
+        pop.lengths[first] = (children >= 0).sum(axis=1)
+        pop.membership[first] = self._membership(children)
+        return first
+
+    def mutate(self, pop, probability): #add / remove / swap mutation, chosen per row with the same odds as random_mutation
+        rng = self.rng
+        rows = np.nonzero(rng.random(len(pop)) < probability)[0]
+        if len(rows) == 0:
+            return rows
+        routes = pop.routes[rows]
+        lengths = pop.lengths[rows]
+        valid = routes >= 0
+        mutable = valid & ~self.required_mask[np.where(valid, routes, 0)]
+        has_mutable = mutable.any(axis=1)
+        roll = rng.random(len(rows))
+        add = (roll < 0.33) & (lengths < self.max_length)
+        remove = ~add & (roll < 0.66) & (lengths > self.min_length) & has_mutable
+        swap = ~add & ~remove & has_mutable
+
+        newcomer, has_newcomer = random_pick(rng, ~pop.membership[rows])
+        position, _ = random_pick(rng, mutable)
+        if self.neighbour_table is not None: #most add/swap mutations draw from the neighbours of the adjacent stop
+            row_ids = np.arange(len(rows))
+            before = np.maximum(position - 1, 0)
+            after = np.minimum(1, np.maximum(lengths - 1, 0))
+            anchor = np.where(add, routes[row_ids, np.maximum(lengths - 1, 0)], routes[row_ids, np.where(position > 0, before, after)])
+            nearby = self.neighbour_table[np.maximum(anchor, 0)]
+            allowed = (nearby >= 0) & ~np.take_along_axis(pop.membership[rows], np.maximum(nearby, 0), axis=1)
+            pick, has_nearby = random_pick(rng, allowed)
+            use_nearby = has_nearby & (rng.random(len(rows)) < neighbour_mutation_rate)
+            newcomer = np.where(use_nearby, nearby[row_ids, pick], newcomer)
+            has_newcomer |= use_nearby
+        add &= has_newcomer
+        swap &= has_newcomer
+
+        add_rows = np.nonzero(add)[0]
+        routes[add_rows, lengths[add_rows]] = newcomer[add_rows]
+        swap_rows = np.nonzero(swap)[0]
+        routes[swap_rows, position[swap_rows]] = newcomer[swap_rows]
+        remove_rows = np.nonzero(remove)[0]
+        if len(remove_rows):
+            keep = routes[remove_rows] >= 0
+            keep[np.arange(len(remove_rows)), position[remove_rows]] = False
+            routes[remove_rows], _ = compact(routes[remove_rows], keep)
+
+        changed = rows[add | remove | swap]
+        pop.routes[rows] = routes
+        pop.lengths[rows] = (routes >= 0).sum(axis=1)
+        pop.membership[changed] = self._membership(pop.routes[changed])
+        return changed
+
+    def repair(self, pop): #enforce_required_stops for every row - append missing required stops, then drop the last optional stops beyond max_length
+        if len(self.required) == 0:
+            return np.empty(0, dtype=np.int64)
+        missing = ~pop.membership[:, self.required]
+        rows = np.nonzero(missing.any(axis=1))[0]
+        if len(rows) == 0:
+            return rows
+        missing = missing[rows]
+        n_required = len(self.required)
+        extended = np.full((len(rows), self.width + n_required), -1, dtype=np.int64)
+        extended[:, :self.width] = pop.routes[rows]
+        dest = pop.lengths[rows][:, None] + np.cumsum(missing, axis=1) - 1
+        r, c = np.nonzero(missing)
+        extended[r, dest[r, c]] = self.required[c]
+
+        valid = extended >= 0
+        optional = valid & ~self.required_mask[np.where(valid, extended, 0)]
+        excess = np.clip(valid.sum(axis=1) - self.max_length, 0, None)
+        from_end = np.cumsum(optional[:, ::-1], axis=1)[:, ::-1] #1 for the last optional stop, 2 for the one before, ...
+        drop = optional & (from_end <= excess[:, None])
+        repaired, lengths = compact(extended, valid & ~drop)
+
+        pop.routes[rows] = repaired[:, :self.width]
+        pop.lengths[rows] = lengths
+        pop.membership[rows] = self._membership(pop.routes[rows])
+        return rows
+
+    def select(self, pop, k):
+        return pop.take(select_nsga2(pop.objectives, k))
+
+    def distinct_rows(self, pop): #Rows to keep so no two visit the same set of stops - the shortest order of each set wins
+        order = np.argsort(pop.objectives[:, 0], kind='stable')
+        _, first = np.unique(np.sort(pop.routes[order], axis=1), axis=0, return_index=True) #-1 padding sorts first, so equal stop sets give equal rows
+        return np.sort(order[first])
+
+    def generation(self, pop, population_size, crossover, mutation): #One NSGA-II generation, the array version of nsga_core.evolve_generation
+        offspring = self.select(pop, len(pop)) #parents in NSGA-II order, copied as arrays
+        changed = np.zeros(len(offspring), dtype=bool)
+        changed[self.crossover(offspring, crossover)] = True
+        changed[self.mutate(offspring, mutation)] = True
+        changed[self.repair(offspring)] = True
+        self.evaluate(offspring, np.nonzero(changed)[0])
+        merged = ArrayPopulation.concat(pop, offspring)
+        merged = merged.take(self.distinct_rows(merged))
+        if len(merged) < population_size: #too few distinct routes left - random newcomers keep the population at full size
+            newcomers = self.initial_population(population_size - len(merged))
+            self.evaluate(newcomers)
+            merged = ArrayPopulation.concat(merged, newcomers)
+        return self.select(merged, population_size)
+
+    def front_individuals(self, pop): #Only the non-dominated rows as DEAP individuals, one per distinct fitness - a converged population repeats the same front rows many times
+        rows = nondominated_sort_2d(pop.objectives, 1)[0]
+        _, first = np.unique(pop.objectives[rows], axis=0, return_index=True)
+        return self.to_individuals(pop.take(rows[np.sort(first)]))
+
+    def to_individuals(self, pop): #Converts back to DEAP individuals for the Pareto front and response building in nsga_core
+        individuals = []
+        for route, length, values in zip(pop.routes, pop.lengths, pop.objectives):
+            ind = nsga_core.creator.Individual(self.location_ids[route[:length]].tolist())
+            if not np.isnan(values).any():
+                ind.fitness.values = (float(values[0]), float(values[1]))
+            individuals.append(ind)
+        return individuals
+
+
+def evolve_array_population(evaluator, required_stops, population_size, generations, monitor=None, on_generation=None, neighbour_table=None, archive=None, seeds=(), local_search=None, budget=None):
+    """
+    Runs the whole evolution on an ArrayPopulation and hands back DEAP
+    individuals plus the stop reason, so nsga_core can build the Pareto front
+    and responses exactly as it does for the DEAP engine. Operator rates and
+    the time limit come from budget (a SearchBudget), or nsga_core's defaults.
+    The population stays in arrays until evolution ends: on_generation only
+    receives the non-dominated rows as individuals (all that progress
+    reporting needs), converted once per generation and shared with the
+    archive.
+    """
+    crossover_rate = budget.crossover if budget is not None else nsga_core.crossover
+    mutation_rate = budget.mutation if budget is not None else nsga_core.mutation
+    engine = ArrayEngine(evaluator, required_stops, neighbour_table=neighbour_table)
+    pop = engine.initial_population(population_size, seeds)
+    engine.evaluate(pop)
+    if monitor is not None:
+        monitor.start(pop)
+    if archive is not None:
+        archive.update(engine.front_individuals(pop))
+
+    stop_reason = 'max_generations'
+    for gen in range(generations):
+        pop = engine.generation(pop, population_size, crossover_rate, mutation_rate)
+        if local_search is not None:
+            local_search.step_array(engine, pop, gen + 1)
+        if (gen + 1) % 10 == 0:
+            print(f"Generation {gen + 1}/{generations} complete.")
+        front = engine.front_individuals(pop) if archive is not None or on_generation is not None else None
+        if archive is not None:
+            archive.update(front)
+        if on_generation is not None:
+            on_generation(gen + 1, generations, front)
+        if monitor is not None and monitor.update(pop) and gen + 1 < generations:
+            stop_reason = 'converged'
+            print(f"Converged after {gen + 1} generations - front unchanged for {monitor.stagnant} generations.")
+            break
+        if budget is not None and budget.expired() and gen + 1 < generations:
+            stop_reason = 'time_budget'
+            print(f"Time budget of {budget.time_budget_ms} ms used up after {gen + 1} generations.")
+            break
+
+    return engine.to_individuals(pop), stop_reason
@@ -0,0 +1,113 @@
+import os
+import numpy as np
+
+# --- Early termination configuration ---
+convergence_patience = int(os.environ.get('NSGA_PATIENCE', '8')) #stop after this many generations without hypervolume improvement, 0 disables early stopping
+convergence_tolerance = float(os.environ.get('NSGA_TOLERANCE', '0.001')) #relative hypervolume gain below this counts as no improvement
+min_generations = int(os.environ.get('NSGA_MIN_GENERATIONS', '10')) #never stop before this many generations
+
+
+def population_objectives(pop): #(distance, satisfaction) of every evaluated individual as an (n, 2) array
+    if hasattr(pop, 'objectives'): #array-backed population from nsga_array.py already holds them
+        return pop.objectives
+    values = [ind.fitness.values for ind in pop if ind and ind.fitness.valid]
+    if not values:
+        return np.empty((0, 2))
+    return np.asarray(values, dtype=np.float64)
+
+
+def non_dominated(pop): #First Pareto front of a population (shortest distance, highest satisfaction), without duplicate routes, sorted by satisfaction
+    candidates = [ind for ind in pop if ind and ind.fitness.valid and np.isfinite(ind.fitness.values[0])]
+    if not candidates:
+        return []
+    objectives = population_objectives(candidates)
+    order = np.lexsort((-objectives[:, 1], objectives[:, 0])) #by distance, ties broken by higher satisfaction
+    satisfaction = objectives[order, 1]
+    best_before = np.concatenate(([-np.inf], np.maximum.accumulate(satisfaction)[:-1]))
+    front = [candidates[i] for i in order[satisfaction > best_before]] #a point is non-dominated if it beats every shorter route on satisfaction
+    seen = set()
+    unique = []
+    for ind in front:
+        if tuple(ind) not in seen:
+            seen.add(tuple(ind))
+            unique.append(ind)
+    return sorted(unique, key=lambda ind: ind.fitness.values[1], reverse=True)
+
+
+def hypervolume_2d(objectives, reference):
+    """
+    Area dominated by a set of (distance, satisfaction) points and bounded by
+    the reference point (worst distance, worst satisfaction). Distance is
+    minimised and satisfaction maximised. Dominated points add nothing, so the
+    whole population can be passed in without extracting the front first.
+    """
+    if len(objectives) == 0:
+        return 0.0
+    ref_distance, ref_satisfaction = reference
+    distance = objectives[:, 0]
+    loss = -objectives[:, 1] #satisfaction turned into a minimised objective
+    inside = np.isfinite(distance) & (distance < ref_distance) & (loss < -ref_satisfaction)
+    if not inside.any():
+        return 0.0
+    distance, loss = distance[inside], loss[inside]
+    order = np.argsort(distance, kind='stable')
+    distance, loss = distance[order], loss[order]
+    best_loss = np.minimum.accumulate(loss) #best satisfaction reached so far, walking from short to long routes
+    previous = np.concatenate(([-ref_satisfaction], best_loss[:-1]))
+    return float(np.sum((ref_distance - distance) * (previous - best_loss)))
+
+
+class ConvergenceMonitor:
+    """
+    Tracks the hypervolume of the population after every generation and
+    reports when the front has stopped improving for `patience` generations.
+    The reference point is fixed from the first population seen so that
+    hypervolumes of later generations are comparable.
+    """
+
+    def __init__(self, patience=None, tolerance=None, minimum=None):
+        self.patience = convergence_patience if patience is None else patience
+        self.tolerance = convergence_tolerance if tolerance is None else tolerance
+        self.minimum = min_generations if minimum is None else minimum
+        self.reference = None
+        self.best_hypervolume = 0.0
+        self.stagnant = 0
+        self.generations = 0
+        self.history = []
+
+    def _set_reference(self, objectives):
+        finite = objectives[np.isfinite(objectives[:, 0])]
+        if len(finite) == 0:
+            return
+        worst_distance = finite[:, 0].max()
+        worst_satisfaction = finite[:, 1].min()
+        self.reference = (worst_distance * 1.1 + 1e-9, worst_satisfaction - 0.1 * abs(worst_satisfaction) - 1e-9) #just beyond the worst initial route so every initial point counts
+
+    def start(self, pop): #Records the initial population before the first generation
+        objectives = population_objectives(pop)
+        self._set_reference(objectives)
+        if self.reference is not None:
+            self.best_hypervolume = hypervolume_2d(objectives, self.reference)
+
+    def update(self, pop, generations=1): #Call after each generation (or island epoch); returns True when evolution should stop
+        self.generations += generations
+        objectives = population_objectives(pop)
+        if self.reference is None:
+            self._set_reference(objectives)
+        hypervolume = hypervolume_2d(objectives, self.reference) if self.reference is not None else 0.0
+        self.history.append(hypervolume)
+
+        if hypervolume - self.best_hypervolume > self.tolerance * max(self.best_hypervolume, 1e-12):
+            self.best_hypervolume = hypervolume
+            self.stagnant = 0
+        else:
+            self.stagnant += generations
+
+        return self.patience > 0 and self.generations >= self.minimum and self.stagnant >= self.patience
+
+    def summary(self, stop_reason):
+        return {
+            'generations': self.generations,
+            'stop_reason': stop_reason,
+            'hypervolume': self.history[-1] if self.history else self.best_hypervolume,
+        }
@@ -2,18 +2,39 @@ import os
 import random
 import requests
 import numpy as np
+import sqlalchemy as sa
+import sqlalchemy.orm as so
 from deap import base, creator, tools
 from app.models import Location
+from app.nsga_eval import PopulationEvaluator, fitness_memo_for
+from app.distance_matrix import LocationDistanceMatrix, get_distance_matrix, haversine_matrix
+from app.nsga_islands import island_count, evolve_islands
+from app.nsga_convergence import ConvergenceMonitor
+from app.nsga_array import evolve_array_population
+from app.nsga_selection import nondominated_sort_2d, sel_nsga2
+from app.pareto_archive import ParetoArchive, archive_size
+from app.nsga_seeding import build_seeds, remember_front
+from app.local_search import LocalSearch
+from app.route_order import exact_order, max_exact_stops
+from app.spatial_index import SpatialIndex, get_spatial_index, pick_neighbour
+from app.geometry_cache import get_geometry_cache, get_leg_cache
+from app.route_legs import assemble_legs, split_route_legs, stitch_legs
+from app.routing_pool import concurrent_map
+from app.provider_client import get_provider
+from app.polyline import decode_polyline
+from app.search_budget import budget_profiles, resolve_budget
+from app.candidate_pool import preselect_by_category, default_radius_m, candidate_limit, candidate_floor, radius_bbox, narrow_candidates
 
 # --- Configuration ---
 api_key_ors = os.environ.get('ORS_API_KEY')
 api_key_google = os.environ.get('GOOGLE_MAPS_API_KEY')
 min_locations = 5
 max_locations = 8
-population = 100 #number of locations in the database
-no_of_generations = 50
-crossover = 0.9
-mutation = 0.2
+population = budget_profiles['balanced']['population_size'] #defaults of the balanced profile - each run reads its own SearchBudget, see search_budget.py
+no_of_generations = budget_profiles['balanced']['generations']
+crossover = budget_profiles['balanced']['crossover']
+mutation = budget_profiles['balanced']['mutation']
+optimizer_engine = os.environ.get('NSGA_ENGINE', 'deap') #'array' runs the NumPy array-backed engine in nsga_array.py instead of DEAP lists
 
 #DEAP Core Functions - defines Fitness Function in relation to minimising distance and maximising satisfaction, defines what an Individual is and how it is represented - a list of location IDs
 creator.create("FitnessMulti", base.Fitness, weights=(-1.0, 1.0))
@@ -21,10 +42,20 @@ creator.create("Individual", list, fitness=creator.FitnessMulti)
 
 
 #Data and API Functions
-def locations_to_dict(category_filter=None): #Fetches all locations from the database and returns them as a dictionary
-    query = Location.query
+def locations_to_dict(category_filter=None, bbox=None, include_ids=None): #Fetches locations from the database and returns them as a dictionary, optionally limited to categories and a [south, west, north, east] box - include_ids are returned whatever the filters
+    query = Location.query.options(so.selectinload(Location.feedbacks)) #avg_sentiment needs every location's feedback, load it in one query
+    conditions = []
     if category_filter:
-        query = query.filter(Location.category_id.in_(category_filter))
+        conditions.append(Location.category_id.in_(category_filter))
+    if bbox:
+        south, west, north, east = bbox
+        conditions.append(Location.latitude.between(south, north))
+        conditions.append(Location.longitude.between(west, east))
+    if conditions:
+        condition = sa.and_(*conditions)
+        if include_ids:
+            condition = sa.or_(condition, Location.id.in_(include_ids))
+        query = query.filter(condition)
     locations = query.all()
 
     locations_data = {}
@@ -41,6 +72,48 @@ def locations_to_dict(category_filter=None): #Fetches all locations from the dat
     return locations_data
 
 
+def select_candidate_locations(user_preferences, required_stops, search_area=None, population_size=population):
+    """
+    Builds the candidate pool the optimiser searches: locations in the
+    preferred categories, inside the search area (an explicit bbox, or
+    radius_m around the start point or the required stops), capped at
+    candidate_limit. The category filter is dropped when it leaves too few
+    locations for population_size routes (see candidate_floor). Required
+    stops are always included. Filtering happens in the query, so locations
+    outside the pool are never loaded. Returns the pool as a locations
+    dictionary plus a summary for run_info.
+    """
+    search_area = search_area or {}
+    if search_area.get('start'):
+        anchors = [tuple(search_area['start'])]
+    elif required_stops:
+        anchors = [(loc.latitude, loc.longitude) for loc in Location.query.filter(Location.id.in_(required_stops))]
+    else:
+        anchors = []
+    radius_m = (search_area.get('radius_m') or default_radius_m) if anchors else None
+    bbox = search_area.get('bbox') or (radius_bbox(anchors, radius_m) if radius_m else None)
+    categories = user_preferences if preselect_by_category and user_preferences else None
+
+    attempts = [(categories, bbox, candidate_floor(population_size, max_locations)), (None, bbox, max_locations), (None, None, 0)] #relax the category filter first, and the area only when no route fits in it
+    required = set(required_stops)
+    tried = set()
+    for category_filter, area, needed in attempts:
+        filters = (tuple(category_filter or ()), tuple(area or ()))
+        if filters in tried: #relaxing a filter that was never applied gives the same pool
+            continue
+        tried.add(filters)
+        locations_dict = locations_to_dict(category_filter, area, required_stops)
+        locations_dict = narrow_candidates(locations_dict, required_stops, anchors, radius_m if area else None, candidate_limit, user_preferences)
+        if len(locations_dict.keys() - required) >= needed:
+            break
+
+    return locations_dict, {
+        'candidates': len(locations_dict),
+        'category_limited': category_filter is not None,
+        'area_limited': area is not None,
+    }
+
+
 def get_category_colour(category_id): #Maps the category ID to a colour name for the map markers - see below for key/value pairs
     id_to_name_map = {1: 'Food and Drink', 2: 'History', 3: 'Shopping', 4: 'Nature', 5: 'Culture', 6: 'Nightlife'}
     category_name = id_to_name_map.get(category_id)
@@ -79,8 +152,7 @@ def get_ors_route(coordinates, travel_mode = 'walking'):
         'Content-Type': 'application/json; charset=utf-8'
     }
     try: #error handling, in case API call does not work - TRY block is if the call works as planned
-        response = requests.post(ors_url, headers=headers, json={'coordinates': coordinates}) #API response to call stored here
-        response.raise_for_status() #checks HTTP status
+        response = get_provider('ors').post(ors_url, headers=headers, json={'coordinates': coordinates}) #API response to call stored here - pooled, with timeout, retries and circuit breaker
         data = response.json()
         # Correctly parse the 'features' key from the ORS response
         if data and data.get('features'):
@@ -96,40 +168,6 @@ def get_ors_route(coordinates, travel_mode = 'walking'):
         return None
 
 
-def decode_polyline(encoded):
-    index = 0
-    lat = 0
-    lng = 0
-    coordinates = []
-    while index < len(encoded):
-        shift = 0
-        result = 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result |= (b & 0x1f) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        delta_lat = ~(result >> 1) if result & 1 else (result >> 1)
-        lat += delta_lat
-
-        shift = 0
-        result = 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result |= (b & 0x1f) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        delta_lng = ~(result >> 1) if result & 1 else (result >> 1)
-        lng += delta_lng
-
-        coordinates.append([lng / 1e5, lat / 1e5])
-    return coordinates
-
-
 def _google_transit_request(origin, destination):
     params = {
         "origin": origin,
@@ -138,89 +176,109 @@ def _google_transit_request(origin, destination):
         "departure_time": "now",
         "key": api_key_google,
     }
-    response = requests.get(
+    response = get_provider('google').get(
         "https://maps.googleapis.com/maps/api/directions/json",
         params=params,
-        timeout=10,
     )
-    response.raise_for_status()
     return response.json()
 
 
-def get_google_transit_route(coordinates):
+def get_ors_route_legs(coordinates, travel_mode='walking'): #One ORS request through the coordinates, split into a distance and geometry per leg
+    ors_route = get_ors_route(coordinates, travel_mode)
+    if not ors_route:
+        return None
+    legs = split_route_legs(ors_route, len(coordinates))
+    if legs is None:
+        print("ORS Response Error: route has no per-leg segments.")
+    return legs
+
+
+def _google_transit_leg(start, end): #Distance and geometry of one transit leg, None if Google has no route
+    origin = f"{start[1]},{start[0]}"
+    destination = f"{end[1]},{end[0]}"
+    try:
+        data = _google_transit_request(origin, destination)
+    except requests.exceptions.RequestException as e: #connection/HTTP errors, or the circuit is open
+        print(f"Google Directions Error: {e}")
+        return None
+    if data.get("status") != "OK":
+        print(f"Google Directions Error: {data.get('status')}")
+        return None
+
+    routes = data.get("routes", [])
+    if not routes:
+        print("Google Directions Error: No routes found.")
+        return None
+
+    route = routes[0]
+    overview = route.get("overview_polyline", {}).get("points")
+    if not overview:
+        print("Google Directions Error: Missing overview polyline.")
+        return None
+
+    distance = sum(leg["distance"].get("value", 0) for leg in route.get("legs", []) if leg.get("distance"))
+    return {"distance": distance, "coordinates": decode_polyline(overview)}
+
+
+def get_google_transit_legs(coordinates): #One Google Directions request per leg (transit routes cannot have waypoints), sent concurrently
     if len(coordinates) < 2:
         return None
     if not api_key_google:
         print("Google Directions Error: GOOGLE_MAPS_API_KEY is not configured.")
         return None
 
-    combined_coords = []
-    total_distance = 0
+    legs = concurrent_map(lambda pair: _google_transit_leg(*pair), zip(coordinates[:-1], coordinates[1:]), 'transit_legs')
+    return legs if all(leg is not None for leg in legs) else None
 
-    for start, end in zip(coordinates[:-1], coordinates[1:]):
-        origin = f"{start[1]},{start[0]}"
-        destination = f"{end[1]},{end[0]}"
-        data = _google_transit_request(origin, destination)
-        if data.get("status") != "OK":
-            print(f"Google Directions Error: {data.get('status')}")
-            return None
 
-        routes = data.get("routes", [])
-        if not routes:
-            print("Google Directions Error: No routes found.")
-            return None
+def get_google_transit_route(coordinates):
+    legs = get_google_transit_legs(coordinates)
+    return stitch_legs(legs) if legs else None
 
-        route = routes[0]
-        overview = route.get("overview_polyline", {}).get("points")
-        if not overview:
-            print("Google Directions Error: Missing overview polyline.")
-            return None
 
-        segment_coords = decode_polyline(overview)
-        if combined_coords and segment_coords:
-            if combined_coords[-1] == segment_coords[0]:
-                segment_coords = segment_coords[1:]
-        combined_coords.extend(segment_coords)
+def routing_provider(travel_mode='walking'): #Name of the provider client that routes a travel mode
+    return 'google' if travel_mode == 'transit' else 'ors'
 
-        for leg in route.get("legs", []):
-            if leg.get("distance"):
-                total_distance += leg["distance"].get("value", 0)
 
-    if not combined_coords:
+def straight_line_route(coordinates): #Stops joined by straight lines with great-circle distances, marked approximate - shown while the routing provider is down
+    if len(coordinates) < 2:
         return None
-
+    longitudes, latitudes = zip(*coordinates)
+    distances = np.diagonal(haversine_matrix(np.array(latitudes), np.array(longitudes)), offset=1)
     return {
-        "distance": total_distance,
-        "geometry": {
-            "type": "LineString",
-            "coordinates": combined_coords,
-        },
+        'distance': float(distances.sum()),
+        'geometry': {'type': 'LineString', 'coordinates': [list(point) for point in coordinates]},
+        'approximate': True,
     }
 
 
-def get_route_data(coordinates, travel_mode='walking'):
-    if travel_mode == 'transit':
-        return get_google_transit_route(coordinates)
-
-    ors_route = get_ors_route(coordinates, travel_mode)
-    if not ors_route:
-        return None
+def get_route_data(coordinates, travel_mode='walking'): #Routed distance and geometry, answered from the geometry cache when the same stops were routed before. Falls back to straight lines (never cached) when the provider's circuit is open
+    cache = get_geometry_cache()
+    if cache is None:
+        route_data = fetch_route_data(coordinates, travel_mode)
+    else:
+        route_data = cache.fetch(coordinates, travel_mode, fetch_route_data)
+    if route_data is None and not get_provider(routing_provider(travel_mode)).available():
+        return straight_line_route(coordinates)
+    return route_data
 
-    accurate_distance = 0
-    if 'properties' in ors_route and 'summary' in ors_route['properties']:
-        accurate_distance = ors_route['properties']['summary']['distance']
 
-    return {
-        'distance': accurate_distance,
-        'geometry': ors_route.get('geometry')
-    }
+def fetch_route_data(coordinates, travel_mode='walking'): #Builds the route from cached stop-to-stop legs, calling ORS (or Google for transit) only for the legs not cached yet
+    if travel_mode == 'transit':
+        fetch_legs = lambda coords, mode: get_google_transit_legs(coords)
+    else:
+        fetch_legs = get_ors_route_legs
+    legs = assemble_legs(coordinates, travel_mode, fetch_legs, get_leg_cache())
+    return stitch_legs(legs) if legs else None
 
 
 # Objective Functions, distance and satisfaction
 
-def compute_distance(individual, locations_dict): #Calculates the total distance of a route (to be minimized). Calculates the total straight-line distance between the points - ORS route distance for 100 routes would call the api a lot = computationally intensive
+def compute_distance(individual, locations_dict, distance_matrix=None): #Calculates the total distance of a route (to be minimized). Calculates the total straight-line distance between the points - ORS route distance for 100 routes would call the api a lot = computationally intensive
     if not individual or len(individual) < 2:
         return float('inf')
+    if distance_matrix is not None: #precomputed haversine distances in metres, see distance_matrix.py
+        return distance_matrix.route_distance(individual)
     distance = 0
     for i in range(len(individual) - 1):
         loc1 = locations_dict[individual[i]]
@@ -252,17 +310,19 @@ def compute_satisfaction(individual, locations_dict, user_preferences):
 
 # DEAP Algorithm Set up - creating individuals
 
-def generate_individual(location_ids, required_stops): #Generates an individual route with a variable number of locations - come back to this
+# The operators draw from rng - the random module by default, a random.Random of its own where several runs share a process (island fallback)
+
+def generate_individual(location_ids, required_stops, rng=random): #Generates an individual route with a variable number of locations - come back to this
     individual = list(required_stops)
 
-    remaining_slots = random.randint(min_locations, max_locations) - len(individual)
+    remaining_slots = rng.randint(min_locations, max_locations) - len(individual)
 
     if remaining_slots > 0:
         possible_additions = [loc_id for loc_id in location_ids if loc_id not in individual]
         if len(possible_additions) >= remaining_slots:
-            individual.extend(random.sample(possible_additions, remaining_slots))
+            individual.extend(rng.sample(possible_additions, remaining_slots))
 
-    random.shuffle(individual)
+    rng.shuffle(individual)
     return individual
 
 def enforce_required_stops(individual, required_stops): #Ensures required stops always remain in the individual
@@ -278,11 +338,27 @@ def enforce_required_stops(individual, required_stops): #Ensures required stops
     return individual
 
 
+def repair_routes(routes, location_ids, required_stops): #Adapts routes from an earlier run to the current candidate pool and required stops, dropping duplicates
+    allowed = set(location_ids)
+    repaired = []
+    seen = set()
+    for route in routes:
+        individual = [loc_id for loc_id in dict.fromkeys(route) if loc_id in allowed]
+        enforce_required_stops(individual, required_stops)
+        if len(individual) < min_locations:
+            possible_additions = [loc_id for loc_id in location_ids if loc_id not in individual]
+            individual.extend(random.sample(possible_additions, min(min_locations - len(individual), len(possible_additions))))
+        if tuple(individual) not in seen:
+            seen.add(tuple(individual))
+            repaired.append(individual)
+    return repaired
+
+
 #Crossover and Mutation Operators
 
-def ox_crossover(ind1, ind2): #A robust ordered crossover (OX) for variable-length routes - combines 2 parent routes (ind1 and ind2) to create a child route
+def ox_crossover(ind1, ind2, rng=random): #A robust ordered crossover (OX) for variable-length routes - combines 2 parent routes (ind1 and ind2) to create a child route
     parent1, parent2 = (ind1, ind2) if len(ind1) < len(ind2) else (ind2, ind1) #shorter route is parent 1, longer route is parent 2
-    slice_start, slice_end = sorted(random.sample(range(len(parent1)), 2)) #selects two indices in parent 1, orders them and uses that 'slice' of the parent to add to the child
+    slice_start, slice_end = sorted(rng.sample(range(len(parent1)), 2)) #selects two indices in parent 1, orders them and uses that 'slice' of the parent to add to the child
     child_slice = parent1[slice_start:slice_end + 1] #starts to create child by copying ids between indices specified in parent 1
     remaining = [item for item in parent2 if item not in child_slice] #locations in parent 2 that are not already in the child_slice, prevents duplicates
     child = remaining[:slice_start] + child_slice + remaining[slice_start:]
@@ -300,105 +376,243 @@ def ox_crossover(ind1, ind2): #A robust ordered crossover (OX) for variable-leng
     return ind1, ind2
 
 
-def random_mutation(individual, all_location_ids, required_stops): #Selects one of three mutation types (add, remove, or swap) at random, suggested in NSGA 22 July File
+def random_mutation(individual, all_location_ids, required_stops, spatial_index=None, allowed_ids=None, rng=random): #Selects one of three mutation types (add, remove, or swap) at random, suggested in NSGA 22 July File. With a spatial index, added and swapped-in stops are usually drawn from the neighbours of the adjacent stop
     mutable_indices = [i for i, loc_id in enumerate(individual) if loc_id not in required_stops]
-    rand = random.random()
+    rand = rng.random()
     if rand < 0.33 and len(individual) < max_locations: #add mutation
-        possible_additions = [loc for loc in all_location_ids if loc not in individual]
-        if possible_additions:
-            individual.append(random.choice(possible_additions)) #randomly appends a new location to the end of the individual (ie the route)
+        nearby = pick_neighbour(spatial_index, individual[-1], individual, allowed_ids, rng) if individual else None
+        if nearby is not None:
+            individual.append(nearby) #appends a location close to the current last stop
+        else:
+            possible_additions = [loc for loc in all_location_ids if loc not in individual]
+            if possible_additions:
+                individual.append(rng.choice(possible_additions)) #randomly appends a new location to the end of the individual (ie the route)
     elif rand < 0.66 and len(individual) > min_locations and mutable_indices: #remove mutation
-        index_to_remove = random.choice(mutable_indices)
+        index_to_remove = rng.choice(mutable_indices)
         individual.pop(index_to_remove)
     elif mutable_indices: #swap mutation
-        idx_to_replace = random.choice(mutable_indices)
-        possible_swaps = [loc for loc in all_location_ids if loc not in individual]
-        if possible_swaps:
-            individual[idx_to_replace] = random.choice(possible_swaps)
+        idx_to_replace = rng.choice(mutable_indices)
+        anchor = individual[idx_to_replace - 1] if idx_to_replace > 0 else individual[min(1, len(individual) - 1)] #previous stop, or the next one for the first stop
+        nearby = pick_neighbour(spatial_index, anchor, individual, allowed_ids, rng)
+        if nearby is not None:
+            individual[idx_to_replace] = nearby
+        else:
+            possible_swaps = [loc for loc in all_location_ids if loc not in individual]
+            if possible_swaps:
+                individual[idx_to_replace] = rng.choice(possible_swaps)
     return individual
 
 
 #Runs NSGA-II Algorithm and generates routes
 
-def get_optimized_routes(user_preferences, required_stops=[], travel_mode = 'walking'): #Runs the NSGA-II algorithm to find the best routes
+def build_toolbox(location_ids, required_stops, evaluator, spatial_index=None, rng=random): #sets up DEAP Toolbox - holds each function defined above so can be used by NSGA-II algorithm, ie whenever a new individual needs to be created, use toolbox.individual
+    toolbox = base.Toolbox()
+    toolbox.register("individual", tools.initIterate, creator.Individual, lambda: generate_individual(location_ids, required_stops, rng))
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+    toolbox.register("mate", ox_crossover, rng=rng) #DEAP alias for crossover is 'mate'
+    toolbox.register("mutate", random_mutation, all_location_ids=location_ids, required_stops=required_stops,
+                     spatial_index=spatial_index, allowed_ids=set(location_ids), rng=rng)
+    toolbox.register("select", sel_nsga2) #same choices as tools.selNSGA2, with an O(N log N) two-objective sort
+    toolbox.register("evaluate", lambda ind: evaluator.evaluate([ind])[0])
+    return toolbox
+
+
+def evolve_generation(pop, toolbox, evaluator, required_stops, population_size, crossover_rate=crossover, mutation_rate=mutation, rng=random): #Runs one generation of selection, crossover, mutation and evaluation and returns the next population
+    offspring = toolbox.select(pop, len(pop)) #chooses best individuals from current population to be parents
+    offspring = [toolbox.clone(ind) for ind in offspring]   #these parents are cloned so the next generation can be changed without affecting the original parents
+
+    for child1, child2 in zip(offspring[::2], offspring[1::2]):
+        if rng.random() < crossover_rate:
+            toolbox.mate(child1, child2) #if condition met, performs order crossover (see above)
+            del child1.fitness.values
+            del child2.fitness.values #deletes old fitness values, so they can be updated when order crossover occurs
+        enforce_required_stops(child1, required_stops)
+        enforce_required_stops(child2, required_stops)
+
+    for mutant in offspring:
+        if rng.random() < mutation_rate:
+            toolbox.mutate(mutant)
+            del mutant.fitness.values
+        enforce_required_stops(mutant, required_stops)
+
+    invalid_ind = [ind for ind in offspring if not ind.fitness.valid] #this block updates all fitness values with the updated ones
+    evaluator.assign_fitness(invalid_ind)
+
+    return toolbox.select(pop + offspring, population_size)
+
+
+def evaluated_individuals(evaluator): #Every distinct route this run has scored (the memo keys), with its fitness - empty without a memo
+    if evaluator.memo is None:
+        return []
+    result = []
+    for route, values in evaluator.memo.items(): #a shared memo is only shared by runs over the same locations
+        ind = creator.Individual(route)
+        ind.fitness.values = values
+        result.append(ind)
+    return result
+
+
+def fresh_individuals(location_ids, required_stops, evaluator, count): #count new random feasible routes, scored
+    routes = repair_routes([generate_individual(location_ids, required_stops) for _ in range(count)], location_ids, required_stops)
+    individuals = [creator.Individual(route) for route in routes]
+    evaluator.assign_fitness(individuals)
+    return individuals
+
+
+def pick_top_routes(front, pop, required_stops, distance_matrix, count=3, padding=()):
+    """
+    Up to `count` distinct routes to return: the front by descending
+    satisfaction, padded from the population's next non-dominated fronts
+    when the front is too small, then from each of `padding` (functions
+    returning scored candidates, only called while routes are missing) in
+    turn. Routes are put in exact stop order first, so two orders of the
+    same stops count as one route. Routes missing a required stop are
+    skipped. Fitness must be re-assigned by the caller.
+    """
+    required = set(required_stops)
+    chosen = []
+    seen = set()
+
+    def add(candidates):
+        for ind in sorted(candidates, key=lambda x: x.fitness.values[1], reverse=True):
+            if len(chosen) >= count:
+                return
+            if not ind or not required.issubset(ind):
+                continue
+            route = creator.Individual(ind)
+            if 3 <= len(route) <= max_exact_stops: #exact stop order for the routes actually returned - same stops and satisfaction, never longer
+                route[:] = exact_order(route, distance_matrix)[0]
+            key = frozenset(route) if 3 <= len(route) <= max_exact_stops else tuple(route) #the exact order of a stop set is unique up to direction
+            if key not in seen:
+                seen.add(key)
+                chosen.append(route)
+
+    def add_by_front(candidates): #best non-dominated fronts of the candidates first
+        objectives = np.array([ind.fitness.values for ind in candidates], dtype=np.float64).reshape(-1, 2)
+        for rows in nondominated_sort_2d(objectives):
+            if len(chosen) >= count:
+                return
+            add([candidates[i] for i in rows.tolist()])
+
+    add(front)
+    for source in [lambda: pop, *padding]: #fewer than 3 distinct routes on the front (3 are always shown) - the final population, then the padding sources
+        if len(chosen) >= count:
+            break
+        add_by_front(source())
+    return chosen
+
+
+def get_optimized_routes(user_preferences, required_stops=[], travel_mode = 'walking', run_info=None, on_generation=None, search_area=None, warm_start=None, generations=None, budget=None, final_population=None): #Runs the NSGA-II algorithm to find the best routes, run_info (if given) is filled with how the run ended and on_generation(generation, total, pop) is called as evolution progresses (the array engine passes only the non-dominated part of pop). search_area (see candidate_pool.parse_search_area) limits which locations are considered, warm_start is a population of an earlier run to resume from, budget (a SearchBudget, default profile when None) sets the search size and time limit and generations overrides its generation count. final_population (a list, if given) receives the routes of the last population once evolution ends
+    budget = budget or resolve_budget()
+    budget.start()
     user_preferences = [int(p) for p in user_preferences]
     required_stops = [int(rs) for rs in required_stops]
 
-    locations_dict = locations_to_dict()
+    locations_dict, pool_info = select_candidate_locations(user_preferences, required_stops, search_area, budget.population_size)
     for stop_id in required_stops:
         if stop_id not in locations_dict:
-            print(f"Error: Required stop {stop_id} is not in the selected category.")
+            print(f"Error: Required stop {stop_id} does not exist.")
             return []
 
     location_ids = list(locations_dict.keys())
+    if pool_info['area_limited']: #a local pool gets its own small matrix and index instead of the shared ones over the whole table
+        latitudes = [locations_dict[loc_id]['latitude'] for loc_id in location_ids]
+        longitudes = [locations_dict[loc_id]['longitude'] for loc_id in location_ids]
+        distance_matrix = LocationDistanceMatrix(location_ids, latitudes, longitudes)
+        spatial_index = SpatialIndex(location_ids, latitudes, longitudes)
+    else:
+        distance_matrix = get_distance_matrix() #pairwise haversine distances, only rebuilt when the Location table changes
+        spatial_index = get_spatial_index() #grid index used to mutate towards nearby locations
+
+    evaluator = PopulationEvaluator(locations_dict, user_preferences, distance_matrix) #scores whole batches of individuals with NumPy instead of one at a time
+    evaluator.memo = fitness_memo_for(evaluator) #duplicate routes are only scored once
+    monitor = ConvergenceMonitor(patience=budget.patience) #stops early once the hypervolume of the front stops improving
+    archive = ParetoArchive(required_stops=required_stops) if archive_size > 0 else None #keeps good routes that a later generation loses to selection
+    local_search = LocalSearch(evaluator) #2-opt on the elite every few generations, see local_search.py
+    generations = budget.generations if generations is None else generations
+    population_size = budget.population_size
+    if warm_start: #resuming - the earlier population, repaired for this request, replaces the heuristic seeds
+        seeds = repair_routes(warm_start, location_ids, required_stops)[:population_size]
+    else:
+        seeds = build_seeds(locations_dict, user_preferences, required_stops, distance_matrix, population_size, min_locations, max_locations) #part of the first population starts from heuristics and earlier fronts
+        seeds = repair_routes(seeds, location_ids, required_stops) #every engine scores, archives and ships seeds as they are, so they must already hold the required stops
+    stop_reason = 'max_generations'
+    if island_count > 1: #island mode - sub-populations evolve in parallel worker processes, see nsga_islands.py
+        pop, stop_reason = evolve_islands(locations_dict, user_preferences, required_stops, distance_matrix, population_size, generations, monitor, on_generation, spatial_index, archive, seeds, budget)
+    elif optimizer_engine == 'array':
+        pop, stop_reason = evolve_array_population(evaluator, required_stops, population_size, generations, monitor, on_generation,
+                                                   spatial_index.local_neighbour_table(location_ids), archive, seeds, local_search, budget)
+    else:
+        toolbox = build_toolbox(location_ids, required_stops, evaluator, spatial_index)
+
+        #Learning Loop
+        pop = [creator.Individual(route) for route in seeds] + toolbox.population(n=population_size - len(seeds)) #heuristic seeds, then random routes up to the population size
+
+        # Evaluate the first generation - goes through database evaluating fitness of these routes
+        evaluator.assign_fitness(pop)
+        monitor.start(pop)
+        if archive is not None:
+            archive.update(pop)
+
+        # Main evolution loop
+        for gen in range(generations):
+            pop = evolve_generation(pop, toolbox, evaluator, required_stops, population_size, budget.crossover, budget.mutation)
+            local_search.step(pop, gen + 1)
+            if archive is not None:
+                archive.update(pop)
+            # Print progress every 10 generations
+            if (gen + 1) % 10 == 0:
+                print(f"Generation {gen + 1}/{generations} complete.")
+            if on_generation is not None:
+                on_generation(gen + 1, generations, pop)
+            if monitor.update(pop) and gen + 1 < generations:
+                stop_reason = 'converged'
+                print(f"Converged after {gen + 1} generations - front unchanged for {monitor.stagnant} generations.")
+                break
+            if budget.expired() and gen + 1 < generations:
+                stop_reason = 'time_budget'
+                print(f"Time budget of {budget.time_budget_ms} ms used up after {gen + 1} generations.")
+                break
 
-    toolbox = base.Toolbox() #sets up DEAP Toolbox - holds each function defined above so can be used by NSGA-II algorithm, ie whenever a new individual needs to be created, use line145
-    toolbox.register("individual", tools.initIterate, creator.Individual, lambda: generate_individual(location_ids, required_stops))
-    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-    toolbox.register("mate", ox_crossover) #DEAP alias for crossover is 'mate'
-    toolbox.register("mutate", random_mutation, all_location_ids=location_ids, required_stops=required_stops)
-    toolbox.register("select", tools.selNSGA2)
-    toolbox.register("evaluate", lambda ind: (
-        compute_distance(ind, locations_dict),
-        compute_satisfaction(ind, locations_dict, user_preferences)
-    ))
-
-    #Learning Loop
-    pop = toolbox.population(n=population) #creates 100 random routes
-
-    # Evaluate the first generation - goes through database evaluating fitness of these routes
-    for ind in pop:
-        if ind: ind.fitness.values = toolbox.evaluate(ind)
-
-    # Main evolution loop
-    for gen in range(no_of_generations):
-        offspring = toolbox.select(pop, len(pop)) #chooses best individuals from current population to be parents
-        offspring = [toolbox.clone(ind) for ind in offspring]   #these parents are cloned so the next generation can be changed without affecting the original parents
-
-        for child1, child2 in zip(offspring[::2], offspring[1::2]):
-            if random.random() < crossover:
-                toolbox.mate(child1, child2) #if condition met, performs order crossover (see above)
-                del child1.fitness.values
-                del child2.fitness.values #deletes old fitness values, so they can be updated when order crossover occurs
-            enforce_required_stops(child1, required_stops)
-            enforce_required_stops(child2, required_stops)
-
-        for mutant in offspring:
-            if random.random() < mutation:
-                toolbox.mutate(mutant)
-                del mutant.fitness.values
-            enforce_required_stops(mutant, required_stops)
-
-        invalid_ind = [ind for ind in offspring if not ind.fitness.valid] #this block updates all fitness values with the updated ones
-        for ind in invalid_ind:
-            if ind: ind.fitness.values = toolbox.evaluate(ind)
-
-        pop = toolbox.select(pop + offspring, population)
-        # Print progress every 10 generations
-        if (gen + 1) % 10 == 0:
-            print(f"Generation {gen + 1}/{no_of_generations} complete.")
-
-    pareto_front = tools.ParetoFront()
-    pareto_front.update(pop) #updates Pareto Front with the new non-dominated solutions from the most recent evaluation
+    if final_population is not None:
+        final_population.extend(list(ind) for ind in pop if ind)
+    if run_info is not None:
+        run_info.update(monitor.summary(stop_reason))
+        run_info['candidates'] = pool_info['candidates']
+        run_info['seeded'] = len(seeds)
+        run_info['warm_start'] = bool(warm_start)
+        run_info.update(budget.summary())
+        if island_count <= 1: #island evaluations happen in the worker processes
+            run_info.update(evaluator.stats())
+            run_info.update(local_search.stats())
+        if archive is not None:
+            run_info.update(archive.stats())
+
+    if archive is not None:
+        archive.update(pop)
+        pareto_front = archive.individuals() #non-dominated over every generation, not just the last one
+    else:
+        pareto_front = tools.ParetoFront()
+        pareto_front.update(pop) #updates Pareto Front with the new non-dominated solutions from the most recent evaluation
 
     valid_solutions = [ind for ind in pareto_front if ind]
     if not valid_solutions:
         print("!!! No valid solutions found in Pareto front. Returning empty list.")
         return []
 
-    sorted_pareto = sorted(valid_solutions, key=lambda x: x.fitness.values[1], reverse=True) #sorts solutions in the pareto front in descending order by satisfaction, so best ones appear first
+    remember_front(user_preferences, valid_solutions)
 
-    if len(sorted_pareto) < 3: #fixes bug where less than 3 solutions are suggested by algorithm, changes to ONLY 3 (as per requirements)
-        extras = [ind for ind in sorted(pop, key=lambda x: x.fitness.values[1], reverse=True)
-                  if ind not in sorted_pareto]
-        sorted_pareto.extend(extras[:3 - len(sorted_pareto)])
-    top_routes = sorted_pareto[:3]
+    top_routes = pick_top_routes(valid_solutions, pop, required_stops, distance_matrix, padding=[
+        lambda: evaluated_individuals(evaluator), #a converged population can shrink to one or two stop sets, but the run scored many more
+        lambda: fresh_individuals(location_ids, required_stops, evaluator, 30), #island runs score in the workers, so the memo here is empty
+    ])
+    evaluator.assign_fitness(top_routes)
 
     routes = []
-    print(f"\n--- Top {min(3, len(sorted_pareto))} Routes for {travel_mode}---")
-    for i, ind in enumerate(top_routes):
-        coordinates = [[locations_dict[loc_id]['longitude'], locations_dict[loc_id]['latitude']] for loc_id in ind]
-        route_data = get_route_data(coordinates, travel_mode) or {}
+    print(f"\n--- Top {len(top_routes)} Routes for {travel_mode}---")
+    route_coordinates = [[[locations_dict[loc_id]['longitude'], locations_dict[loc_id]['latitude']] for loc_id in ind] for ind in top_routes]
+    route_data_list = concurrent_map(lambda coordinates: get_route_data(coordinates, travel_mode) or {}, route_coordinates, 'routes') #the three routes are routed at the same time
+    for i, (ind, route_data) in enumerate(zip(top_routes, route_data_list)):
         accurate_distance = route_data.get('distance', 0)
 
         route_info = {
@@ -416,6 +630,8 @@ def get_optimized_routes(user_preferences, required_stops=[], travel_mode = 'wal
             ],
             'geometry': route_data.get('geometry')
         }
+        if route_data.get('approximate'):
+            route_info['approximate'] = True
         routes.append(route_info)
         print(
             f"Route {i + 1}: Satisfaction = {route_info['satisfaction']:.2f}, Distance = {route_info['distance']:.2f}, Locations ({len(route_info['locations'])}): {[loc['name'] for loc in route_info['locations']]}")
@@ -438,7 +654,10 @@ def recalculate_route_geometry(location_ids, travel_mode='walking'): #Takes a li
     if not route_data:
         return None
 
-    return {
+    details = {
         'distance': route_data.get('distance', 0),
         'geometry': route_data.get('geometry')
     }
+    if route_data.get('approximate'):
+        details['approximate'] = True
+    return details
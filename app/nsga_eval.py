@@ -0,0 +1,191 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+memo_size = int(os.environ.get('NSGA_MEMO_SIZE', '20000')) #fitness values remembered per memo, 0 turns memoisation off
+share_memo_across_runs = os.environ.get('NSGA_SHARED_MEMO', '0') == '1' #reuse one memo for runs with the same preferences and location data
+max_shared_memos = 16
+
+_memo_totals = {'hits': 0, 'misses': 0}
+_memo_lock = threading.Lock()
+_shared_memos = OrderedDict()
+
+
+class FitnessMemo: #Bounded LRU map from a route (tuple of location ids) to its (distance, satisfaction)
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock() #shared memos can be used by concurrent requests
+
+    def get(self, key):
+        with self._lock:
+            values = self._entries.get(key)
+            if values is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        with _memo_lock:
+            _memo_totals['misses' if values is None else 'hits'] += 1
+        return values
+
+    def set(self, key, values):
+        with self._lock:
+            self._entries[key] = values
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self): #Snapshot of (route, (distance, satisfaction)) pairs, oldest first
+        with self._lock:
+            return list(self._entries.items())
+
+
+def fitness_memo_for(evaluator): #Fresh memo for this run, or the shared one for runs that would score every route identically
+    if memo_size <= 0:
+        return None
+    if not share_memo_across_runs:
+        return FitnessMemo(memo_size)
+    key = evaluator.fingerprint()
+    with _memo_lock:
+        memo = _shared_memos.get(key)
+        if memo is None:
+            memo = FitnessMemo(memo_size)
+            _shared_memos[key] = memo
+            while len(_shared_memos) > max_shared_memos:
+                _shared_memos.popitem(last=False)
+        _shared_memos.move_to_end(key)
+        return memo
+
+
+def memo_stats():
+    with _memo_lock:
+        lookups = _memo_totals['hits'] + _memo_totals['misses']
+        return {
+            'shared': share_memo_across_runs,
+            'shared_memos': len(_shared_memos),
+            'hits': _memo_totals['hits'],
+            'misses': _memo_totals['misses'],
+            'hit_rate': _memo_totals['hits'] / lookups if lookups else 0.0,
+        }
+
+
+class PopulationEvaluator: #Scores a whole list of individuals at once instead of one route at a time
+    """
+    Batch version of compute_distance and compute_satisfaction.
+
+    The locations used by one optimisation run are copied into column arrays
+    (latitude, longitude, category match, sentiment) once. Every batch of
+    individuals is then packed into a padded index array plus a length mask,
+    so both objectives are computed with a handful of NumPy operations no
+    matter how many individuals are in the batch.
+    """
+
+    def __init__(self, locations_dict, user_preferences, distance_matrix=None, memo=None):
+        self.location_ids = list(locations_dict.keys())
+        self.index = {loc_id: i for i, loc_id in enumerate(self.location_ids)} #location id -> column position
+        self.latitude = np.array([locations_dict[loc_id]['latitude'] for loc_id in self.location_ids], dtype=np.float64)
+        self.longitude = np.array([locations_dict[loc_id]['longitude'] for loc_id in self.location_ids], dtype=np.float64)
+        self.category = np.array([locations_dict[loc_id]['category_id'] for loc_id in self.location_ids], dtype=np.int64)
+        self.sentiment = np.array([locations_dict[loc_id].get('sentiment', 0) or 0 for loc_id in self.location_ids], dtype=np.float64)
+        self.preference_match = np.isin(self.category, [int(p) for p in user_preferences]).astype(np.float64) #1 if the location matches a preferred category
+        self.distance_matrix = distance_matrix
+        self.matrix_rows = distance_matrix.rows(self.location_ids) if distance_matrix is not None else None #column position -> distance matrix row
+        self.memo = memo
+        self.evaluations = 0 #routes actually scored
+        self.memo_hits = 0 #routes answered from the memo (or duplicated within a batch)
+
+    def fingerprint(self): #Identifies everything a route's score depends on - locations, their coordinates and sentiment, preferences and distance metric
+        digest = hashlib.sha1()
+        for column in (np.asarray(self.location_ids), self.latitude, self.longitude, self.sentiment, self.preference_match):
+            digest.update(column.tobytes())
+        digest.update(b'haversine' if self.distance_matrix is not None else b'degrees')
+        return digest.hexdigest()
+
+    def pack(self, individuals): #Turns a list of routes into an (n, longest route) index array and a mask of which slots are real stops
+        lengths = np.fromiter((len(ind) for ind in individuals), dtype=np.int64, count=len(individuals))
+        width = max(int(lengths.max()) if len(lengths) else 0, 1)
+        mask = np.arange(width) < lengths[:, None]
+        packed = np.zeros((len(individuals), width), dtype=np.int64)
+        index = self.index
+        packed[mask] = np.fromiter((index[loc_id] for ind in individuals for loc_id in ind), dtype=np.int64, count=int(lengths.sum()))
+        return packed, mask, lengths
+
+    def distances(self, packed, mask, lengths): #Distance of every route, same units as compute_distance (metres when a distance matrix is used)
+        if self.matrix_rows is not None:
+            rows = self.matrix_rows[packed]
+            legs = self.distance_matrix.matrix[rows[:, :-1], rows[:, 1:]].astype(np.float64)
+        else:
+            d_lat = self.latitude[packed[:, 1:]] - self.latitude[packed[:, :-1]]
+            d_lon = self.longitude[packed[:, 1:]] - self.longitude[packed[:, :-1]]
+            legs = np.sqrt(d_lat ** 2 + d_lon ** 2)
+        legs = legs * mask[:, 1:] #padding slots contribute nothing
+        totals = legs.sum(axis=1)
+        totals[lengths < 2] = np.inf
+        return totals
+
+    def satisfactions(self, packed, mask, lengths): #Average of category match and sentiment, same formula as compute_satisfaction
+        safe_lengths = np.maximum(lengths, 1)
+        category_satisfaction = (self.preference_match[packed] * mask).sum(axis=1) / safe_lengths
+        sentiment_satisfaction = (self.sentiment[packed] * mask).sum(axis=1) / safe_lengths
+        totals = (category_satisfaction + sentiment_satisfaction) / 2
+        totals[lengths == 0] = 0
+        return totals
+
+    def evaluate_packed(self, packed, mask, lengths): #Both objectives as arrays for routes that are already packed into column positions
+        return self.distances(packed, mask, lengths), self.satisfactions(packed, mask, lengths)
+
+    def evaluate_memoized(self, keys, compute): #Looks every key up in the memo and calls compute(positions) once for the distinct keys that are missing
+        if self.memo is None:
+            self.evaluations += len(keys)
+            distances, satisfactions = compute(list(range(len(keys))))
+            return list(zip(distances.tolist(), satisfactions.tolist()))
+
+        results = [None] * len(keys)
+        missing = {} #key -> positions in this batch
+        for i, key in enumerate(keys):
+            values = self.memo.get(key) if key not in missing else None
+            if values is not None:
+                results[i] = values
+                self.memo_hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            distances, satisfactions = compute([positions[0] for positions in missing.values()])
+            self.evaluations += len(missing)
+            for (key, positions), values in zip(missing.items(), zip(distances.tolist(), satisfactions.tolist())):
+                self.memo.set(key, values)
+                self.memo_hits += len(positions) - 1
+                for i in positions:
+                    results[i] = values
+        return results
+
+    def evaluate(self, individuals): #Returns a (distance, satisfaction) tuple for every individual, in order
+        if not individuals:
+            return []
+        return self.evaluate_memoized(
+            [tuple(ind) for ind in individuals],
+            lambda positions: self.evaluate_packed(*self.pack([individuals[i] for i in positions])),
+        )
+
+    def stats(self):
+        lookups = self.evaluations + self.memo_hits
+        return {
+            'evaluations': self.evaluations,
+            'memo_hits': self.memo_hits,
+            'memo_hit_rate': round(self.memo_hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def assign_fitness(self, individuals): #Evaluates the non-empty individuals in one batch and stores their fitness values
+        to_score = [ind for ind in individuals if ind]
+        for ind, values in zip(to_score, self.evaluate(to_score)):
+            ind.fitness.values = values
+        return len(to_score)
@@ -0,0 +1,229 @@
+import os
+import pickle
+import random
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from app import nsga_core
+from app.nsga_selection import first_front, sel_nsga2
+from app.nsga_eval import FitnessMemo, PopulationEvaluator, memo_size
+from app.local_search import LocalSearch
+
+# --- Island model configuration ---
+island_count = int(os.environ.get('NSGA_ISLANDS', '1')) #1 keeps the original single-population loop
+migration_interval = int(os.environ.get('NSGA_MIGRATION_INTERVAL', '10')) #generations each island evolves between migrations
+migrants_per_island = int(os.environ.get('NSGA_MIGRANTS', '3')) #non-dominated individuals sent to the next island on each migration
+reuse_island_pool = os.environ.get('NSGA_ISLAND_POOL_REUSE', '1') == '1' #keep worker processes alive between requests instead of forking per call
+island_start_method = os.environ.get('NSGA_ISLAND_START_METHOD', 'forkserver') #how worker processes start, the platform default when unavailable
+
+worker_context_cache = 2 #run contexts each worker keeps unpickled, enough for two requests sharing the pool
+
+_island_pool = None
+_island_pool_lock = threading.Lock()
+_contexts = OrderedDict() #shared memory name -> static inputs of a run, in every process that has loaded them
+_contexts_lock = threading.Lock()
+
+
+def _pool_context():
+    """
+    Workers are not forked from the request process: it runs job, stream and
+    routing threads, and a fork taken while one of them holds a lock (the
+    context cache, a memo, stdout) leaves that lock held forever in the
+    child. A forkserver is a single-threaded process that imports this
+    module once, so workers fork from it cheaply without re-importing the
+    Flask app each time; spawn is used where forkserver is missing.
+    """
+    if island_start_method in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context(island_start_method)
+        if island_start_method == 'forkserver':
+            context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context()
+
+
+def get_island_pool(): #Returns the shared worker pool, creating it on first use
+    global _island_pool
+    with _island_pool_lock:
+        if _island_pool is None:
+            _island_pool = ProcessPoolExecutor(max_workers=island_count, mp_context=_pool_context())
+        return _island_pool
+
+
+def shutdown_island_pool():
+    global _island_pool
+    with _island_pool_lock:
+        if _island_pool is not None:
+            _island_pool.shutdown(wait=False, cancel_futures=True)
+            _island_pool = None
+
+
+class IslandContext:
+    """
+    The static inputs of one island run - locations, preferences, required
+    stops, distance matrix and spatial index - pickled once into a shared
+    memory block. Island tasks only carry its name and their population;
+    each worker unpickles the block the first time it sees the name and
+    keeps the result for later epochs. Close it when the run ends.
+    """
+
+    def __init__(self, static):
+        payload = pickle.dumps(static, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shm = SharedMemory(create=True, size=max(len(payload), 1))
+        self.shm.buf[:len(payload)] = payload
+        self.name = self.shm.name
+        self.size = len(payload)
+        _remember_context(self.name, static) #in-process fallback epochs use it without unpickling
+
+    def close(self):
+        with _contexts_lock:
+            _contexts.pop(self.name, None)
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _remember_context(name, static):
+    with _contexts_lock:
+        _contexts[name] = static
+        _contexts.move_to_end(name)
+        while len(_contexts) > worker_context_cache:
+            _contexts.popitem(last=False)
+
+
+def _load_context(name, size): #Static inputs of a run, unpickled from shared memory once per process
+    with _contexts_lock:
+        static = _contexts.get(name)
+        if static is not None:
+            _contexts.move_to_end(name)
+            return static
+    shm = SharedMemory(name=name)
+    try:
+        static = pickle.loads(shm.buf[:size])
+    finally:
+        shm.close()
+    _remember_context(name, static)
+    return static
+
+
+def _evolve_island(task): #Evolves one island for a number of generations and returns its population - in a worker process, or in the request process when the pool broke
+    rng = random.Random(task['seed']) #never reseed the process-wide generator, other request threads use it
+    static = _load_context(task['context'], task['context_size'])
+    evaluator = PopulationEvaluator(static['locations_dict'], static['user_preferences'], static['distance_matrix'],
+                                    memo=FitnessMemo(memo_size) if memo_size > 0 else None) #memo lives for one epoch of this island
+    toolbox = nsga_core.build_toolbox(list(static['locations_dict'].keys()), static['required_stops'], evaluator, static['spatial_index'], rng)
+
+    pop = task['population']
+    evaluator.assign_fitness([ind for ind in pop if not ind.fitness.valid])
+    local_search = LocalSearch(evaluator)
+    for gen in range(task['generations']):
+        pop = nsga_core.evolve_generation(pop, toolbox, evaluator, static['required_stops'], task['population_size'], task['crossover'], task['mutation'], rng)
+        local_search.step(pop, gen + 1)
+    return pop
+
+
+def _run_epoch(tasks): #Evolves every island once, in the worker pool when possible
+    if reuse_island_pool:
+        pool = get_island_pool()
+        try:
+            return list(pool.map(_evolve_island, tasks))
+        except BrokenProcessPool as e: #a worker died - drop the pool so the next request gets a fresh one and finish this epoch in-process
+            print(f"Island pool error: {e}. Running this epoch in the request worker.")
+            shutdown_island_pool()
+            return [_evolve_island(task) for task in tasks]
+
+    try:
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=_pool_context()) as pool:
+            return list(pool.map(_evolve_island, tasks))
+    except BrokenProcessPool as e:
+        print(f"Island pool error: {e}. Running this epoch in the request worker.")
+        return [_evolve_island(task) for task in tasks]
+
+
+def migrate(islands, migrants): #Ring migration - each island receives the best non-dominated individuals of its neighbour and drops its worst
+    emigrants = [first_front(pop)[:migrants] for pop in islands]
+    migrated = []
+    for i, pop in enumerate(islands):
+        incoming = [nsga_core.creator.Individual(ind) for ind in emigrants[i - 1]]
+        for new_ind, old_ind in zip(incoming, emigrants[i - 1]):
+            new_ind.fitness.values = old_ind.fitness.values
+        migrated.append(sel_nsga2(pop + incoming, len(pop)))
+    return migrated
+
+
+def evolve_islands(locations_dict, user_preferences, required_stops, distance_matrix, population_size, generations, monitor=None, on_generation=None, spatial_index=None, archive=None, seeds=(), budget=None):
+    """
+    Island-model NSGA-II. The population is split into island_count
+    sub-populations that evolve independently in the worker pool for
+    migration_interval generations at a time, exchanging non-dominated
+    individuals between epochs. The merged final populations are returned so
+    the caller can build the Pareto front exactly as in single-population mode,
+    together with the reason evolution stopped. Convergence is checked on the
+    merged population after every epoch, which is also when on_generation is
+    called, the archive (if given) is updated and budget's time limit is
+    checked. The first populations are built and scored here, so the monitor
+    and archive start from them exactly as in single-population mode.
+    """
+    island_size = max(population_size // island_count, 4)
+    if spatial_index is not None:
+        spatial_index.neighbour_table() #build it once here rather than in every worker
+    evaluator = PopulationEvaluator(locations_dict, user_preferences, distance_matrix)
+    toolbox = nsga_core.build_toolbox(list(locations_dict.keys()), required_stops, evaluator, spatial_index)
+    seeds = list(seeds)
+    islands = []
+    for i in range(island_count): #each island starts from its share of the seeds (dealt round-robin) plus random routes
+        island_seeds = [nsga_core.creator.Individual(route) for route in seeds[i::island_count][:island_size]]
+        islands.append(island_seeds + toolbox.population(n=island_size - len(island_seeds)))
+    merged = [ind for pop in islands for ind in pop]
+    evaluator.assign_fitness(merged)
+    if monitor is not None:
+        monitor.start(merged)
+    if archive is not None:
+        archive.update(merged)
+    context = IslandContext({
+        'locations_dict': locations_dict,
+        'user_preferences': user_preferences,
+        'required_stops': required_stops,
+        'distance_matrix': distance_matrix,
+        'spatial_index': spatial_index,
+    })
+    try:
+        return _evolve_islands(context, islands, island_size, generations, monitor, on_generation, archive, budget)
+    finally:
+        context.close()
+
+
+def _evolve_islands(context, islands, island_size, generations, monitor, on_generation, archive, budget):
+    remaining = generations
+    while remaining > 0:
+        epoch = min(migration_interval, remaining)
+        tasks = [{
+            'context': context.name,
+            'context_size': context.size,
+            'population': pop,
+            'population_size': island_size,
+            'generations': epoch,
+            'seed': random.randrange(2 ** 32),
+            'crossover': budget.crossover if budget is not None else nsga_core.crossover,
+            'mutation': budget.mutation if budget is not None else nsga_core.mutation,
+        } for pop in islands]
+        islands = _run_epoch(tasks)
+        remaining -= epoch
+        print(f"Generation {generations - remaining}/{generations} complete on {island_count} islands.")
+        merged = [ind for pop in islands for ind in pop]
+        if archive is not None:
+            archive.update(merged)
+        if on_generation is not None:
+            on_generation(generations - remaining, generations, merged)
+        converged = monitor is not None and monitor.update(merged, generations=epoch)
+        if converged and remaining > 0:
+            print(f"Converged after {generations - remaining} generations on {island_count} islands.")
+            return merged, 'converged'
+        if budget is not None and budget.expired() and remaining > 0:
+            print(f"Time budget of {budget.time_budget_ms} ms used up after {generations - remaining} generations on {island_count} islands.")
+            return merged, 'time_budget'
+        if remaining > 0 and migrants_per_island > 0:
+            islands = migrate(islands, migrants_per_island)
+
+    return [ind for pop in islands for ind in pop], 'max_generations'
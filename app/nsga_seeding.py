@@ -0,0 +1,127 @@
+import os
+import random
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# --- Warm-start configuration ---
+seed_share = float(os.environ.get('NSGA_SEED_SHARE', '0.2')) #share of the initial population built by heuristics instead of at random, 0 = all random
+seed_history_size = int(os.environ.get('NSGA_SEED_HISTORY', '64')) #preference sets whose final fronts are remembered for seeding later runs
+
+_history = OrderedDict() #sorted preference tuple -> routes of that run's final front, most recently used last
+_history_lock = threading.Lock()
+
+
+def remember_front(user_preferences, routes): #Stores a finished run's non-dominated routes so later runs with overlapping preferences can start from them
+    if seed_history_size <= 0 or not routes:
+        return
+    key = tuple(sorted({int(p) for p in user_preferences}))
+    with _history_lock:
+        _history[key] = [tuple(route) for route in routes]
+        _history.move_to_end(key)
+        while len(_history) > seed_history_size:
+            _history.popitem(last=False)
+
+
+def past_front_routes(user_preferences, location_ids): #Remembered routes from runs sharing at least one preference, closest preference sets first, limited to routes inside this run's candidate pool
+    wanted = {int(p) for p in user_preferences}
+    pool = set(location_ids)
+    with _history_lock:
+        entries = list(_history.items())
+    scored = []
+    for key, routes in entries:
+        overlap = len(wanted & set(key)) / max(len(wanted | set(key)), 1)
+        if overlap > 0:
+            scored.append((overlap, routes))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [list(route) for _, routes in scored for route in routes if pool.issuperset(route)]
+
+
+class RouteSeeder:
+    """
+    Builds starting routes near good regions of the search space:
+    greedy nearest-neighbour walks through preference-matching locations,
+    short tours of the best-reviewed places, and final fronts of earlier runs
+    with overlapping preferences. Every route has min_length to max_length
+    stops, no repeats, and all required stops.
+    """
+
+    def __init__(self, locations_dict, user_preferences, required_stops, distance_matrix, min_length, max_length):
+        self.location_ids = list(locations_dict.keys())
+        self.required_stops = list(required_stops)
+        self.min_length = min_length
+        self.max_length = max_length
+        preferred = {int(p) for p in user_preferences}
+        self.matching = [loc_id for loc_id in self.location_ids if locations_dict[loc_id]['category_id'] in preferred]
+        self.by_sentiment = sorted(self.location_ids, key=lambda loc_id: (
+            locations_dict[loc_id]['category_id'] not in preferred,
+            -(locations_dict[loc_id].get('sentiment') or 0),
+        ))
+        self.position = {loc_id: i for i, loc_id in enumerate(self.location_ids)}
+        rows = distance_matrix.rows(self.location_ids)
+        self.distances = distance_matrix.matrix[np.ix_(rows, rows)] #pairwise metres within the candidate pool
+
+    def _target_length(self):
+        return random.randint(max(self.min_length, len(self.required_stops)), max(self.max_length, len(self.required_stops)))
+
+    def nearest_neighbour(self, candidates, start=None): #Greedy walk from start through the closest unvisited candidates, leaving room for the required stops
+        candidates = list(dict.fromkeys(list(candidates) + self.required_stops))
+        length = min(self._target_length(), len(candidates))
+        if len(self.required_stops) >= length and start not in self.required_stops: #required stops fill the route, an optional start would push one of them out
+            start = random.choice(self.required_stops)
+        start = start if start is not None else random.choice(candidates)
+        route = [start]
+        missing = [stop for stop in self.required_stops if stop != start]
+        while len(route) < length:
+            options = missing if len(missing) >= length - len(route) else [loc_id for loc_id in candidates if loc_id not in route]
+            here = self.position[route[-1]]
+            nearest = min(options, key=lambda loc_id: self.distances[here, self.position[loc_id]])
+            route.append(nearest)
+            if nearest in missing:
+                missing.remove(nearest)
+        return route
+
+    def greedy_route(self): #Nearest-neighbour walk over the preference-matching locations
+        return self.nearest_neighbour(self.matching if len(self.matching) >= self.min_length else self.location_ids)
+
+    def sentiment_route(self): #Random pick of the best-reviewed (preferred first) places, visited in nearest-neighbour order
+        shortlist = self.by_sentiment[:max(2 * self.max_length, self.min_length)]
+        picked = random.sample(shortlist, min(self._target_length(), len(shortlist)))
+        return self.nearest_neighbour(picked, start=picked[0])
+
+    def fit(self, route): #Adapts a remembered route to this run - adds missing required stops and trims to max_length
+        route = list(dict.fromkeys(route))
+        for stop in self.required_stops:
+            if stop not in route:
+                route.append(stop)
+        optional = [loc_id for loc_id in route if loc_id not in self.required_stops]
+        while len(route) > self.max_length and optional:
+            route.remove(optional.pop())
+        return route if len(route) >= min(self.min_length, len(self.location_ids)) else None
+
+    def seeds(self, count, past_routes=()): #Up to count distinct routes - a third from earlier fronts at most, the rest split between the two heuristics
+        routes = []
+        seen = set()
+
+        def add(route):
+            if route and tuple(route) not in seen:
+                seen.add(tuple(route))
+                routes.append(route)
+
+        for route in past_routes:
+            if len(routes) >= count // 3:
+                break
+            add(self.fit(route))
+        attempts = 0
+        while len(routes) < count and attempts < 4 * count: #duplicates are dropped, so allow a few extra tries
+            add(self.greedy_route() if attempts % 2 == 0 else self.sentiment_route())
+            attempts += 1
+        return routes
+
+
+def build_seeds(locations_dict, user_preferences, required_stops, distance_matrix, population_size, min_length, max_length): #Heuristic routes for seed_share of the initial population
+    count = int(round(population_size * seed_share))
+    if count <= 0 or len(locations_dict) < min_length or distance_matrix is None:
+        return []
+    seeder = RouteSeeder(locations_dict, user_preferences, required_stops, distance_matrix, min_length, max_length)
+    return seeder.seeds(count, past_front_routes(user_preferences, locations_dict.keys()))
@@ -0,0 +1,136 @@
+import bisect
+import numpy as np
+
+
+def fitness_groups(objectives): #Distinct (distance, satisfaction) points in order of first appearance, and the point of every row - DEAP sorts distinct fitnesses, not individuals
+    values = np.asarray(objectives, dtype=np.float64).reshape(-1, 2) + 0.0 #folds -0.0 into 0.0, DEAP treats them as the same fitness
+    unique, first, inverse = np.unique(values, axis=0, return_index=True, return_inverse=True)
+    appearance = np.argsort(first, kind='stable')
+    position = np.empty(len(appearance), dtype=np.int64)
+    position[appearance] = np.arange(len(appearance))
+    return unique[appearance], position[inverse.reshape(-1)]
+
+
+def front_ranks(points):
+    """
+    Front number (0 = non-dominated) of every distinct point in O(N log N).
+    Points are swept by increasing distance; the newest member of each front
+    has that front's best satisfaction, so a point joins the first front whose
+    newest member has lower satisfaction than it, found by binary search.
+    """
+    loss = (-points[:, 1]).tolist() #satisfaction as a minimised value, so every front's newest loss is increasing front to front
+    sweep = np.lexsort((-points[:, 1], points[:, 0]))
+    ranks = np.empty(len(points), dtype=np.int64)
+    newest = []
+    for i in sweep.tolist():
+        rank = bisect.bisect_right(newest, loss[i])
+        if rank == len(newest):
+            newest.append(loss[i])
+        else:
+            newest[rank] = loss[i]
+        ranks[i] = rank
+    return ranks
+
+
+def range_max(values, lo, hi): #max(values[lo[i]:hi[i]]) for every query, ranges must be non-empty - sparse table, O(N log N)
+    table = [np.asarray(values)]
+    width = 1
+    while width * 2 <= len(values):
+        table.append(np.maximum(table[-1][:-width], table[-1][width:]))
+        width *= 2
+    level = np.frexp((hi - lo).astype(np.float64))[1] - 1 #floor(log2(range length)), exact for integers
+    result = np.empty(len(lo), dtype=table[0].dtype)
+    for j in np.unique(level).tolist():
+        rows = level == j
+        result[rows] = np.maximum(table[j][lo[rows]], table[j][hi[rows] - (1 << j)])
+    return result
+
+
+def deap_front_order(points, previous, members):
+    """
+    Orders the points of one front the way sortNondominated lists them: by the
+    position in the previous front of the last point that dominates them, then
+    by first appearance. In two objectives the dominators of a point form a
+    contiguous run of the previous front once it is sorted by distance.
+    """
+    stair = np.argsort(points[previous, 0], kind='stable') #previous front by distance - satisfaction rises along it
+    distance = points[previous[stair], 0]
+    satisfaction = points[previous[stair], 1]
+    lo = np.searchsorted(satisfaction, points[members, 1], side='left') #first point at least as satisfying
+    hi = np.searchsorted(distance, points[members, 0], side='right') #points no longer than the member
+    last = range_max(stair, lo, hi)
+    return members[np.lexsort((members, last))]
+
+
+def nondominated_sort_2d(objectives, k=None):
+    """
+    Two-objective equivalent of tools.sortNondominated(individuals, k): fronts
+    of row indices, best first, each in the same order DEAP produces, and only
+    as many fronts as are needed to cover k rows.
+    """
+    n = len(objectives)
+    k = n if k is None else k
+    if k == 0 or n == 0:
+        return []
+    points, group = fitness_groups(objectives)
+    ranks = front_ranks(points)
+    by_point = np.argsort(group, kind='stable')
+    rows_of_point = np.split(by_point, np.cumsum(np.bincount(group, minlength=len(points)))[:-1])
+
+    by_rank = np.argsort(ranks, kind='stable')
+    point_fronts = np.split(by_rank, np.cumsum(np.bincount(ranks))[:-1])
+    fronts = []
+    covered = 0
+    previous = None
+    for members in point_fronts:
+        if previous is not None:
+            members = deap_front_order(points, previous, members)
+        fronts.append(np.concatenate([rows_of_point[p] for p in members.tolist()]))
+        covered += len(fronts[-1])
+        previous = members
+        if covered >= min(n, k):
+            break
+    return fronts
+
+
+def crowding_distance(objectives): #Crowding distance of every point in one front, identical to DEAP's assignCrowdingDist including how ties are ordered
+    n = len(objectives)
+    distances = np.zeros(n)
+    if n == 0:
+        return distances
+    n_objectives = objectives.shape[1]
+    order = np.arange(n)
+    for i in range(n_objectives):
+        order = order[np.argsort(objectives[order, i], kind='stable')] #DEAP re-sorts the already sorted list, so earlier objectives break ties
+        values = objectives[order, i]
+        distances[order[0]] = np.inf
+        distances[order[-1]] = np.inf
+        if values[-1] == values[0]:
+            continue
+        with np.errstate(invalid='ignore'):
+            distances[order[1:-1]] += (values[2:] - values[:-2]) / (n_objectives * (values[-1] - values[0]))
+    return distances
+
+
+def select_nsga2(objectives, k): #Row indices chosen by NSGA-II selection, in the order tools.selNSGA2 returns them
+    fronts = nondominated_sort_2d(objectives, k)
+    if not fronts:
+        return np.empty(0, dtype=np.int64)
+    chosen = fronts[:-1]
+    remaining = k - sum(len(front) for front in chosen)
+    if remaining > 0:
+        last = fronts[-1]
+        crowding = crowding_distance(np.asarray(objectives, dtype=np.float64)[last])
+        chosen.append(last[np.argsort(-crowding, kind='stable')[:remaining]])
+    return np.concatenate(chosen) if chosen else np.empty(0, dtype=np.int64)
+
+
+def sel_nsga2(individuals, k): #Drop-in replacement for tools.selNSGA2 on the (distance, satisfaction) fitness
+    objectives = np.array([ind.fitness.values for ind in individuals], dtype=np.float64).reshape(-1, 2)
+    return [individuals[i] for i in select_nsga2(objectives, k).tolist()]
+
+
+def first_front(individuals): #Same as tools.sortNondominated(individuals, len(individuals), first_front_only=True)[0]
+    objectives = np.array([ind.fitness.values for ind in individuals], dtype=np.float64).reshape(-1, 2)
+    fronts = nondominated_sort_2d(objectives, 1)
+    return [individuals[i] for i in fronts[0].tolist()] if fronts else []
@@ -0,0 +1,267 @@
+import time
+import uuid
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.nsga_convergence import non_dominated
+from app.route_cache import get_cached_optimized_routes, get_data_version, make_cache_key
+
+max_front_size = 10 #provisional routes sent to subscribers per generation
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class OptimizationCancelled(Exception): #Raised inside the optimiser when every streaming client of a job has gone away
+    shared_with_waiters = False #single-flight waiters on the same request run it themselves instead of failing too
+
+
+def front_payload(generation, total, pop):
+    return {
+        'generation': generation,
+        'total_generations': total,
+        'front': [
+            {
+                'distance': ind.fitness.values[0],
+                'satisfaction': ind.fitness.values[1],
+                'location_ids': list(ind),
+            } for ind in non_dominated(pop)[:max_front_size]
+        ],
+    }
+
+
+class OptimizeJob:
+    def __init__(self, user_preferences, required_stops, travel_mode, search_area=None, client_token=None, budget=None, key=None, cancellable=False):
+        self.id = uuid.uuid4().hex
+        self.key = key #request cache key - streams of an identical request join this job instead of starting another
+        self.cancellable = cancellable #started by a stream - cancelled once no stream is watching, jobs polled through the API never are
+        self.cancelled = False
+        self.user_preferences = user_preferences
+        self.required_stops = required_stops
+        self.travel_mode = travel_mode
+        self.search_area = search_area
+        self.client_token = client_token
+        self.budget = budget #its clock starts when the job runs, not while it is queued
+        self.status = 'queued' #queued -> running -> succeeded / failed
+        self.generation = 0
+        self.total_generations = 0
+        self.stage = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._subscribers = [] #event queues of the streams following this job
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def subscribe(self): #Queue receiving ('generation' | 'result' | 'error', payload) events and then None; a finished job replays its outcome
+        events = queue.Queue()
+        with self._lock:
+            if self.finished:
+                self._final_events(events)
+            else:
+                self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events): #Returns how many streams still follow the job
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            for events in self._subscribers:
+                events.put(event)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def _final_events(self, events):
+        if self.status == 'succeeded':
+            events.put(('result', self.result))
+        elif self.status == 'failed':
+            events.put(('error', {'error': 'route optimization failed', 'detail': self.error}))
+        events.put(None)
+
+    def finish(self, status, result=None, error=None): #Sets the outcome and hands it to every subscriber in one step, so a stream joining now cannot miss it
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.status = status
+            self.stage = 'finished'
+            self.finished_at = time.time()
+            for events in self._subscribers:
+                self._final_events(events)
+            self._subscribers = []
+
+    @property
+    def progress(self): #Rough completion fraction - evolution is most of the work, routing calls are the last step
+        if self.status == 'succeeded':
+            return 1.0
+        if not self.total_generations:
+            return 0.0
+        return round(0.9 * self.generation / self.total_generations, 3)
+
+    def to_dict(self):
+        payload = {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'generation': self.generation,
+            'total_generations': self.total_generations,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.result is not None:
+            payload['result'] = self.result
+        if self.error is not None:
+            payload['error'] = self.error
+        return payload
+
+
+class OptimizeJobManager:
+    """
+    Runs route optimisations on a bounded background thread pool so the HTTP
+    handler can return a job id straight away. Jobs live in this process only
+    and are dropped `ttl` seconds after they finish; with several gunicorn
+    workers a job can only be polled on the worker that accepted it.
+    Streaming requests run here too: a stream subscribes to the active job
+    of an identical request (same cache key) or starts one, so concurrent
+    streams share a run and its progress events, and the pool bounds how
+    many optimisations run at once. Stream jobs never join a synchronous
+    or polled run of the same request through the single flight, whose
+    progress they could not see; polled jobs do.
+    """
+
+    def __init__(self, flask_app, max_workers=2, max_pending=20, ttl=600):
+        self.app = flask_app
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='optimize-job')
+        self._jobs = {}
+        self._active = {} #cache key -> queued or running job
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def _add(self, job): #Registers a new job, caller holds self._lock
+        pending = sum(1 for existing in self._jobs.values() if existing.status in ('queued', 'running'))
+        if pending >= self.max_pending:
+            raise QueueFullError(f"{pending} optimisation jobs already pending")
+        self._jobs[job.id] = job
+        self._active[job.key] = job
+
+    def submit(self, user_preferences, required_stops, travel_mode, search_area=None, client_token=None, budget=None):
+        self._expire()
+        key = make_cache_key(user_preferences, required_stops, travel_mode, get_data_version(), search_area, budget)
+        job = OptimizeJob(user_preferences, required_stops, travel_mode, search_area, client_token, budget, key=key)
+        with self._lock:
+            self._add(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def subscribe(self, user_preferences, required_stops, travel_mode, search_area=None, client_token=None, budget=None):
+        """
+        Joins the queued or running job of an identical request, or queues a
+        new cancellable one. Returns (job, events) - see OptimizeJob.subscribe.
+        Raises QueueFullError when a new job would exceed max_pending.
+        """
+        self._expire()
+        key = make_cache_key(user_preferences, required_stops, travel_mode, get_data_version(), search_area, budget)
+        with self._lock:
+            job = self._active.get(key)
+            started = job is None or job.finished or job.cancelled
+            if started:
+                job = OptimizeJob(user_preferences, required_stops, travel_mode, search_area, client_token, budget, key=key, cancellable=True)
+                self._add(job)
+            events = job.subscribe()
+        if started:
+            self._executor.submit(self._run, job)
+        return job, events
+
+    def unsubscribe(self, job, events): #A stream went away - its job is cancelled at the next generation once nobody is left watching
+        with self._lock:
+            if job.unsubscribe(events) == 0 and job.cancellable and not job.finished:
+                job.cancelled = True
+
+    def get(self, job_id):
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        try:
+            if job.cancelled: #every stream left while the job was queued
+                job.finish('cancelled')
+                return
+            job.status = 'running'
+            job.stage = 'evolving'
+            job.started_at = time.time()
+
+            def on_generation(generation, total, pop):
+                if job.cancelled:
+                    raise OptimizationCancelled()
+                job.generation = generation
+                job.total_generations = total
+                if job.has_subscribers():
+                    job.publish(('generation', front_payload(generation, total, pop)))
+
+            with self.app.app_context():
+                try:
+                    run_info = {}
+                    routes = get_cached_optimized_routes(
+                        job.user_preferences, job.required_stops, job.travel_mode,
+                        run_info=run_info, on_generation=on_generation, search_area=job.search_area,
+                        client_token=job.client_token, budget=job.budget,
+                        coalesce=not job.cancellable, #a stream that joined another request's run would get no generation events
+                    )
+                    job.finish('succeeded', result={'routes': routes, 'optimization': run_info})
+                except OptimizationCancelled:
+                    print(f"--- Streaming clients of job {job.id} disconnected, optimisation cancelled ---")
+                    job.finish('cancelled')
+                except Exception as e:
+                    print(f"Error during optimisation job {job.id}: {e}")
+                    job.finish('failed', error=str(e))
+        finally:
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                config = current_app.config
+                _job_manager = OptimizeJobManager(
+                    current_app._get_current_object(),
+                    max_workers=config.get('OPTIMIZE_JOB_WORKERS', 2),
+                    max_pending=config.get('OPTIMIZE_JOB_MAX_PENDING', 20),
+                    ttl=config.get('OPTIMIZE_JOB_TTL', 600),
+                )
+    return _job_manager
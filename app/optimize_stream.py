@@ -0,0 +1,41 @@
+import json
+import queue
+from app.optimize_jobs import get_job_manager
+
+keepalive_seconds = 15 #comment line sent while nothing else happens, stops proxies from closing an idle stream
+
+
+def sse_event(event, data): #Formats one server-sent event
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_optimization(user_preferences, required_stops, travel_mode, search_area=None, client_token=None, budget=None):
+    """
+    Runs an optimisation on the job manager's bounded pool and yields
+    server-sent events: a `generation` event with the current non-dominated
+    front after every generation, then one `result` event with the final
+    routes and geometry (or an `error` event). Identical concurrent requests
+    follow the same job, which runs its own search rather than joining an
+    identical synchronous request in flight. The job is queued when this is
+    called, so a full queue raises QueueFullError before any event is sent.
+    If every client of the job disconnects, it is cancelled at the next
+    generation.
+    """
+    manager = get_job_manager()
+    job, events = manager.subscribe(user_preferences, required_stops, travel_mode, search_area, client_token, budget)
+
+    def generate():
+        try:
+            while True:
+                try:
+                    item = events.get(timeout=keepalive_seconds)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    return
+                yield sse_event(*item)
+        finally: #runs when the stream finishes or the client disconnects
+            manager.unsubscribe(job, events)
+
+    return generate()
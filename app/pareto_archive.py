@@ -0,0 +1,75 @@
+import os
+import bisect
+import numpy as np
+from app import nsga_core
+from app.nsga_convergence import non_dominated
+
+archive_size = int(os.environ.get('NSGA_ARCHIVE_SIZE', '50')) #non-dominated routes kept across generations, 0 = only use the final population
+
+
+class ParetoArchive:
+    """
+    Non-dominated routes seen at any point of a run, not only in the final
+    population. Entries are kept sorted by distance, so satisfaction rises
+    strictly along the list: whether a new route is dominated, where it goes
+    and which entries it dominates are all found by binary search. Storing
+    the result is a slice assignment on plain lists, which shifts the entries
+    after it, so one insert is O(n) in the archive size rather than O(log n).
+    The archive never holds more than max_size + 1 routes, and pruning scans
+    them all anyway, so this stays a short memmove. Once the archive holds
+    more than max_size routes the most crowded interior entry is dropped; the
+    shortest and the most satisfying routes are always kept.
+    Routes missing one of `required_stops` are never archived.
+    """
+
+    def __init__(self, max_size=None, required_stops=()):
+        self.max_size = archive_size if max_size is None else max_size
+        self.required_stops = set(required_stops)
+        self.distances = []
+        self.satisfactions = []
+        self.routes = []
+        self.accepted = 0 #routes that entered the archive, including ones later dominated or pruned
+
+    def __len__(self):
+        return len(self.routes)
+
+    def insert(self, route, distance, satisfaction): #Offers one route, returns True if it entered the archive - O(log n) search, O(n) list update
+        if not np.isfinite(distance) or not self.required_stops.issubset(route):
+            return False
+        i = bisect.bisect_right(self.distances, distance)
+        if i > 0 and self.satisfactions[i - 1] >= satisfaction: #an archived route is no longer and at least as satisfying
+            return False
+        start = bisect.bisect_left(self.distances, distance) #same-distance entries before i are less satisfying, so dominated
+        end = bisect.bisect_right(self.satisfactions, satisfaction, lo=i) #longer entries that are no more satisfying
+        self.distances[start:end] = [distance]
+        self.satisfactions[start:end] = [satisfaction]
+        self.routes[start:end] = [tuple(route)]
+        self.accepted += 1
+        if len(self.routes) > self.max_size:
+            self._prune()
+        return True
+
+    def _prune(self): #Drops the interior entry whose neighbours are closest together, using the normalised crowding distance
+        if len(self.routes) < 3:
+            return
+        distance = np.asarray(self.distances)
+        satisfaction = np.asarray(self.satisfactions)
+        crowding = (distance[2:] - distance[:-2]) / max(distance[-1] - distance[0], 1e-12) \
+            + (satisfaction[2:] - satisfaction[:-2]) / max(satisfaction[-1] - satisfaction[0], 1e-12)
+        j = int(np.argmin(crowding)) + 1
+        del self.distances[j], self.satisfactions[j], self.routes[j]
+
+    def update(self, pop): #Offers the non-dominated individuals of a population
+        for ind in non_dominated(pop):
+            self.insert(ind, *ind.fitness.values)
+
+    def individuals(self): #Archived routes as DEAP individuals, most satisfying first
+        result = []
+        for route, distance, satisfaction in zip(reversed(self.routes), reversed(self.distances), reversed(self.satisfactions)):
+            ind = nsga_core.creator.Individual(route)
+            ind.fitness.values = (distance, satisfaction)
+            result.append(ind)
+        return result
+
+    def stats(self):
+        return {'archive_size': len(self), 'archive_accepted': self.accepted}
@@ -0,0 +1,137 @@
+import math
+import numpy as np
+from app.distance_matrix import EARTH_RADIUS_M
+
+default_precision = 5 #Google's precision, ORS and OSRM clients often use 6
+max_precision = 7 #the encoder packs each value into at most 8 five-bit chunks, enough for 1e-7 degrees
+_chunk_shifts = np.arange(8, dtype=np.int64) * 5
+
+
+class GeometryFormatError(ValueError): #Raised for an unknown geometry_format or an invalid precision / tolerance in a request
+    pass
+
+
+def decode_polyline(encoded, precision=default_precision):
+    """
+    Decodes an encoded polyline (Google's algorithm) into [lon, lat] pairs,
+    vectorised with NumPy: the 5-bit chunks of every value are summed in
+    one pass instead of character by character.
+    """
+    if not encoded:
+        return []
+    chars = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    ends = chars < 0x20 #the last chunk of every value has the continuation bit clear
+    if not ends[-1]:
+        raise ValueError("Encoded polyline ends in the middle of a value.")
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    value_index = np.cumsum(np.concatenate(([0], ends[:-1])))
+    positions = np.arange(len(chars)) - starts[value_index]
+    values = np.add.reduceat((chars & 0x1f) << (positions * 5), starts)
+    if len(values) % 2:
+        raise ValueError("Encoded polyline has an odd number of values.")
+    deltas = (values >> 1) ^ -(values & 1) #zigzag back to signed
+    lat_lng = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+    return lat_lng[:, ::-1].tolist()
+
+
+def encode_polyline(coordinates, precision=default_precision):
+    """
+    Encodes [lon, lat] pairs as a polyline string, the inverse of
+    decode_polyline. Every value is split into 5-bit chunks at once as an
+    N x 8 array; only the chunks each value needs are kept.
+    """
+    if len(coordinates) == 0:
+        return ''
+    points = np.asarray(coordinates, dtype=np.float64)
+    scaled = np.round(points[:, ::-1] * 10 ** precision).astype(np.int64) #[lat, lng] rows
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel() #lat, lng, lat, lng, ... each relative to the previous point
+    zigzag = (deltas << 1) ^ (deltas >> 63)
+    shifted = zigzag[:, None] >> _chunk_shifts
+    lengths = np.maximum((shifted > 0).sum(axis=1), 1)
+    column = np.arange(len(_chunk_shifts))
+    chunks = (shifted & 0x1f) | np.where(column < lengths[:, None] - 1, 0x20, 0)
+    return (chunks[column < lengths[:, None]] + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def _segment_distances(points, start, end): #Distance from every point to the segment start-end, in the units of the inputs
+    segment = end - start
+    length_sq = float(segment @ segment)
+    if length_sq == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ segment / length_sq, 0, 1)
+    return np.hypot(*(points - (start + t[:, None] * segment)).T)
+
+
+def simplify_line(coordinates, tolerance_m):
+    """
+    Douglas-Peucker simplification of [lon, lat] pairs: keeps the fewest
+    points such that no dropped point is more than tolerance_m metres from
+    the simplified line. Distances use a local equirectangular projection,
+    which is accurate at route scale. The first and last points are kept.
+    """
+    if len(coordinates) < 3 or not tolerance_m:
+        return coordinates
+    points = np.asarray(coordinates, dtype=np.float64)
+    lat0 = math.radians(float(points[:, 1].mean()))
+    xy = np.radians(points) * EARTH_RADIUS_M
+    xy[:, 0] *= math.cos(lat0)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(xy[first + 1:last], xy[first], xy[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return points[keep].tolist()
+
+
+class GeometryFormat:
+    """
+    How route geometry is written in a response. 'geojson' (the default)
+    keeps the LineString under 'geometry'; 'polyline' replaces it with an
+    encoded 'polyline' string and its 'polyline_precision'. Either can be
+    simplified first with a Douglas-Peucker tolerance in metres.
+    """
+
+    def __init__(self, name='geojson', precision=default_precision, tolerance_m=None):
+        self.name = name
+        self.precision = precision
+        self.tolerance_m = tolerance_m
+
+    def format_route(self, route): #Copy of a route (or route details) dict with its geometry rewritten - cached results are never modified
+        geometry = route.get('geometry')
+        if not geometry or (self.name == 'geojson' and not self.tolerance_m):
+            return route
+        coordinates = simplify_line(geometry.get('coordinates') or [], self.tolerance_m)
+        formatted = dict(route)
+        if self.name == 'polyline':
+            del formatted['geometry']
+            formatted['polyline'] = encode_polyline(coordinates, self.precision)
+            formatted['polyline_precision'] = self.precision
+        else:
+            formatted['geometry'] = {**geometry, 'coordinates': coordinates}
+        return formatted
+
+    def format_routes(self, routes):
+        return [self.format_route(route) for route in routes]
+
+
+def parse_geometry_format(data): #Reads the optional geometry_format, polyline_precision and simplify_tolerance_m fields of a request body
+    name = data.get('geometry_format') or 'geojson'
+    if name not in ('geojson', 'polyline'):
+        raise GeometryFormatError("geometry_format must be geojson or polyline")
+    precision = data.get('polyline_precision', default_precision)
+    if isinstance(precision, bool) or not isinstance(precision, int) or not 1 <= precision <= max_precision:
+        raise GeometryFormatError(f"polyline_precision must be an integer between 1 and {max_precision}")
+    tolerance_m = data.get('simplify_tolerance_m')
+    if tolerance_m is not None:
+        if isinstance(tolerance_m, bool) or not isinstance(tolerance_m, (int, float)) or not math.isfinite(tolerance_m) or tolerance_m < 0:
+            raise GeometryFormatError("simplify_tolerance_m must be a non-negative number of metres")
+    return GeometryFormat(name, precision, tolerance_m)
@@ -0,0 +1,80 @@
+import time
+import threading
+from collections import OrderedDict
+from flask import current_app, request
+
+
+class PopulationCache:
+    """
+    Final GA population of each client's latest run, kept for `ttl` seconds
+    in this worker. A follow-up request that only adds or removes up to
+    `max_edit` preferences / required stops (same search area) can resume
+    from that population instead of a random one. Entries are keyed by client
+    token, so one client never resumes from another's population.
+    """
+
+    def __init__(self, max_entries, ttl, max_edit):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_edit = max_edit
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.resumed = 0
+        self.cold = 0
+
+    def find(self, token, signature): #Routes of the token's last run when the new request is a small edit of it, else None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and time.time() - entry['stored_at'] > self.ttl:
+                del self._entries[token]
+                entry = None
+            usable = entry is not None and request_edit_distance(entry['signature'], signature) <= self.max_edit
+            if usable:
+                self.resumed += 1
+            else:
+                self.cold += 1
+            return entry['routes'] if usable else None
+
+    def store(self, token, signature, routes):
+        with self._lock:
+            self._entries[token] = {'stored_at': time.time(), 'signature': signature, 'routes': [tuple(route) for route in routes]}
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'resumed': self.resumed, 'cold': self.cold}
+
+
+def request_edit_distance(old, new): #Preferences plus required stops added or removed between two normalised requests; travel mode does not affect evolution
+    if old.get('search_area') != new.get('search_area'):
+        return float('inf')
+    preferences = set(old['preferences']) ^ set(new['preferences'])
+    stops = set(old['required_stops']) ^ set(new['required_stops'])
+    return len(preferences) + len(stops)
+
+
+def optimizer_client_token(): #X-Client-Token header or client_token body field - None (no warm starts, no session) when the caller sends neither
+    token = request.headers.get('X-Client-Token') or (request.get_json(silent=True) or {}).get('client_token')
+    return str(token)[:128] if token else None
+
+
+_population_cache = None
+_population_cache_lock = threading.Lock()
+
+
+def get_population_cache(): #None when POPULATION_CACHE_MAX_ENTRIES is 0
+    global _population_cache
+    if _population_cache is None:
+        config = current_app.config
+        if config.get('POPULATION_CACHE_MAX_ENTRIES', 512) <= 0:
+            return None
+        with _population_cache_lock:
+            if _population_cache is None:
+                _population_cache = PopulationCache(
+                    config.get('POPULATION_CACHE_MAX_ENTRIES', 512),
+                    config.get('POPULATION_CACHE_TTL', 900),
+                    config.get('POPULATION_CACHE_MAX_EDIT', 2),
+                )
+    return _population_cache
@@ -0,0 +1,163 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Provider client configuration ---
+connect_timeout = float(os.environ.get('PROVIDER_CONNECT_TIMEOUT_S', '3.05')) #seconds to open a connection to any provider
+provider_settings = { #read timeout (s) and requests in flight at once per worker process, per provider
+    'ors': {'read_timeout': float(os.environ.get('ORS_TIMEOUT_S', '15')), 'max_concurrency': int(os.environ.get('ORS_MAX_CONCURRENCY', '4'))},
+    'google': {'read_timeout': float(os.environ.get('GOOGLE_TIMEOUT_S', '10')), 'max_concurrency': int(os.environ.get('GOOGLE_MAX_CONCURRENCY', '4'))},
+    'nominatim': {'read_timeout': float(os.environ.get('NOMINATIM_TIMEOUT_S', '10')), 'max_concurrency': int(os.environ.get('NOMINATIM_MAX_CONCURRENCY', '2'))},
+}
+provider_retries = int(os.environ.get('PROVIDER_RETRIES', '2')) #extra attempts after a connection error or a 429 / 502 / 503 / 504
+retry_backoff = float(os.environ.get('PROVIDER_RETRY_BACKOFF_S', '0.25')) #base of the exponential backoff, each wait is drawn uniformly up to base * 2^attempt
+breaker_failures = int(os.environ.get('PROVIDER_BREAKER_FAILURES', '5')) #consecutive failed requests that open a provider's circuit, 0 = never
+breaker_reset = float(os.environ.get('PROVIDER_BREAKER_RESET_S', '30')) #seconds an open circuit fails fast before one trial request is let through
+retry_statuses = {429, 502, 503, 504}
+latency_window = 200 #recent request latencies kept for the percentiles in stats()
+
+
+class ProviderUnavailable(requests.exceptions.RequestException): #Raised without calling the provider while its circuit is open
+    pass
+
+
+class ProviderClient:
+    """
+    HTTP client for one external provider (ORS, Google Directions,
+    Nominatim). Requests share a keep-alive session, always carry a
+    (connect, read) timeout and hold one of the provider's concurrency
+    slots while in flight. Connection errors and 429 / 5xx gateway answers
+    are retried up to `retries` times with full-jitter backoff; read
+    timeouts are not, since a provider that hangs once usually hangs again.
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests raise ProviderUnavailable straight away for `reset_after`
+    seconds, then a single trial request decides whether it closes again.
+    """
+
+    def __init__(self, name, read_timeout, max_concurrency, retries=provider_retries, failure_threshold=breaker_failures, reset_after=breaker_reset):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=max(max_concurrency, 1)))
+        self.slots = threading.BoundedSemaphore(max(max_concurrency, 1))
+        self.consecutive_failures = 0
+        self.opened_at = None #monotonic time the circuit opened, None while closed
+        self.trial_in_flight = False
+        self.requests = 0
+        self.errors = 0
+        self.retried = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'open' if time.monotonic() - self.opened_at < self.reset_after else 'half_open'
+
+    def available(self): #False while the circuit is open - callers can skip the provider and fall back
+        return self.state() != 'open'
+
+    def _admit(self): #Whether a request may go out now; in half-open state only one trial at a time
+        with self._lock:
+            state = self.state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def _record(self, ok, latency):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.trial_in_flight = False
+            if ok:
+                self.consecutive_failures = 0
+                self.opened_at = None
+                return
+            self.errors += 1
+            self.consecutive_failures += 1
+            if self.opened_at is not None or (self.failure_threshold and self.consecutive_failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    print(f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures.")
+                self.opened_at = time.monotonic() #a failed trial keeps the circuit open for another reset_after
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends one request and returns the response after raise_for_status().
+        Raises ProviderUnavailable while the circuit is open, otherwise the
+        requests exception of the last attempt - both are RequestExceptions.
+        """
+        if not self._admit():
+            raise ProviderUnavailable(f"{self.name} is unavailable (circuit open)")
+        kwargs.setdefault('timeout', self.timeout)
+        ok = False
+        started = time.monotonic()
+        try: #every outcome is recorded exactly once, so a half-open trial can never stay in flight
+            for attempt in range(self.retries + 1):
+                started = time.monotonic()
+                try:
+                    with self.slots:
+                        response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if isinstance(e, requests.exceptions.ReadTimeout) or attempt == self.retries:
+                        raise
+                else:
+                    if response.status_code not in retry_statuses or attempt == self.retries:
+                        ok = response.status_code < 500 and response.status_code != 429 #4xx - the request is at fault, not the provider
+                        response.raise_for_status()
+                        return response
+                with self._lock:
+                    self.retried += 1
+                time.sleep(random.uniform(0, retry_backoff * 2 ** attempt))
+        finally:
+            self._record(ok, time.monotonic() - started) #any other exception (bad chunked body, redirects, invalid URL) counts as a failure
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            summary = {
+                'state': self.state(),
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retried,
+                'rejected': self.rejected,
+                'consecutive_failures': self.consecutive_failures,
+            }
+        summary['latency_ms'] = {
+            'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+            'p95': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1),
+        } if latencies else None
+        return summary
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name): #Shared ProviderClient for 'ors', 'google' or 'nominatim', one per worker process
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = ProviderClient(name, **provider_settings[name])
+        return _providers[name]
+
+
+def provider_stats(): #For /api/v1/optimizer/stats - providers not used yet by this worker are left out
+    return {name: client.stats() for name, client in _providers.items()}
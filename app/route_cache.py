@@ -0,0 +1,254 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.models import LocationFeedback
+from app.distance_matrix import get_location_version
+from app.nsga_core import get_optimized_routes
+from app.search_budget import resolve_budget
+from app.population_cache import get_population_cache
+from app.single_flight import SingleFlight
+
+
+class MemoryCacheBackend: #Per-process LRU cache with a time-to-live on every entry
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key) #most recently used entries live at the end
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend: #LRU + TTL cache in a local SQLite file so every gunicorn worker on the host shares results
+    def __init__(self, path, max_entries, ttl, table='route_cache'):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_used_at ON {self.table} (used_at)")
+
+    def _connect(self): #a fresh connection per call keeps the backend safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            conn.execute(f"UPDATE {self.table} SET used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key NOT IN (SELECT key FROM {self.table} ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class RouteResultCache:
+    """
+    Result cache in front of get_optimized_routes. Entries are keyed by the
+    normalised request (preferences, required stops, travel mode) plus the
+    location/feedback data version, so adding a location or a review makes
+    older entries unreachable instead of serving stale routes.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+_route_cache = None
+_route_cache_lock = threading.Lock()
+
+
+def get_route_cache(): #Builds the cache from the app config on first use, returns None when caching is disabled
+    global _route_cache
+    if _route_cache is not None:
+        return _route_cache
+    config = current_app.config
+    backend_name = config.get('ROUTE_CACHE_BACKEND', 'memory')
+    if backend_name == 'none':
+        return None
+    with _route_cache_lock:
+        if _route_cache is None:
+            max_entries = config.get('ROUTE_CACHE_MAX_ENTRIES', 256)
+            ttl = config.get('ROUTE_CACHE_TTL', 600)
+            if backend_name == 'sqlite':
+                backend = SQLiteCacheBackend(config['ROUTE_CACHE_PATH'], max_entries, ttl)
+            else:
+                backend = MemoryCacheBackend(max_entries, ttl)
+            _route_cache = RouteResultCache(backend)
+    return _route_cache
+
+
+_single_flight = None
+
+
+def get_single_flight(): #Coalesces identical optimisation requests that arrive while one is already running
+    global _single_flight
+    if _single_flight is None:
+        with _route_cache_lock:
+            if _single_flight is None:
+                config = current_app.config
+                _single_flight = SingleFlight(
+                    lock_dir=config.get('SINGLE_FLIGHT_LOCK_DIR') or None,
+                    timeout=config.get('SINGLE_FLIGHT_TIMEOUT', 120),
+                )
+    return _single_flight
+
+
+def get_data_version(): #Changes whenever a location or a piece of location feedback (which drives sentiment) is added, or a location is moved - built from the database only, so every worker agrees on it
+    feedback_count, feedback_max_id = db.session.execute(
+        sa.select(sa.func.count(LocationFeedback.id), sa.func.max(LocationFeedback.id))
+    ).one()
+    location_count, location_max_id, latitude_sum, longitude_sum, _ = get_location_version()
+    return [location_count, location_max_id, latitude_sum, longitude_sum, feedback_count, feedback_max_id or 0]
+
+
+def normalize_route_request(user_preferences, required_stops, travel_mode, search_area=None, budget=None): #Order and duplicates in the request do not change the optimisation
+    return {
+        'preferences': sorted({int(p) for p in user_preferences}),
+        'required_stops': sorted({int(rs) for rs in required_stops}),
+        'travel_mode': (travel_mode or 'walking').strip().lower(),
+        'search_area': search_area or None,
+        'budget': (budget or resolve_budget()).cache_key(),
+    }
+
+
+def make_cache_key(user_preferences, required_stops, travel_mode, data_version, search_area=None, budget=None):
+    signature = normalize_route_request(user_preferences, required_stops, travel_mode, search_area, budget)
+    signature['data_version'] = data_version
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_cached_optimized_routes(user_preferences, required_stops=[], travel_mode='walking', run_info=None, on_generation=None, coalesce=True, search_area=None, client_token=None, budget=None):
+    """
+    Same contract as get_optimized_routes but answers repeated requests from
+    the result cache, and makes concurrent identical requests share a single
+    run unless coalesce is False (callers that need their own per-generation
+    callbacks). Only complete results (every route has geometry) are cached,
+    so a routing-API hiccup is not remembered for the whole TTL. With a
+    client_token, a request that is a small edit of that client's previous
+    one resumes from its final population with a reduced generation budget;
+    such a shortened, client-specific run is neither cached nor shared with
+    other callers. budget is a SearchBudget from search_budget.py, the default profile when
+    None; each budget has its own cache entries.
+    """
+    budget = budget or resolve_budget()
+    cache = get_route_cache()
+    key = make_cache_key(user_preferences, required_stops, travel_mode, get_data_version(), search_area, budget)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            if run_info is not None:
+                run_info.update(cached.get('run_info', {}))
+                run_info['cache'] = 'hit'
+            return cached['routes']
+
+    population_cache = get_population_cache() if client_token else None
+    signature = normalize_route_request(user_preferences, required_stops, travel_mode, search_area, budget)
+    warm_start = population_cache.find(client_token, signature) if population_cache is not None else None
+
+    def compute():
+        info = {}
+        final_population = [] if population_cache is not None else None
+        generations = max(1, round(budget.generations * current_app.config.get('POPULATION_CACHE_GENERATION_SHARE', 0.3))) if warm_start else None
+        routes = get_optimized_routes(user_preferences, required_stops, travel_mode, run_info=info, on_generation=on_generation,
+                                      search_area=search_area, warm_start=warm_start, generations=generations, budget=budget,
+                                      final_population=final_population)
+        if final_population:
+            population_cache.store(client_token, signature, final_population)
+        if warm_start: #a shortened search from this client's own population, not what a cold request for the key would get
+            return {'routes': routes, 'run_info': info}
+        if cache is not None and routes and all(route.get('geometry') and not route.get('approximate') for route in routes): #straight-line fallbacks are not kept once the provider is back
+            cache.set(key, {'routes': routes, 'run_info': info})
+        return {'routes': routes, 'run_info': info}
+
+    if coalesce and not warm_start:
+        result, shared = get_single_flight().do(key, compute)
+    else:
+        result, shared = compute(), False
+    if run_info is not None:
+        run_info.update(result['run_info'])
+        run_info['coalesced'] = shared
+        if cache is not None:
+            run_info['cache'] = 'bypass' if warm_start else 'miss'
+    return result['routes']
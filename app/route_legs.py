@@ -0,0 +1,88 @@
+from app.routing_pool import concurrent_map
+
+
+def split_route_legs(feature, stops):
+    """
+    Splits an ORS GeoJSON route feature through `stops` waypoints into one
+    leg per consecutive pair: {'distance': metres, 'coordinates': [...]}.
+    Uses properties.way_points (geometry index of every waypoint) and
+    properties.segments (one per leg). Returns None when the response does
+    not describe every leg.
+    """
+    properties = feature.get('properties') or {}
+    way_points = properties.get('way_points') or []
+    segments = properties.get('segments') or []
+    coordinates = (feature.get('geometry') or {}).get('coordinates') or []
+    if stops == 2 and coordinates and not segments: #a single leg is the whole route
+        return [{'distance': (properties.get('summary') or {}).get('distance', 0), 'coordinates': coordinates}]
+    if len(way_points) != stops or len(segments) != stops - 1 or not coordinates:
+        return None
+    return [
+        {'distance': segment.get('distance', 0), 'coordinates': coordinates[start:end + 1]}
+        for segment, start, end in zip(segments, way_points[:-1], way_points[1:])
+    ]
+
+
+def stitch_legs(legs): #Joins consecutive legs into the {'distance', 'geometry'} shape get_route_data returns
+    combined = []
+    for leg in legs:
+        segment = leg['coordinates']
+        if combined and segment and combined[-1] == segment[0]: #legs share their joining stop
+            segment = segment[1:]
+        combined.extend(segment)
+    if not combined:
+        return None
+    return {
+        'distance': sum(leg['distance'] for leg in legs),
+        'geometry': {'type': 'LineString', 'coordinates': combined},
+    }
+
+
+def missing_runs(legs): #(first, last) leg indices of every run of consecutive missing legs
+    runs = []
+    for i, leg in enumerate(legs):
+        if leg is not None:
+            continue
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return [tuple(run) for run in runs]
+
+
+def assemble_legs(coordinates, travel_mode, fetch_legs, cache=None):
+    """
+    Legs of a route through `coordinates`, taken from the leg cache (a
+    GeometryCache keyed by mode and the two stops of a leg) where possible.
+    Each run of consecutive missing legs is fetched with one
+    fetch_legs(run coordinates, travel_mode) call, which returns a leg per
+    pair or None; runs are fetched concurrently and fetched legs are
+    cached. Moving or adding one stop therefore costs one request for the
+    two or three legs around it rather than a full re-route. Stale legs are
+    used and refreshed in the background. Returns None when any leg cannot
+    be fetched.
+    """
+    if len(coordinates) < 2:
+        return None
+    pairs = [coordinates[i:i + 2] for i in range(len(coordinates) - 1)]
+    keys = [cache.key(pair, travel_mode) for pair in pairs] if cache is not None else []
+    legs = [None] * len(pairs)
+    for i, key in enumerate(keys):
+        entry = cache.lookup(key)
+        if entry is None:
+            continue
+        legs[i], stale = entry
+        if stale:
+            cache.refresh(key, pairs[i], travel_mode, lambda pair, mode: (fetch_legs(pair, mode) or [None])[0])
+
+    runs = missing_runs(legs)
+    fetched_runs = concurrent_map(lambda run: fetch_legs(coordinates[run[0]:run[1] + 2], travel_mode), runs, 'leg_runs')
+    fetched_legs = []
+    for (first, last), fetched in zip(runs, fetched_runs):
+        if not fetched or len(fetched) != last - first + 1: #the route fails, but the other runs' legs are still worth keeping
+            continue
+        legs[first:last + 1] = fetched
+        fetched_legs.extend(zip(keys[first:last + 1], fetched))
+    if cache is not None and fetched_legs:
+        cache.set_many(fetched_legs) #one transaction and one eviction check for the whole route
+    return legs if all(leg is not None for leg in legs) else None
@@ -0,0 +1,69 @@
+import numpy as np
+
+max_exact_stops = 12 #Held-Karp is O(2^n n^2) - instant at max_locations (8), still a few ms at 12
+
+
+class RouteOrderError(ValueError): #Raised for stop lists that cannot be ordered (too many stops, bad start/end)
+    pass
+
+
+def held_karp(distances, start=None, end=None):
+    """
+    Shortest open path through every point of an n x n distance matrix,
+    optionally starting and/or ending at fixed points. Bitmask dynamic
+    programming, one vectorised step per subset size: dp[mask, j] is the
+    shortest path that visits exactly the points in mask and ends at j.
+    Returns (order as point indices, length).
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    n = len(distances)
+    if n > max_exact_stops:
+        raise RouteOrderError(f"at most {max_exact_stops} stops can be ordered exactly, got {n}")
+    if start is not None and start == end and n > 1:
+        raise RouteOrderError("start and end must be different stops")
+    if n <= 1:
+        return list(range(n)), 0.0
+
+    size = 1 << n
+    masks = np.arange(size)
+    in_mask = ((masks[:, None] >> np.arange(n)) & 1).astype(bool) #in_mask[mask, j] - is point j in the subset
+    popcount = in_mask.sum(axis=1)
+    dp = np.full((size, n), np.inf)
+    parent = np.full((size, n), -1, dtype=np.int64)
+    for j in ([start] if start is not None else [j for j in range(n) if j != end]):
+        dp[1 << j, j] = 0.0
+
+    for visited in range(1, n):
+        subset = masks[popcount == visited]
+        candidates = dp[subset][:, :, None] + distances[None, :, :] #extend the path ending at j (axis 1) to t (axis 2)
+        best_from = candidates.argmin(axis=1)
+        best = np.take_along_axis(candidates, best_from[:, None, :], axis=1)[:, 0, :]
+        allowed = ~in_mask[subset] & np.isfinite(best)
+        if end is not None and visited < n - 1:
+            allowed[:, end] = False #the fixed end can only be the last stop
+        rows, targets = np.nonzero(allowed)
+        new_masks = subset[rows] | (1 << targets)
+        dp[new_masks, targets] = best[rows, targets] #every (subset, t) pair reaches a different (new mask, t) state
+        parent[new_masks, targets] = best_from[rows, targets]
+
+    full = size - 1
+    last = end if end is not None else int(np.argmin(dp[full]))
+    order = []
+    mask = full
+    while last >= 0:
+        order.append(int(last))
+        previous = parent[mask, last]
+        mask ^= 1 << int(last)
+        last = previous
+    order.reverse()
+    return order, float(dp[full, order[-1]])
+
+
+def exact_order(location_ids, distance_matrix, start_id=None, end_id=None): #Optimal visiting order of a fixed set of locations by straight-line distance, returns (ordered ids, metres)
+    location_ids = list(location_ids)
+    rows = distance_matrix.rows(location_ids)
+    distances = distance_matrix.matrix[np.ix_(rows, rows)]
+    start = location_ids.index(start_id) if start_id is not None else None
+    end = location_ids.index(end_id) if end_id is not None else None
+    order, length = held_karp(distances, start, end)
+    return [location_ids[i] for i in order], length
@@ -0,0 +1,46 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+
+# --- Concurrent routing configuration ---
+routing_workers = int(os.environ.get('ROUTING_WORKERS', '8')) #threads per fan-out level for routing requests, 1 = fetch sequentially - provider_client.py caps the requests actually in flight
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(level): #One pool per fan-out level (background refreshes, routes, leg runs, transit legs) - a task only ever waits on a deeper level, so nesting cannot deadlock
+    with _pools_lock:
+        if level not in _pools:
+            _pools[level] = ThreadPoolExecutor(max_workers=routing_workers, thread_name_prefix=f'routing-{level}')
+        return _pools[level]
+
+
+def _with_app_context(fn): #fn wrapped to run inside the current Flask app context (if any) on another thread
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def call(*args):
+        if app is None:
+            return fn(*args)
+        with app.app_context():
+            return fn(*args)
+
+    return call
+
+
+def submit(fn, level): #Runs fn() on the level's thread pool without waiting for it, inside the current app context - for background work such as geometry cache refreshes
+    return _pool(level).submit(_with_app_context(fn))
+
+
+def concurrent_map(fn, items, level):
+    """
+    fn applied to every item on the level's thread pool, results in the
+    order of items. The Flask app context (if any) is pushed in each thread
+    so the geometry caches are available there. Runs inline when there is
+    at most one item or routing_workers is 1.
+    """
+    items = list(items)
+    if len(items) <= 1 or routing_workers <= 1:
+        return [fn(item) for item in items]
+    return list(_pool(level).map(_with_app_context(fn), items))
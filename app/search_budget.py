@@ -0,0 +1,67 @@
+import os
+import time
+
+# --- Search budget configuration ---
+budget_profiles = { #population size, generations, operator rates and early-stopping patience (None = NSGA_PATIENCE) of each named profile
+    'fast': {'population_size': 40, 'generations': 20, 'crossover': 0.9, 'mutation': 0.3, 'patience': 4},
+    'balanced': {'population_size': 100, 'generations': 50, 'crossover': 0.9, 'mutation': 0.2, 'patience': None},
+    'thorough': {'population_size': 200, 'generations': 120, 'crossover': 0.9, 'mutation': 0.2, 'patience': 15},
+}
+default_profile = os.environ.get('NSGA_PROFILE', 'balanced') #profile used when a request does not name one
+max_time_budget_ms = int(os.environ.get('NSGA_MAX_TIME_BUDGET_MS', '60000')) #largest time_budget_ms a request may ask for
+
+
+class BudgetError(ValueError): #Raised for unknown profiles and invalid time budgets in a request
+    pass
+
+
+class SearchBudget:
+    """
+    How much search one optimisation request gets: a named profile's
+    population size, generations, crossover / mutation rates and patience,
+    plus an optional wall-clock limit. One object per request, passed down
+    to the engines instead of reading nsga_core's module constants, so
+    concurrent requests with different budgets never affect each other.
+    The clock starts when the optimiser calls start(); evolution then stops
+    at the first generation boundary after time_budget_ms.
+    """
+
+    def __init__(self, name, population_size, generations, crossover, mutation, patience=None, time_budget_ms=None):
+        self.name = name
+        self.population_size = population_size
+        self.generations = generations
+        self.crossover = crossover
+        self.mutation = mutation
+        self.patience = patience
+        self.time_budget_ms = time_budget_ms
+        self.deadline = None
+
+    def start(self):
+        self.deadline = time.monotonic() + self.time_budget_ms / 1000 if self.time_budget_ms else None
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def cache_key(self): #Part of the result-cache key - routes found with a smaller budget must not answer a larger one
+        return f'{self.name}@{self.time_budget_ms}ms' if self.time_budget_ms else self.name
+
+    def summary(self): #For run_info
+        return {'profile': self.name, 'time_budget_ms': self.time_budget_ms}
+
+
+def resolve_budget(profile=None, time_budget_ms=None): #Fresh SearchBudget for a profile name (default_profile when None) and an optional limit in milliseconds
+    name = profile or default_profile
+    if name not in budget_profiles:
+        raise BudgetError(f"profile must be one of {', '.join(budget_profiles)}")
+    if time_budget_ms is not None:
+        try:
+            time_budget_ms = int(time_budget_ms)
+        except (TypeError, ValueError):
+            raise BudgetError("time_budget_ms must be an integer")
+        if not 0 < time_budget_ms <= max_time_budget_ms:
+            raise BudgetError(f"time_budget_ms must be between 1 and {max_time_budget_ms}")
+    return SearchBudget(name, time_budget_ms=time_budget_ms, **budget_profiles[name])
+
+
+def parse_budget(data): #Reads the optional profile and time_budget_ms fields of an optimise request body
+    return resolve_budget(data.get('profile'), data.get('time_budget_ms'))
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError: #no advisory file locks (e.g. Windows) - coalescing falls back to threads within one worker
+    fcntl = None
+
+
+class _Call: #One in-flight computation that other threads in this worker can wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key so only one of them does the
+    work and the rest receive its result.
+
+    Within a worker, waiting threads block on the leader's event. Across
+    gunicorn workers, the leader holds an exclusive file lock named after the
+    key and leaves its result in a JSON file next to it; a worker that was
+    blocked on the lock picks that result up instead of recomputing. Results
+    must therefore be JSON-serialisable. Lock files are only ever removed by
+    a process holding their lock, and a process that locked a file which was
+    removed meanwhile locks the new one instead, so the directory only holds
+    lock files of keys in flight.
+    """
+
+    def __init__(self, lock_dir=None, timeout=120, result_ttl=30):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.timeout = timeout
+        self.result_ttl = result_ttl #how long a finished result stays visible to workers that were waiting on the lock
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn): #Returns (result, shared) - shared is True when another caller's computation was reused
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            if call.done.wait(self.timeout):
+                with self._lock:
+                    self.coalesced += 1
+                if call.error is not None:
+                    if not getattr(call.error, 'shared_with_waiters', True): #the leader gave up for its own reasons (its client went away), the work itself did not fail
+                        return fn(), False
+                    raise call.error
+                return call.result, True
+            return fn(), False #leader is taking too long, do the work ourselves rather than hang the request
+
+        try:
+            call.result, shared = self._do_across_workers(key, fn)
+            with self._lock:
+                if shared:
+                    self.coalesced += 1
+                else:
+                    self.leaders += 1
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.done.set()
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _paths(self, key):
+        base = os.path.join(self.lock_dir, key)
+        return base + '.lock', base + '.json'
+
+    def _read_result(self, result_path, since):
+        try:
+            if os.path.getmtime(result_path) < since - self.result_ttl:
+                return None
+            with open(result_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, result_path, result):
+        tmp_path = f"{result_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, result_path) #atomic, so readers never see half a file
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Single-flight Error: could not share result. {e}")
+
+    @staticmethod
+    def _still_linked(lock_file, lock_path): #True while lock_path is still the file we locked, not removed or replaced by a new one
+        try:
+            linked = os.stat(lock_path)
+        except FileNotFoundError:
+            return False
+        held = os.fstat(lock_file.fileno())
+        return (held.st_dev, held.st_ino) == (linked.st_dev, linked.st_ino)
+
+    def _acquire(self, lock_path, deadline): #Returns (locked file or None on timeout, whether another process held the lock first)
+        waited = False
+        while True:
+            lock_file = open(lock_path, 'a')
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError: #another worker is computing this key
+                    waited = True
+                    if time.time() > deadline:
+                        lock_file.close()
+                        return None, waited
+                    time.sleep(0.05)
+            if self._still_linked(lock_file, lock_path):
+                return lock_file, waited
+            lock_file.close() #the holder removed the file once it was done - lock the current one instead
+
+    def _release(self, lock_file, lock_path): #Removes the lock file while still holding it, then releases it
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def _cleanup(self): #Drops result files nobody can use any more, and lock files left behind by a worker that died holding them
+        now = time.time()
+        for name in os.listdir(self.lock_dir):
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) < now - self.result_ttl * 2:
+                    os.remove(path)
+                elif name.endswith('.lock') and os.path.getmtime(path) < now - self.timeout - self.result_ttl:
+                    lock_file = open(path, 'a')
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB) #raises while a live worker holds it
+                    except BlockingIOError:
+                        lock_file.close()
+                        continue
+                    if self._still_linked(lock_file, path):
+                        self._release(lock_file, path)
+                    else:
+                        lock_file.close()
+            except OSError:
+                pass
+
+    def _do_across_workers(self, key, fn):
+        if not self.lock_dir:
+            return fn(), False
+
+        lock_path, result_path = self._paths(key)
+        arrived = time.time()
+        lock_file, waited = self._acquire(lock_path, arrived + self.timeout)
+        if lock_file is None:
+            return fn(), False
+        try:
+            if waited:
+                shared_result = self._read_result(result_path, arrived)
+                if shared_result is not None:
+                    return shared_result, True
+            result = fn()
+            self._write_result(result_path, result)
+            self._cleanup()
+            return result, False
+        finally:
+            self._release(lock_file, lock_path)
+
+    def stats(self):
+        return {
+            'in_flight': len(self._calls),
+            'computed': self.leaders,
+            'coalesced': self.coalesced,
+            'cross_worker': bool(self.lock_dir),
+        }
@@ -0,0 +1,161 @@
+import os
+import random
+import threading
+import numpy as np
+import sqlalchemy as sa
+from app import db
+from app.models import Location
+from app.distance_matrix import EARTH_RADIUS_M, get_location_version
+
+neighbour_k = int(os.environ.get('NSGA_NEIGHBOUR_K', '10')) #nearest locations a mutation may draw from
+neighbour_mutation_rate = float(os.environ.get('NSGA_NEIGHBOUR_RATE', '0.8')) #share of add/swap mutations that pick a neighbour instead of any location
+
+_cached_index = None
+_index_lock = threading.Lock()
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the locations, projected to metres around their mean
+    latitude (accurate to well under 1% at city scale). Each cell holds about
+    `points_per_cell` locations, so nearest-neighbour and radius queries only
+    look at a few cells however many locations there are.
+    """
+
+    def __init__(self, location_ids, latitudes, longitudes, points_per_cell=4, version=None):
+        self.location_ids = np.asarray(location_ids)
+        self.index = {loc_id: i for i, loc_id in enumerate(self.location_ids.tolist())}
+        self.version = version
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.lat0 = float(latitudes.mean()) if len(latitudes) else 0.0
+        self.x, self.y = self._project(latitudes, longitudes)
+
+        n = len(self.location_ids)
+        if n:
+            self.x_min, self.y_min = float(self.x.min()), float(self.y.min())
+            area = max((self.x.max() - self.x_min) * (self.y.max() - self.y_min), 1.0)
+        else:
+            self.x_min = self.y_min = 0.0
+            area = 1.0
+        self.cell_size = max(np.sqrt(area * points_per_cell / max(n, 1)), 50.0)
+
+        cx, cy = self._cell(self.x, self.y)
+        self.cells = {}
+        for i, key in enumerate(zip(cx.tolist(), cy.tolist())):
+            self.cells.setdefault(key, []).append(i)
+        self.cells = {key: np.asarray(points, dtype=np.int64) for key, points in self.cells.items()}
+        self.max_ring = int(max(cx.max() if n else 0, cy.max() if n else 0)) + 1
+        self._neighbour_table = None
+
+    def __len__(self):
+        return len(self.location_ids)
+
+    def _project(self, latitudes, longitudes):
+        lat = np.radians(latitudes)
+        lon = np.radians(longitudes)
+        return EARTH_RADIUS_M * lon * np.cos(np.radians(self.lat0)), EARTH_RADIUS_M * lat
+
+    def _cell(self, x, y):
+        return np.floor((x - self.x_min) / self.cell_size).astype(np.int64), np.floor((y - self.y_min) / self.cell_size).astype(np.int64)
+
+    def _point_cell(self, x, y):
+        return int(np.floor((x - self.x_min) / self.cell_size)), int(np.floor((y - self.y_min) / self.cell_size))
+
+    def _ring(self, cx, cy, ring): #Point indices in the cells exactly `ring` cells away from (cx, cy)
+        if ring == 0:
+            cells = [(cx, cy)]
+        else:
+            cells = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+            cells += [(cx + dx, cy + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+        found = [self.cells[cell] for cell in cells if cell in self.cells]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _nearest_points(self, x, y, k, exclude=None): #Point indices of the k nearest points, closest first
+        cx, cy = self._point_cell(x, y)
+        candidates = np.empty(0, dtype=np.int64)
+        for ring in range(self.max_ring + max(abs(cx), abs(cy)) + 1):
+            candidates = np.concatenate((candidates, self._ring(cx, cy, ring)))
+            if exclude is not None:
+                candidates = candidates[candidates != exclude]
+            if len(candidates) >= k:
+                distances = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+                if np.sort(distances)[k - 1] <= ring * self.cell_size: #nothing in an outer ring can be closer
+                    break
+        distances = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+        return candidates[np.argsort(distances, kind='stable')[:k]]
+
+    def nearest(self, latitude, longitude, k): #Location ids of the k locations closest to a point
+        x, y = self._project(np.array([latitude]), np.array([longitude]))
+        return self.location_ids[self._nearest_points(float(x[0]), float(y[0]), k)].tolist()
+
+    def within_radius(self, latitude, longitude, radius_m): #Location ids within radius_m metres of a point, closest first
+        x, y = self._project(np.array([latitude]), np.array([longitude]))
+        x, y = float(x[0]), float(y[0])
+        cx, cy = self._point_cell(x, y)
+        rings = int(np.ceil(radius_m / self.cell_size))
+        found = [self._ring(cx, cy, ring) for ring in range(rings + 1)]
+        candidates = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        distances = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+        inside = distances <= radius_m
+        order = np.argsort(distances[inside], kind='stable')
+        return self.location_ids[candidates[inside][order]].tolist()
+
+    def neighbour_table(self, k=None): #(N, k) point indices of every location's nearest other locations, built once per index
+        k = min(neighbour_k if k is None else k, max(len(self) - 1, 0))
+        if self._neighbour_table is None or self._neighbour_table.shape[1] != k:
+            table = np.full((len(self), k), -1, dtype=np.int64)
+            for i in range(len(self)):
+                nearest = self._nearest_points(self.x[i], self.y[i], k, exclude=i)
+                table[i, :len(nearest)] = nearest
+            self._neighbour_table = table
+        return self._neighbour_table
+
+    def neighbours(self, location_id, allowed=None): #Location ids nearest to a location, optionally limited to an allowed set
+        row = self.index.get(location_id)
+        if row is None:
+            return []
+        table = self.neighbour_table()
+        nearby = self.location_ids[table[row][table[row] >= 0]].tolist()
+        if allowed is not None:
+            nearby = [loc_id for loc_id in nearby if loc_id in allowed]
+        return nearby
+
+    def local_neighbour_table(self, location_ids): #Neighbour table re-expressed in positions of the given id list (-1 where a neighbour is not in it)
+        table = self.neighbour_table()
+        local = {loc_id: i for i, loc_id in enumerate(location_ids)}
+        to_local = np.full(len(self) + 1, -1, dtype=np.int64) #last slot maps the -1 padding
+        for i, loc_id in enumerate(self.location_ids.tolist()):
+            to_local[i] = local.get(loc_id, -1)
+        rows = np.asarray([self.index.get(loc_id, -1) for loc_id in location_ids], dtype=np.int64)
+        result = to_local[table[rows]]
+        result[rows < 0] = -1
+        return result
+
+
+def pick_neighbour(spatial_index, anchor_id, individual, allowed=None, rng=random): #Random location near anchor_id that is not already on the route, or None
+    if spatial_index is None or rng.random() >= neighbour_mutation_rate:
+        return None
+    candidates = [loc_id for loc_id in spatial_index.neighbours(anchor_id, allowed) if loc_id not in individual]
+    return rng.choice(candidates) if candidates else None
+
+
+def get_spatial_index(): #Cached grid index over the Location table, rebuilt lazily with the distance matrix version
+    global _cached_index
+    version = get_location_version()
+    cached = _cached_index
+    if cached is not None and cached.version == version:
+        return cached
+    with _index_lock:
+        if _cached_index is not None and _cached_index.version == version:
+            return _cached_index
+        rows = db.session.execute(
+            sa.select(Location.id, Location.latitude, Location.longitude).order_by(Location.id)
+        ).all()
+        _cached_index = SpatialIndex(
+            [row.id for row in rows],
+            [row.latitude for row in rows],
+            [row.longitude for row in rows],
+            version=version,
+        )
+        return _cached_index
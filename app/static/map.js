@@ -398,21 +398,105 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
 
+    const provisionalLayer = L.featureGroup().addTo(map);   //Straight-line preview of the current best routes while the optimiser is still running.
+
+    function drawProvisionalFront(front) {
+        provisionalLayer.clearLayers();
+        front.slice(0, 3).forEach((candidate, index) => {
+            const points = candidate.location_ids
+                .map(id => allLocations[id])
+                .filter(loc => loc)
+                .map(loc => [loc.latitude, loc.longitude]);
+            if (points.length > 1) {
+                L.polyline(points, {
+                    color: currentRouteColors[index % currentRouteColors.length], weight: 3, opacity: 0.5, dashArray: '6 8'
+                }).addTo(provisionalLayer);
+            }
+        });
+    }
+
+    //Error the server reported itself (bad request, busy, failed optimisation) - retrying on another endpoint would only repeat the work
+    class OptimizationServerError extends Error {}
+
+    //Reads the server-sent events from the streaming endpoint, calling onFront after every generation and resolving with the final routes
+    async function streamOptimizedRoutes(requestBody, onFront) {
+        const response = await fetch('/api/v1/routes/optimize/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(requestBody)
+        });
+        if (!response.ok) {
+            const payload = await response.json().catch(() => ({}));
+            throw new OptimizationServerError(payload.error || `Optimisation failed (${response.status})`);
+        }
+        if (!response.body) throw new Error('Streaming is not available');
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) eventName = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (!data) continue;    //keep-alive comment
+                const payload = JSON.parse(data);
+                if (eventName === 'generation') {
+                    onFront(payload.front);
+                } else if (eventName === 'result') {
+                    reader.cancel();
+                    return payload.routes;
+                } else if (eventName === 'error') {
+                    throw new OptimizationServerError(payload.detail || payload.error);
+                }
+            }
+        }
+        throw new Error('Stream ended without a result');
+    }
+
+    //Per-tab token sent with optimise requests, so a small edit of the last request resumes its run (see population_cache.py)
+    function optimizerClientToken() {
+        let token = sessionStorage.getItem('optimizerClientToken');
+        if (!token) {
+            token = Date.now().toString(36) + Math.random().toString(36).slice(2);
+            sessionStorage.setItem('optimizerClientToken', token);
+        }
+        return token;
+    }
+
     function generateRoute(categoryID) {
         resultsLayer.clearLayers();
+        provisionalLayer.clearLayers();
         document.body.style.cursor = 'wait';
 
-        fetch('/api/optimize_routes', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                preferences: [categoryID],
-                required_stops: userSelectedLocations,
-                travel_mode: currentTravelMode
-            })
+        const requestBody = {
+            preferences: [categoryID],
+            required_stops: userSelectedLocations,
+            travel_mode: currentTravelMode,
+            client_token: optimizerClientToken()
+        };
+
+        streamOptimizedRoutes(requestBody, drawProvisionalFront)
+        .catch(error => {   //Falls back to the original endpoint only if the stream itself broke (network, proxy, no streaming support)
+            if (error instanceof OptimizationServerError) throw error;
+            console.warn('Streaming optimisation failed, retrying without streaming:', error);
+            return fetch('/api/optimize_routes', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(requestBody)
+            }).then(response => response.json());
         })
-        .then(response => response.json())
         .then(data => {
+            provisionalLayer.clearLayers();
             currentDisplayedRoutes = data; // Store the new routes
             updateRouteIncludedLocations(currentDisplayedRoutes);
 
@@ -456,6 +540,7 @@ document.addEventListener('DOMContentLoaded', function() {
             alert('Failed to generate routes. Please try again.');
         })
         .finally(() => {
+            provisionalLayer.clearLayers();
             document.body.style.cursor = 'default';
         });
     }
@@ -2,7 +2,14 @@ from flask import render_template, jsonify, request, redirect, url_for, flash, a
 from app import app, db
 from app.forms import RouteCategoryForm, LoginForm, RegisterForm
 from app.models import Location, User, SavedRoute, SavedPlace, LocationFeedback, RouteFeedback
-from app.nsga_core import get_optimized_routes, recalculate_route_geometry
+from app.nsga_core import recalculate_route_geometry
+from app.route_cache import get_cached_optimized_routes
+from app.distance_matrix import bump_location_version
+from app.candidate_pool import SearchAreaError, parse_search_area
+from app.search_budget import BudgetError, parse_budget
+from app.population_cache import optimizer_client_token
+from app.provider_client import get_provider
+from app.polyline import GeometryFormatError, parse_geometry_format
 from flask_login import current_user, login_user, logout_user, login_required
 from urllib.parse import urlsplit, urlencode
 import sqlalchemy as sa
@@ -210,13 +217,11 @@ def geocode_location():
     try:
         if coords:
             lat, lon = coords
-            response = requests.get(
+            response = get_provider('nominatim').get(
                 'https://nominatim.openstreetmap.org/reverse',
                 params={'format': 'json', 'lat': lat, 'lon': lon},
-                headers=headers,
-                timeout=10
+                headers=headers
             )
-            response.raise_for_status()
             data = response.json()
             return jsonify({
                 'success': True,
@@ -225,13 +230,11 @@ def geocode_location():
                 'address': data.get('display_name')
             })
 
-        response = requests.get(
+        response = get_provider('nominatim').get(
             'https://nominatim.openstreetmap.org/search',
             params={'format': 'json', 'limit': 1, 'q': query},
-            headers=headers,
-            timeout=10
+            headers=headers
         )
-        response.raise_for_status()
         results = response.json()
         if not results:
             return jsonify({'success': False, 'message': 'No results found.'}), 404
@@ -283,6 +286,7 @@ def add_location():
     )
     db.session.add(location)
     db.session.commit()
+    bump_location_version() #distance matrix is rebuilt on the next optimisation
 
     return jsonify({
         'success': True,
@@ -346,10 +350,24 @@ def optimize_routes_endpoint():
         required_stops = data.get('required_stops', [])
         travel_mode = data.get('travel_mode', 'walking')
 
-        print(f"--- Travel mode received: {travel_mode} ---")
-        optimized_routes = get_optimized_routes(user_preferences, required_stops, travel_mode)
+        try:
+            search_area = parse_search_area(data)
+            budget = parse_budget(data)
+            geometry_format = parse_geometry_format(data)
+        except (SearchAreaError, BudgetError, GeometryFormatError) as e:
+            return jsonify({'error': str(e)}), 400
 
-        return jsonify(optimized_routes)
+        print(f"--- Travel mode received: {travel_mode} ---")
+        run_info = {}
+        optimized_routes = get_cached_optimized_routes(user_preferences, required_stops, travel_mode, run_info=run_info,
+                                                       search_area=search_area, client_token=optimizer_client_token(), budget=budget)
+
+        response = jsonify(geometry_format.format_routes(optimized_routes)) #GeoJSON unless the request asked for encoded polylines
+        if run_info: #body stays a plain list for map.js, so run details travel as headers
+            response.headers['X-Optimization-Generations'] = str(run_info.get('generations', 0))
+            response.headers['X-Optimization-Stop-Reason'] = run_info.get('stop_reason', '')
+            response.headers['X-Optimization-Cache'] = run_info.get('cache', 'off')
+        return response
     except Exception as e:
         print(f"Error during optimization: {e}")
         return jsonify({'error': 'An error occurred during route optimization.'}), 500
@@ -550,13 +568,17 @@ def recalculate_route_endpoint():
 
         if not location_ids:
             return jsonify({'error': 'Location IDs not provided.'}), 400
+        try:
+            geometry_format = parse_geometry_format(data)
+        except GeometryFormatError as e:
+            return jsonify({'error': str(e)}), 400
 
         new_route_details = recalculate_route_geometry(location_ids, travel_mode)
 
         if not new_route_details:
             return jsonify({'error': 'Could not recalculate route.'}), 400
 
-        return jsonify(new_route_details)
+        return jsonify(geometry_format.format_route(new_route_details))
     except Exception as e:
         print(f"Error during route recalculation: {e}")
         return jsonify({'error': 'An error occurred during route recalculation.'}), 500
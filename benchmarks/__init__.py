@@ -0,0 +1,11 @@
+"""
+Optimiser benchmarks on synthetic cities, with routing APIs stubbed out.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --save-baseline
+
+Runs against a scratch SQLite database, never the app's own. The suite
+runs --rounds times (3 by default) and every metric is compared by its
+median over the rounds. Timings are only comparable with a baseline
+recorded on the same machine, profile and time budget (see its meta).
+"""
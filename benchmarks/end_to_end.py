@@ -0,0 +1,120 @@
+import io
+import random
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+import numpy as np
+from app import nsga_eval, nsga_seeding
+from app.nsga_core import get_optimized_routes
+from app.search_budget import resolve_budget
+from app.nsga_convergence import hypervolume_2d, population_objectives
+from app.distance_matrix import haversine_matrix, get_distance_matrix
+from app.spatial_index import get_spatial_index
+from benchmarks.stub_routing import stubbed_routing
+
+satisfaction_range = (-0.5, 1.0) #sentiment is in [-1, 1] and category match in [0, 1], satisfaction averages the two
+
+
+def reference_distance(city, search_area=None): #Diagonal of the area searched - routes longer than this count as worthless in the hypervolume
+    if search_area and search_area.get('radius_m'):
+        span = 2 * np.sqrt(2) * search_area['radius_m']
+    else:
+        latitudes = [loc['latitude'] for loc in city]
+        longitudes = [loc['longitude'] for loc in city]
+        span = float(haversine_matrix([min(latitudes), max(latitudes)], [min(longitudes), max(longitudes)])[0, 1])
+    return span
+
+
+def normalised_hypervolume(pop, ref_distance):
+    """
+    Hypervolume of the final population with both objectives scaled to [0, 1]
+    against a reference fixed per scenario: 0 km is the best distance,
+    ref_distance the worst, and satisfaction_range the satisfaction bounds.
+    Unlike the run's own convergence hypervolume (whose reference comes from
+    its first population), this is comparable across seeds and commits.
+    """
+    objectives = population_objectives(pop)
+    if len(objectives) == 0:
+        return 0.0
+    low, high = satisfaction_range
+    scaled = np.column_stack((objectives[:, 0] / ref_distance, (objectives[:, 1] - low) / (high - low)))
+    return hypervolume_2d(scaled, (1.0, 0.0))
+
+
+def reset_run_state(seed): #Clears what one run leaves behind for the next (remembered fronts, shared memos) and reseeds both generators
+    with nsga_seeding._history_lock:
+        nsga_seeding._history.clear()
+    with nsga_eval._memo_lock:
+        nsga_eval._shared_memos.clear()
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def optimise_once(seed, user_preferences, search_area, latency_ms, profile=None, time_budget_ms=None, trace_memory=False): #One run of get_optimized_routes with routing stubbed out and its console output swallowed
+    reset_run_state(seed)
+    run_info = {}
+    final = {}
+
+    def keep_population(generation, total, pop):
+        final['pop'] = pop
+
+    with stubbed_routing(latency_ms) as provider, redirect_stdout(io.StringIO()):
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        routes = get_optimized_routes(user_preferences, [], 'walking', run_info=run_info, on_generation=keep_population, search_area=search_area,
+                                      budget=resolve_budget(profile, time_budget_ms))
+        wall_s = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return routes, run_info, final.get('pop', []), wall_s, peak, provider.calls
+
+
+def run_scenario(city, seeds, user_preferences, search_area=None, latency_ms=0.0, profile=None, time_budget_ms=None):
+    """
+    End-to-end get_optimized_routes runs on the city currently loaded in the
+    database, one per seed. Without a search area the shared distance matrix
+    and spatial index are built before the first run and reported as setup_s,
+    so every seed measures steady-state request cost. Each seed runs twice:
+    once for wall time and once under tracemalloc for peak memory, since
+    tracing slows allocation-heavy code down too much to time it.
+    """
+    start = time.perf_counter()
+    if not search_area: #area-limited runs build a small matrix of their own pool instead
+        get_distance_matrix()
+        get_spatial_index()
+    setup_s = time.perf_counter() - start
+    ref_distance = reference_distance(city, search_area)
+
+    runs = []
+    for seed in seeds:
+        routes, run_info, pop, wall_s, _, routing_calls = optimise_once(seed, user_preferences, search_area, latency_ms, profile, time_budget_ms)
+        _, _, _, _, peak, _ = optimise_once(seed, user_preferences, search_area, latency_ms, profile, time_budget_ms, trace_memory=True)
+        evaluations = run_info.get('evaluations') #not reported when islands evaluate in worker processes
+        runs.append({
+            'seed': seed,
+            'wall_s': round(wall_s, 4),
+            'generations': run_info.get('generations'),
+            'stop_reason': run_info.get('stop_reason'),
+            'candidates': run_info.get('candidates'),
+            'evaluations': evaluations,
+            'evals_per_s': round(evaluations / wall_s, 1) if evaluations is not None else None,
+            'memo_hit_rate': run_info.get('memo_hit_rate'),
+            'peak_mb': round(peak / 2 ** 20, 2),
+            'hypervolume': round(normalised_hypervolume(pop, ref_distance), 6),
+            'routes': len(routes),
+            'routing_calls': routing_calls,
+        })
+
+    summary = {}
+    for key in ('wall_s', 'evals_per_s', 'peak_mb', 'hypervolume', 'generations'):
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(float(np.median(values)), 6) if values else None
+    return {
+        'setup_s': round(setup_s, 4),
+        'reference_distance_m': round(ref_distance, 1),
+        'search_area': search_area,
+        'median': summary,
+        'seeds': runs,
+    }
@@ -0,0 +1,98 @@
+import random
+import time
+import numpy as np
+from deap import tools
+from app import nsga_core
+from app.nsga_core import compute_distance, compute_satisfaction, ox_crossover, random_mutation, creator
+from app.nsga_eval import PopulationEvaluator
+from app.nsga_selection import sel_nsga2
+from app.distance_matrix import LocationDistanceMatrix
+from app.spatial_index import SpatialIndex
+
+matrix_limit = 2000 #matrix-backed microbenchmarks use the first 2000 points; larger cities run end to end both with a search area and against the full matrix (400 MB of float32 at 10k, ~650 MB peak while building in blocks)
+batch_size = 2000 #operations per timed repeat
+selection_sizes = (100, 500, 2000)
+deap_selection_limit = 500 #tools.selNSGA2 is quadratic, only time it where it finishes quickly
+
+
+def measure(prepare, run, repeat=7):
+    """
+    Times run(prepare()) `repeat` times; run returns how many operations it
+    performed. Inputs come from prepare so that operators that mutate their
+    arguments always see fresh copies, and preparation is never timed.
+    Returns the median and best nanoseconds per operation.
+    """
+    per_call = []
+    for _ in range(repeat):
+        inputs = prepare()
+        start = time.perf_counter_ns()
+        count = run(inputs)
+        per_call.append((time.perf_counter_ns() - start) / max(count, 1))
+    return {'ns_per_call': float(np.median(per_call)), 'best_ns_per_call': float(min(per_call))}
+
+
+def random_routes(location_ids, count):
+    return [random.sample(location_ids, random.randint(nsga_core.min_locations, nsga_core.max_locations)) for _ in range(count)]
+
+
+def operator_benchmarks(locations_dict, user_preferences, seed=0): #compute_distance, compute_satisfaction, the batch evaluator and the genetic operators on one city
+    random.seed(seed)
+    location_ids = list(locations_dict.keys())
+    matrix_ids = location_ids[:matrix_limit]
+    matrix = LocationDistanceMatrix(matrix_ids, [locations_dict[i]['latitude'] for i in matrix_ids], [locations_dict[i]['longitude'] for i in matrix_ids])
+    spatial_index = SpatialIndex(location_ids, [locations_dict[i]['latitude'] for i in location_ids], [locations_dict[i]['longitude'] for i in location_ids])
+    evaluator = PopulationEvaluator({i: locations_dict[i] for i in matrix_ids}, user_preferences, matrix)
+    routes = random_routes(location_ids, batch_size)
+    matrix_routes = random_routes(matrix_ids, batch_size)
+    allowed_ids = set(location_ids)
+
+    def each(fn):
+        def run(batch):
+            for item in batch:
+                fn(item)
+            return len(batch)
+        return run
+
+    def individuals(source):
+        return lambda: [creator.Individual(route) for route in source]
+
+    def mate_all(batch):
+        for ind1, ind2 in zip(batch[::2], batch[1::2]):
+            ox_crossover(ind1, ind2)
+        return len(batch) // 2
+
+    return {
+        'compute_distance/degrees': measure(lambda: routes, each(lambda route: compute_distance(route, locations_dict))),
+        'compute_distance/matrix': measure(lambda: matrix_routes, each(lambda route: compute_distance(route, locations_dict, matrix))),
+        'compute_satisfaction': measure(lambda: routes, each(lambda route: compute_satisfaction(route, locations_dict, user_preferences))),
+        'evaluate_population': measure(lambda: matrix_routes, lambda batch: len(evaluator.evaluate(batch))),
+        'ox_crossover': measure(individuals(routes), mate_all),
+        'random_mutation/uniform': measure(individuals(routes), each(lambda ind: random_mutation(ind, location_ids, []))),
+        'random_mutation/spatial': measure(individuals(routes), each(lambda ind: random_mutation(ind, location_ids, [], spatial_index, allowed_ids))),
+    }
+
+
+def select_with(select, size): #One selection call per timed run
+    def run(pop):
+        select(pop, size)
+        return 1
+    return run
+
+
+def selection_benchmarks(seed=0): #NSGA-II selection of n survivors from 2n individuals, as in every generation
+    rng = np.random.default_rng(seed)
+    results = {}
+    for size in selection_sizes:
+        def population(size=size):
+            objectives = np.column_stack((rng.uniform(500, 5000, 2 * size).round(), rng.uniform(-0.5, 1, 2 * size).round(3))) #rounded so ties occur, as in real runs
+            pop = []
+            for distance, satisfaction in objectives.tolist():
+                ind = creator.Individual([len(pop)])
+                ind.fitness.values = (distance, satisfaction)
+                pop.append(ind)
+            return pop
+
+        results[f'sel_nsga2/{size}'] = measure(population, select_with(sel_nsga2, size), repeat=3)
+        if size <= deap_selection_limit:
+            results[f'deap_selNSGA2/{size}'] = measure(population, select_with(tools.selNSGA2, size), repeat=3)
+    return results
@@ -0,0 +1,199 @@
+import argparse
+import atexit
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+
+default_baseline = os.path.join(os.path.dirname(__file__), 'baseline.json')
+lower_is_better = ('best_ns_per_call', 'wall_s', 'peak_mb', 'setup_s')
+higher_is_better = ('evals_per_s',)
+quality_metrics = ('hypervolume',) #compared by absolute difference, the others by relative change
+
+
+def use_scratch_database(path): #Points the app at a throwaway SQLite file - must run before anything imports app, which binds the database on import
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    atexit.register(lambda: os.path.exists(path) and os.remove(path))
+    os.environ.pop('ORS_API_KEY', None)
+    os.environ.pop('GOOGLE_MAPS_API_KEY', None)
+
+
+def flatten_metrics(results): #{'micro.1k.ox_crossover.best_ns_per_call': 812.0, 'end_to_end.100.wall_s': 0.21, ...} for the metrics that are compared - the median over rounds when the results have several
+    if 'metrics' in results:
+        return dict(results['metrics'])
+    metrics = {}
+    for group, benchmarks in results.get('micro', {}).items():
+        for name, values in benchmarks.items():
+            metrics[f'micro.{group}.{name}.best_ns_per_call'] = values['best_ns_per_call'] #the fastest repeat is far less noisy than the median on a shared machine
+    for city, scenario in results.get('end_to_end', {}).items():
+        if scenario.get('setup_s'): #building the shared distance matrix and spatial index, only without a search area
+            metrics[f'end_to_end.{city}.setup_s'] = scenario['setup_s']
+        for key, value in scenario['median'].items():
+            if value is not None and key in lower_is_better + higher_is_better + quality_metrics:
+                metrics[f'end_to_end.{city}.{key}'] = value
+    return metrics
+
+
+def median_metrics(rounds): #Per-metric median and spread ((max - min) / median, or max - min for quality metrics) over the flattened rounds
+    metrics, spread = {}, {}
+    for metric in sorted(set().union(*rounds)):
+        values = [metrics_of_round[metric] for metrics_of_round in rounds if metric in metrics_of_round]
+        middle = float(np.median(values))
+        metrics[metric] = middle
+        if metric.rsplit('.', 1)[1] in quality_metrics:
+            spread[metric] = round(max(values) - min(values), 6)
+        else:
+            spread[metric] = round((max(values) - min(values)) / middle, 4) if middle else 0.0
+    return metrics, spread
+
+
+def compare(current, baseline, tolerance=0.25, quality_tolerance=0.01):
+    """
+    Compares every metric present in both result sets. Timings, memory and
+    throughput regress when they get worse by more than `tolerance` (relative);
+    hypervolume regresses when it drops by more than `quality_tolerance`
+    (absolute, it is already normalised to [0, 1]). When the baseline was
+    recorded over several rounds, a metric whose rounds disagreed by more than
+    that gets its own spread as the tolerance instead, so a benchmark that is
+    noisy on this machine is not reported as a regression on every run.
+    Returns one row per metric.
+    """
+    rows = []
+    baseline_metrics = flatten_metrics(baseline)
+    baseline_spread = baseline.get('spread', {})
+    for metric, value in sorted(flatten_metrics(current).items()):
+        if metric not in baseline_metrics:
+            continue
+        old = baseline_metrics[metric]
+        key = metric.rsplit('.', 1)[1]
+        if key in quality_metrics:
+            change = value - old
+            regressed = change < -max(quality_tolerance, baseline_spread.get(metric, 0.0))
+        else:
+            change = (value - old) / old if old else 0.0
+            allowed = max(tolerance, baseline_spread.get(metric, 0.0))
+            regressed = change > allowed if key in lower_is_better else change < -allowed
+        rows.append({'metric': metric, 'baseline': old, 'current': value, 'change': round(change, 4), 'regressed': regressed})
+    return rows
+
+
+def print_comparison(rows):
+    width = max((len(row['metric']) for row in rows), default=10)
+    for row in rows:
+        key = row['metric'].rsplit('.', 1)[1]
+        change = f"{row['change']:+.4f}" if key in quality_metrics else f"{row['change']:+.1%}"
+        flag = '  REGRESSED' if row['regressed'] else ''
+        print(f"{row['metric']:<{width}}  {row['baseline']:>14.4f}  {row['current']:>14.4f}  {change:>9}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the route optimiser on synthetic cities.")
+    parser.add_argument("--sizes", nargs="+", default=["100", "1k", "10k"], help="City sizes: 100, 1k, 10k.")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0, 1, 2], help="GA seeds for the end-to-end runs.")
+    parser.add_argument("--preferences", nargs="+", type=int, default=[1, 2, 5], help="Category preferences of the optimised request.")
+    parser.add_argument("--area-radius", type=float, default=1500.0, help="Search radius (m) around the centre for cities too large for a full distance matrix.")
+    parser.add_argument("--skip-full-matrix", action="store_true", help="Run cities above the matrix limit only with a search area, not also against the full distance matrix.")
+    parser.add_argument("--rounds", type=int, default=3, help="Times the whole suite runs; each metric is compared by its median over the rounds.")
+    parser.add_argument("--profile", help="Search budget profile (fast, balanced, thorough) of the end-to-end runs.")
+    parser.add_argument("--time-budget-ms", type=int, help="Wall-clock limit of each end-to-end run.")
+    parser.add_argument("--routing-latency-ms", type=float, default=0.0, help="Simulated latency of each stubbed routing call.")
+    parser.add_argument("--skip-micro", action="store_true", help="Only run the end-to-end benchmarks.")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="Only run the microbenchmarks.")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout summary only).")
+    parser.add_argument("--baseline", default=default_baseline, help="Baseline results JSON to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown that counts as a regression.")
+    parser.add_argument("--quality-tolerance", type=float, default=0.01, help="Hypervolume drop that counts as a regression.")
+    args = parser.parse_args()
+
+    use_scratch_database(os.path.join(tempfile.gettempdir(), f"route_benchmark_{os.getpid()}.sqlite"))
+    from app import app, nsga_core
+    from app.nsga_islands import island_count
+    from app.search_budget import resolve_budget
+    from benchmarks.synthetic import city_sizes, city_centre, generate_city, city_locations_dict, load_city
+    from benchmarks.micro import matrix_limit, operator_benchmarks, selection_benchmarks
+    from benchmarks.end_to_end import run_scenario
+
+    budget = resolve_budget(args.profile, args.time_budget_ms)
+    results = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'engine': nsga_core.optimizer_engine,
+            'islands': island_count,
+            'preferences': args.preferences,
+            'seeds': args.seeds,
+            'routing_latency_ms': args.routing_latency_ms,
+            'profile': budget.name, #resolved, so a baseline recorded under a different default profile is recognisable
+            'time_budget_ms': budget.time_budget_ms,
+            'population_size': budget.population_size,
+            'generations': budget.generations,
+            'rounds': args.rounds,
+        },
+    }
+
+    def run_round(number): #The whole suite once; cities are regenerated and reloaded so each round starts cold
+        current = {'micro': {}, 'end_to_end': {}}
+        if not args.skip_micro:
+            print(f"[{number}] selection ...", file=sys.stderr)
+            current['micro']['selection'] = selection_benchmarks()
+        for size in args.sizes:
+            city = generate_city(city_sizes[size])
+            if not args.skip_micro:
+                print(f"[{number}] micro {size} ...", file=sys.stderr)
+                current['micro'][size] = operator_benchmarks(city_locations_dict(city), args.preferences)
+            if args.skip_end_to_end:
+                continue
+            scenarios = {size: None} #scenario name -> search area
+            if len(city) > matrix_limit:
+                scenarios[size] = {'start': list(city_centre), 'radius_m': args.area_radius}
+                if not args.skip_full_matrix:
+                    scenarios[f'{size}-full'] = None #the whole city against the shared full matrix, built block by block
+            with app.app_context():
+                load_city(city)
+                for name, search_area in scenarios.items():
+                    print(f"[{number}] end-to-end {name} ...", file=sys.stderr)
+                    current['end_to_end'][name] = run_scenario(city, args.seeds, args.preferences, search_area, args.routing_latency_ms,
+                                                                 args.profile, args.time_budget_ms)
+        return current
+
+    rounds = [run_round(number) for number in range(1, max(args.rounds, 1) + 1)]
+    results.update(rounds[-1]) #full per-seed detail of the last round
+    results['metrics'], results['spread'] = median_metrics([flatten_metrics(current) for current in rounds])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    for city, scenario in results['end_to_end'].items():
+        print(f"{city:>8}: {json.dumps(scenario['median'])}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    for setting in ('profile', 'time_budget_ms', 'population_size', 'generations'):
+        if baseline['meta'].get(setting) != results['meta'][setting]:
+            print(f"Warning: baseline was recorded with {setting}={baseline['meta'].get(setting)}, this run used {results['meta'][setting]}.")
+    rows = compare(results, baseline, args.tolerance, args.quality_tolerance)
+    print_comparison(rows)
+    if any(row['regressed'] for row in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+import sqlalchemy as sa
+
+city_sizes = {'100': 100, '1k': 1000, '10k': 10000}
+city_centre = (51.5072, -0.1276) #central London, like the real data
+category_weights = [0.3, 0.15, 0.2, 0.1, 0.15, 0.1] #Food and Drink ... Nightlife, roughly the mix of the real table
+
+
+def generate_city(size, seed=0, radius_m=10000, clusters=None):
+    """
+    Synthetic city of `size` locations around city_centre. Points are drawn
+    from Gaussian neighbourhoods (one per ~40 locations) plus a uniform 20%
+    background, so density varies the way real POI data does. Each location
+    gets a category and 0-3 feedback ratings in [-1, 1]. The same size and
+    seed always give the same city.
+    """
+    rng = np.random.default_rng(seed)
+    clusters = clusters or max(1, size // 40)
+    metres_per_degree = 111320.0
+    lat_scale = radius_m / metres_per_degree
+    lon_scale = lat_scale / np.cos(np.radians(city_centre[0]))
+
+    centres = rng.uniform(-0.8, 0.8, size=(clusters, 2))
+    background = rng.random(size) < 0.2
+    offsets = centres[rng.integers(clusters, size=size)] + rng.normal(0, 0.08, size=(size, 2))
+    offsets[background] = rng.uniform(-1, 1, size=(int(background.sum()), 2))
+    offsets = np.clip(offsets, -1, 1)
+
+    categories = rng.choice(len(category_weights), size=size, p=category_weights) + 1
+    quality = rng.normal(0.2, 0.4, size=size) #per-location mean rating, most places reviewed mildly positively
+    review_counts = rng.integers(0, 4, size=size)
+    return [
+        {
+            'name': f'Synthetic {seed}-{i}',
+            'latitude': float(city_centre[0] + offsets[i, 0] * lat_scale),
+            'longitude': float(city_centre[1] + offsets[i, 1] * lon_scale),
+            'category_id': int(categories[i]),
+            'ratings': np.clip(rng.normal(quality[i], 0.3, size=review_counts[i]), -1, 1).round(3).tolist(),
+        }
+        for i in range(size)
+    ]
+
+
+def city_locations_dict(city): #The city in the shape locations_to_dict returns, with ids 1..n
+    return {
+        i + 1: {
+            'name': loc['name'],
+            'latitude': loc['latitude'],
+            'longitude': loc['longitude'],
+            'category_id': loc['category_id'],
+            'sentiment': sum(loc['ratings']) / len(loc['ratings']) if loc['ratings'] else 0,
+        }
+        for i, loc in enumerate(city)
+    }
+
+
+def load_city(city):
+    """
+    Replaces every location (and its feedback) in the current database with
+    the synthetic city, ids 1..n, and invalidates the cached distance matrix
+    and spatial index. Only ever call this against a scratch database - the
+    benchmark runner points the app at one before importing it.
+    """
+    from app import db
+    from app.models import Location, LocationFeedback, User
+    from app.distance_matrix import bump_location_version
+
+    db.session.execute(sa.delete(LocationFeedback))
+    db.session.execute(sa.delete(Location))
+    user = db.session.scalar(sa.select(User).where(User.username == 'benchmark'))
+    if user is None:
+        user = User(name='Benchmark', username='benchmark', password_hash='!')
+        db.session.add(user)
+        db.session.flush()
+
+    db.session.execute(sa.insert(Location), [
+        {'id': i + 1, 'name': loc['name'], 'latitude': loc['latitude'], 'longitude': loc['longitude'], 'category_id': loc['category_id']}
+        for i, loc in enumerate(city)
+    ])
+    feedback = [
+        {'body': 'synthetic', 'rating': rating, 'user_id': user.id, 'location_id': i + 1}
+        for i, loc in enumerate(city) for rating in loc['ratings']
+    ]
+    if feedback:
+        db.session.execute(sa.insert(LocationFeedback), feedback)
+    db.session.commit()
+    bump_location_version()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -21,6 +22,34 @@ class Config:
     ORS_API_KEY = os.environ.get('ORS_API_KEY')
     GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
 
+    # Optimised-route result cache: 'memory' (per worker), 'sqlite' (shared by all workers on the host) or 'none'
+    ROUTE_CACHE_BACKEND = os.environ.get('ROUTE_CACHE_BACKEND', 'memory')
+    ROUTE_CACHE_PATH = os.environ.get('ROUTE_CACHE_PATH') or os.path.join(basedir, 'app', 'data', 'route_cache.sqlite')
+    ROUTE_CACHE_MAX_ENTRIES = int(os.environ.get('ROUTE_CACHE_MAX_ENTRIES', 256))
+    ROUTE_CACHE_TTL = int(os.environ.get('ROUTE_CACHE_TTL', 60 * 10))
+
+    # Identical optimisation requests that arrive together share one run; the lock directory extends this across gunicorn workers
+    SINGLE_FLIGHT_LOCK_DIR = os.environ.get('SINGLE_FLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'travelapp-single-flight'))
+    SINGLE_FLIGHT_TIMEOUT = int(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 120))
+
+    # Background optimisation jobs (POST /api/v1/routes/optimize/jobs)
+    OPTIMIZE_JOB_WORKERS = int(os.environ.get('OPTIMIZE_JOB_WORKERS', 2))
+    OPTIMIZE_JOB_MAX_PENDING = int(os.environ.get('OPTIMIZE_JOB_MAX_PENDING', 20))
+    OPTIMIZE_JOB_TTL = int(os.environ.get('OPTIMIZE_JOB_TTL', 60 * 10))
+
+    # Final GA population of each client's last run (per worker), so a small edit to the request resumes instead of starting cold
+    POPULATION_CACHE_MAX_ENTRIES = int(os.environ.get('POPULATION_CACHE_MAX_ENTRIES', 512))
+    POPULATION_CACHE_TTL = int(os.environ.get('POPULATION_CACHE_TTL', 60 * 15))
+    POPULATION_CACHE_MAX_EDIT = int(os.environ.get('POPULATION_CACHE_MAX_EDIT', 2))  # preferences + required stops added or removed
+    POPULATION_CACHE_GENERATION_SHARE = float(os.environ.get('POPULATION_CACHE_GENERATION_SHARE', 0.3))  # share of no_of_generations a resumed run gets
+
+    # Routed geometry from ORS / Google, shared by every worker on the host through a local SQLite file
+    GEOMETRY_CACHE_PATH = os.environ.get('GEOMETRY_CACHE_PATH') or os.path.join(basedir, 'app', 'data', 'geometry_cache.sqlite')
+    GEOMETRY_CACHE_MAX_MB = float(os.environ.get('GEOMETRY_CACHE_MAX_MB', 64))  # 0 turns the cache off
+    GEOMETRY_CACHE_TTL = int(os.environ.get('GEOMETRY_CACHE_TTL', 60 * 60 * 24 * 7))
+    GEOMETRY_CACHE_STALE_TTL = int(os.environ.get('GEOMETRY_CACHE_STALE_TTL', 60 * 60 * 24 * 30))  # served while being refreshed in the background
+    LEG_CACHE_MAX_MB = float(os.environ.get('LEG_CACHE_MAX_MB', 64))  # stop-to-stop legs in the same file, so a changed stop only re-routes its own legs; 0 turns it off
+
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', '0') == '1'
     REMEMBER_COOKIE_SECURE = os.environ.get('REMEMBER_COOKIE_SECURE', '0') == '1'
     SESSION_COOKIE_SAMESITE = os.environ.get('SESSION_COOKIE_SAMESITE', 'Lax')
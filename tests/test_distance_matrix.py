@@ -0,0 +1,35 @@
+import numpy as np
+import sqlalchemy as sa
+
+from app import app, db
+from app.distance_matrix import get_location_version, haversine_matrix
+from app.models import Location
+
+
+def test_blocked_build_matches_one_block():
+    rng = np.random.default_rng(0)
+    latitudes = 51.5 + rng.uniform(-0.1, 0.1, 300)
+    longitudes = -0.1 + rng.uniform(-0.1, 0.1, 300)
+    matrix = haversine_matrix(latitudes, longitudes, block_rows=7)
+    assert matrix.dtype == np.float32
+    assert np.array_equal(matrix, haversine_matrix(latitudes, longitudes, block_rows=300))
+    assert np.array_equal(matrix, matrix.T)
+    assert not np.diagonal(matrix).any()
+
+
+def test_known_distance():
+    london_paris = haversine_matrix([51.5074, 48.8566], [-0.1278, 2.3522])[0, 1]
+    assert abs(london_paris - 343_560) < 1_000
+
+
+def test_location_version_changes_when_a_location_moves():
+    with app.app_context():
+        before = get_location_version()
+        location = db.session.scalar(sa.select(Location).order_by(Location.id).limit(1))
+        location.latitude += 0.001
+        db.session.flush()
+        try:
+            assert get_location_version() != before
+        finally:
+            db.session.rollback()
+        assert get_location_version() == before
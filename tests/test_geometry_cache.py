@@ -0,0 +1,32 @@
+import threading
+
+from app import geometry_cache
+from app.geometry_cache import GeometryCache
+
+
+def test_stale_refreshes_share_the_routing_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(geometry_cache, 'max_pending_refreshes', 3)
+    cache = GeometryCache(str(tmp_path / 'geometry.sqlite'), 2 ** 20, ttl=0, stale_ttl=3600)
+    coordinates = [[[-0.12, 51.5 + i / 100], [-0.13, 51.5]] for i in range(5)]
+    for coords in coordinates:
+        cache.set(cache.key(coords, 'walking'), {'distance': 1})
+
+    release = threading.Event()
+    calls = []
+
+    def fetch(coords, travel_mode):
+        calls.append((coords[0][1], threading.current_thread().name))
+        release.wait(10)
+        return {'distance': 2}
+
+    for _ in range(3): #repeated stale hits while the refreshes are still running
+        for coords in coordinates:
+            assert cache.fetch(coords, 'walking', fetch) == {'distance': 1}
+    assert cache.refreshes == 3 #one per key, and no more than max_pending_refreshes at once
+
+    release.set()
+    while cache._refreshing:
+        threading.Event().wait(0.01)
+    assert len(calls) == 3
+    assert all(name.startswith('routing-refresh') for _, name in calls)
+    assert cache.get(cache.key(coordinates[0], 'walking'))[0] == {'distance': 2}
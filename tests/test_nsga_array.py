@@ -0,0 +1,125 @@
+import random
+
+import numpy as np
+import pytest
+
+from app import nsga_core
+from app.distance_matrix import LocationDistanceMatrix
+from app.nsga_array import ArrayEngine
+from app.nsga_eval import PopulationEvaluator
+
+required_cases = {
+    'none': [],
+    'two': [3, 17],
+    'full': [2, 5, 8, 11, 14, 20, 23, 26], #as many required stops as a route may hold
+}
+
+
+def make_engine(required_stops, seed, count=40):
+    rng = np.random.default_rng(seed)
+    locations_dict = {
+        loc_id: {
+            'name': f'Location {loc_id}',
+            'latitude': 51.5 + rng.uniform(-0.05, 0.05),
+            'longitude': -0.12 + rng.uniform(-0.08, 0.08),
+            'category_id': int(rng.integers(1, 7)),
+            'sentiment': float(rng.uniform(-1, 1)),
+        }
+        for loc_id in range(1, count + 1)
+    }
+    ids = list(locations_dict)
+    matrix = LocationDistanceMatrix(ids, [locations_dict[i]['latitude'] for i in ids], [locations_dict[i]['longitude'] for i in ids])
+    evaluator = PopulationEvaluator(locations_dict, [1, 2], matrix)
+    return ArrayEngine(evaluator, required_stops, rng=np.random.default_rng(seed))
+
+
+def routes_of(engine, pop): #Location-id lists of every row, checking the array invariants on the way
+    routes = []
+    for route, length, membership in zip(pop.routes, pop.lengths, pop.membership):
+        assert (route[:length] >= 0).all() and (route[length:] == -1).all() #stops first, then only padding
+        assert membership.sum() == length and membership[route[:length]].all()
+        routes.append(engine.location_ids[route[:length]].tolist())
+    return routes
+
+
+def assert_valid(routes, required_stops):
+    for route in routes:
+        assert len(set(route)) == len(route)
+        assert set(required_stops) <= set(route)
+        assert nsga_core.min_locations <= len(route) <= nsga_core.max_locations
+
+
+@pytest.mark.parametrize('case', required_cases)
+@pytest.mark.parametrize('seed', range(3))
+def test_operators_keep_routes_valid(case, seed):
+    required_stops = required_cases[case]
+    engine = make_engine(required_stops, seed)
+    pop = engine.initial_population(60)
+    assert_valid(routes_of(engine, pop), required_stops)
+    for _ in range(5):
+        engine.crossover(pop, 1.0)
+        engine.mutate(pop, 1.0)
+        engine.repair(pop)
+        assert_valid(routes_of(engine, pop), required_stops)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_crossover_matches_ox_crossover(monkeypatch, seed):
+    engine = make_engine([], seed)
+    pop = engine.initial_population(60)
+    parents = routes_of(engine, pop)
+    crossed = engine.crossover(pop, 1.0)
+    children = routes_of(engine, pop)
+    assert len(crossed) == 30
+    for row in crossed.tolist():
+        ind1, ind2 = parents[row], parents[row + 1]
+        shorter = len(ind1) if len(ind1) < len(ind2) else len(ind2)
+        expected = [] #every child the list operator can produce for this pair, one per slice
+        for lo in range(shorter):
+            for hi in range(lo + 1, shorter):
+                monkeypatch.setattr(nsga_core.random, 'sample', lambda population, k, lo=lo, hi=hi: [lo, hi])
+                child, _ = nsga_core.ox_crossover(list(ind1), list(ind2))
+                expected.append(child)
+        assert children[row] in expected
+        assert children[row + 1] == ind2
+
+
+@pytest.mark.parametrize('case', required_cases)
+def test_repair_matches_enforce_required_stops(case):
+    required_stops = required_cases[case]
+    engine = make_engine(required_stops, 0)
+    rng = random.Random(0)
+    routes = [rng.sample(range(1, 41), rng.randint(nsga_core.min_locations, nsga_core.max_locations)) for _ in range(50)]
+    pop = engine.from_routes(routes)
+    engine.repair(pop)
+    assert routes_of(engine, pop) == [nsga_core.enforce_required_stops(list(route), required_stops) for route in routes]
+
+
+@pytest.mark.parametrize('case', ['none', 'two'])
+def test_mutation_is_one_add_remove_or_swap(case):
+    required_stops = required_cases[case]
+    engine = make_engine(required_stops, 1)
+    pop = engine.initial_population(80)
+    before = routes_of(engine, pop)
+    engine.mutate(pop, 1.0)
+    for old, new in zip(before, routes_of(engine, pop)):
+        if len(new) == len(old) + 1: #add - one new stop at the end
+            assert new[:-1] == old and new[-1] not in old
+        elif len(new) == len(old) - 1: #remove - one optional stop dropped
+            assert any(new == old[:i] + old[i + 1:] and old[i] not in required_stops for i in range(len(old)))
+        else: #swap of one optional stop, or unchanged when nothing could be swapped in
+            changed = [i for i in range(len(old)) if old[i] != new[i]]
+            assert len(changed) <= 1
+            assert all(old[i] not in required_stops and new[i] not in old for i in changed)
+
+
+def test_generation_keeps_distinct_stop_sets():
+    engine = make_engine([3, 17], 0)
+    seed_route = [3, 17, 1, 2, 4]
+    pop = engine.initial_population(40, seeds=[seed_route] * 40) #a population that has already collapsed onto one route
+    engine.evaluate(pop)
+    pop = engine.generation(pop, 40, 0.9, 0.2)
+    routes = routes_of(engine, pop)
+    assert len(routes) == 40
+    assert len({frozenset(route) for route in routes}) == 40
+    assert_valid(routes, [3, 17])
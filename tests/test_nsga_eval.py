@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.distance_matrix import LocationDistanceMatrix
+from app.nsga_core import compute_distance, compute_satisfaction, creator, max_locations
+from app.nsga_eval import FitnessMemo, PopulationEvaluator
+
+
+def make_locations(seed, count=60):
+    rng = np.random.default_rng(seed)
+    locations_dict = {}
+    for loc_id in rng.choice(np.arange(1, 10 * count), count, replace=False).tolist(): #sparse, unordered ids
+        location = {'latitude': 51.5 + rng.uniform(-0.05, 0.05), 'longitude': -0.12 + rng.uniform(-0.08, 0.08), 'category_id': int(rng.integers(1, 7))}
+        if rng.random() < 0.9: #some locations have no feedback yet
+            location['sentiment'] = float(rng.uniform(-1, 1))
+        locations_dict[loc_id] = location
+    return locations_dict
+
+
+def random_routes(rng, location_ids, count):
+    routes = [rng.sample(location_ids, rng.randint(0, max_locations + 2)) for _ in range(count)]
+    return routes + routes[:count // 10] #repeats, which the memo answers
+
+
+@pytest.mark.parametrize('metric', ['haversine', 'degrees'])
+@pytest.mark.parametrize('memo', [False, True])
+@pytest.mark.parametrize('seed', range(2))
+def test_evaluator_matches_compute_distance_and_satisfaction(metric, memo, seed):
+    locations_dict = make_locations(seed)
+    ids = list(locations_dict)
+    distance_matrix = None
+    if metric == 'haversine':
+        distance_matrix = LocationDistanceMatrix(ids, [locations_dict[i]['latitude'] for i in ids], [locations_dict[i]['longitude'] for i in ids])
+    user_preferences = [1, 3]
+    evaluator = PopulationEvaluator(locations_dict, user_preferences, distance_matrix, memo=FitnessMemo(500) if memo else None)
+    routes = random_routes(random.Random(seed), ids, 1000)
+
+    for route, (distance, satisfaction) in zip(routes, evaluator.evaluate([creator.Individual(route) for route in routes])):
+        expected_distance = compute_distance(route, locations_dict, distance_matrix)
+        if np.isinf(expected_distance):
+            assert np.isinf(distance)
+        else:
+            assert distance == pytest.approx(expected_distance, rel=1e-9)
+        assert satisfaction == pytest.approx(compute_satisfaction(route, locations_dict, user_preferences), abs=1e-12)
+    assert evaluator.evaluations + evaluator.memo_hits == len(routes)
@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+
+from app import nsga_core
+from app.distance_matrix import LocationDistanceMatrix
+from app.nsga_islands import IslandContext, _evolve_island
+from app.spatial_index import SpatialIndex
+
+
+def island_task(context, seed):
+    rng = random.Random(seed)
+    population = [nsga_core.creator.Individual(nsga_core.enforce_required_stops(rng.sample(range(1, 31), 6), [3])) for _ in range(12)]
+    return {
+        'context': context.name,
+        'context_size': context.size,
+        'population': population,
+        'population_size': 12,
+        'generations': 3,
+        'seed': seed,
+        'crossover': 0.9,
+        'mutation': 0.3,
+    }
+
+
+def test_in_process_island_leaves_the_global_generator_alone():
+    rng = np.random.default_rng(0)
+    locations_dict = {
+        loc_id: {'name': f'Location {loc_id}', 'latitude': 51.5 + rng.uniform(-0.05, 0.05), 'longitude': -0.12 + rng.uniform(-0.08, 0.08),
+                 'category_id': int(rng.integers(1, 7)), 'sentiment': float(rng.uniform(-1, 1))}
+        for loc_id in range(1, 31)
+    }
+    ids = list(locations_dict)
+    latitudes = [locations_dict[i]['latitude'] for i in ids]
+    longitudes = [locations_dict[i]['longitude'] for i in ids]
+    context = IslandContext({
+        'locations_dict': locations_dict,
+        'user_preferences': [1, 2],
+        'required_stops': [3],
+        'distance_matrix': LocationDistanceMatrix(ids, latitudes, longitudes),
+        'spatial_index': SpatialIndex(ids, latitudes, longitudes),
+    })
+    try:
+        random.seed(1234)
+        state = random.getstate()
+        first = _evolve_island(island_task(context, 7))
+        assert random.getstate() == state #another request thread's draws are not disturbed
+        second = _evolve_island(island_task(context, 7))
+        assert [list(ind) for ind in first] == [list(ind) for ind in second] #the island seed alone fixes the result
+        assert all(3 in ind for ind in first)
+    finally:
+        context.close()
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+from deap import tools
+
+from app.nsga_core import creator
+from app.nsga_selection import first_front, sel_nsga2
+
+
+def make_population(rng, size, grid, duplicates=False): #Individuals on a distance / satisfaction grid - a coarse grid forces many tied objectives
+    pop = []
+    for _ in range(size):
+        ind = creator.Individual([0])
+        if duplicates and pop and rng.random() < 0.5:
+            ind.fitness.values = rng.choice(pop).fitness.values #identical fitness, distinct individual
+        else:
+            ind.fitness.values = (rng.randint(0, grid) * 37.5, rng.randint(0, grid) / grid)
+        pop.append(ind)
+    return pop
+
+
+populations = {
+    'random': dict(grid=10 ** 6),
+    'tied': dict(grid=3),
+    'duplicate': dict(grid=1000, duplicates=True),
+}
+
+
+@pytest.mark.parametrize('kind', populations)
+def test_sel_nsga2_matches_deap(kind):
+    rng = random.Random(kind)
+    for _ in range(100):
+        size = rng.randint(1, 300)
+        pop = make_population(rng, size, **populations[kind])
+        k = rng.randint(0, size + 5) #below, at and above the population size
+        assert [id(ind) for ind in sel_nsga2(pop, k)] == [id(ind) for ind in tools.selNSGA2(pop, k)]
+
+
+@pytest.mark.parametrize('kind', populations)
+def test_first_front_matches_deap(kind):
+    rng = random.Random(kind)
+    for _ in range(100):
+        pop = make_population(rng, rng.randint(1, 300), **populations[kind])
+        expected = tools.sortNondominated(pop, len(pop), first_front_only=True)[0]
+        assert [id(ind) for ind in first_front(pop)] == [id(ind) for ind in expected]
+
+
+def test_empty_population():
+    assert sel_nsga2([], 5) == []
+    assert first_front([]) == []
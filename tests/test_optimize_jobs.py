@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from app import app, route_cache
+from app.optimize_jobs import OptimizeJobManager
+
+
+class InFlightRun: #A single flight whose key is always being computed by another request
+    def do(self, key, fn):
+        return {'routes': [{'id': 'shared'}], 'run_info': {}}, True
+
+
+def test_streams_run_their_own_search_instead_of_joining_a_silent_one(monkeypatch):
+    def optimise(user_preferences, required_stops, travel_mode, run_info=None, on_generation=None, **kwargs):
+        individual = SimpleNamespace(fitness=SimpleNamespace(values=(1000.0, 2.0)))
+        for generation in (1, 2):
+            on_generation(generation, 2, [individual])
+        return [{'id': 'own'}]
+
+    monkeypatch.setattr(route_cache, 'get_optimized_routes', optimise)
+    monkeypatch.setattr(route_cache, 'get_route_cache', lambda: None)
+    monkeypatch.setattr(route_cache, 'get_single_flight', lambda: InFlightRun())
+    monkeypatch.setattr(route_cache, 'get_data_version', lambda: [1])
+    monkeypatch.setattr('app.optimize_jobs.get_data_version', lambda: [1])
+    monkeypatch.setattr('app.optimize_jobs.non_dominated', lambda pop: [])
+
+    manager = OptimizeJobManager(app)
+    with app.app_context():
+        job, events = manager.subscribe([1], [], 'walking')
+        kinds = []
+        while (item := events.get(timeout=10)) is not None:
+            kinds.append(item[0])
+        assert kinds == ['generation', 'generation', 'result']
+        assert job.result['routes'] == [{'id': 'own'}] and not job.result['optimization']['coalesced']
+
+        polled = manager.submit([1], [], 'walking') #polled jobs only need the outcome, so they still share
+        manager._executor.shutdown(wait=True)
+        assert polled.result['routes'] == [{'id': 'shared'}]
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from app.polyline import decode_polyline, encode_polyline, simplify_line
+
+google_example = '_p~iF~ps|U_ulLnnqC_mqNvxq`@' #from Google's encoded polyline format documentation
+
+
+def reference_decode(encoded, precision=5): #The character-by-character decoder the app used before, kept as the reference
+    index = lat = lng = 0
+    coordinates = []
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else (result >> 1))
+        lat += deltas[0]
+        lng += deltas[1]
+        coordinates.append([lng / 10 ** precision, lat / 10 ** precision])
+    return coordinates
+
+
+def random_line(seed, count=200):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.002, (count, 2)) * rng.choice([1, 50], (count, 1), p=[0.95, 0.05]) #mostly short steps, some long jumps
+    return (np.array([-0.12, 51.5]) + np.cumsum(steps, axis=0)).tolist()
+
+
+def test_google_example():
+    assert np.allclose(decode_polyline(google_example), [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]])
+    assert encode_polyline([[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]) == google_example
+
+
+@pytest.mark.parametrize('precision', [5, 6, 7])
+@pytest.mark.parametrize('seed', range(5))
+def test_round_trip_matches_reference_decoder(precision, seed):
+    coordinates = random_line(seed)
+    encoded = encode_polyline(coordinates, precision)
+    decoded = decode_polyline(encoded, precision)
+    assert decoded == reference_decode(encoded, precision)
+    assert np.abs(np.array(decoded) - coordinates).max() <= 0.5 / 10 ** precision + 1e-12
+
+
+def test_malformed_polylines_are_rejected():
+    with pytest.raises(ValueError):
+        decode_polyline(google_example[:-1]) #cut inside the last value
+    with pytest.raises(ValueError):
+        decode_polyline('_p~iF') #a latitude without its longitude
+
+
+@pytest.mark.parametrize('tolerance_m', [1, 10, 100])
+def test_simplification_keeps_the_endpoints(tolerance_m):
+    coordinates = random_line(0)
+    simplified = simplify_line(coordinates, tolerance_m)
+    assert 2 <= len(simplified) < len(coordinates)
+    assert simplified[0] == coordinates[0] and simplified[-1] == coordinates[-1]
+    assert all(point in coordinates for point in simplified) #a subset, in the original order
+    assert [coordinates.index(point) for point in simplified] == sorted(coordinates.index(point) for point in simplified)
+
+
+def test_zero_tolerance_and_short_lines_are_unchanged():
+    coordinates = random_line(1, 10)
+    assert simplify_line(coordinates, 0) == coordinates
+    assert simplify_line(coordinates[:2], 100) == coordinates[:2]
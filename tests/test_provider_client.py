@@ -0,0 +1,63 @@
+import pytest
+import requests
+
+from app import provider_client
+from app.provider_client import ProviderClient, ProviderUnavailable
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+
+def make_client(monkeypatch, outcomes, **kwargs): #Client whose session returns / raises the given outcomes in order
+    monkeypatch.setattr(provider_client, 'retry_backoff', 0)
+    client = ProviderClient('test', read_timeout=1, max_concurrency=2, **kwargs)
+
+    def fake_request(method, url, **kw):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+    client.session.request = fake_request
+    return client
+
+
+def test_unexpected_request_error_ends_half_open_trial(monkeypatch):
+    outcomes = [requests.exceptions.ChunkedEncodingError()]
+    client = make_client(monkeypatch, outcomes, failure_threshold=1, reset_after=0)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.get('https://example.invalid')
+    assert client.consecutive_failures == 1
+    outcomes[:] = [requests.exceptions.TooManyRedirects(), 200]
+    with pytest.raises(requests.exceptions.TooManyRedirects): #the half-open trial fails
+        client.get('https://example.invalid')
+    assert not client.trial_in_flight
+    assert client.get('https://example.invalid').status_code == 200 #a later trial is still let through
+    assert client.state() == 'closed'
+
+
+def test_open_circuit_fails_fast(monkeypatch):
+    outcomes = [requests.exceptions.ReadTimeout()]
+    client = make_client(monkeypatch, outcomes, failure_threshold=1, reset_after=60)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.get('https://example.invalid')
+    with pytest.raises(ProviderUnavailable):
+        client.get('https://example.invalid')
+    assert client.stats()['rejected'] == 1
+
+
+def test_retries_gateway_errors_and_ignores_client_errors(monkeypatch):
+    outcomes = [503, 502, 200]
+    client = make_client(monkeypatch, outcomes, retries=2, failure_threshold=1)
+    assert client.get('https://example.invalid').status_code == 200
+    assert client.retried == 2
+    outcomes[:] = [404]
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.get('https://example.invalid')
+    assert client.state() == 'closed'
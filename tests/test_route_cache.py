@@ -0,0 +1,35 @@
+from app import app, route_cache
+from app.population_cache import PopulationCache
+from app.route_cache import MemoryCacheBackend, get_cached_optimized_routes
+
+
+def test_warm_started_runs_are_not_cached_for_other_clients(monkeypatch):
+    runs = []
+
+    def optimise(user_preferences, required_stops, travel_mode, run_info=None, warm_start=None, generations=None, final_population=None, **kwargs):
+        runs.append({'preferences': list(user_preferences), 'warm_start': bool(warm_start), 'generations': generations})
+        if final_population is not None:
+            final_population.extend([[1, 2, 3, 4, 5], [2, 3, 4, 5, 6]])
+        return [{'id': 1, 'geometry': {'type': 'LineString'}, 'warm': bool(warm_start)}]
+
+    cache = MemoryCacheBackend(10, 60)
+    monkeypatch.setattr(route_cache, 'get_optimized_routes', optimise)
+    monkeypatch.setattr(route_cache, 'get_route_cache', lambda: cache)
+    monkeypatch.setattr(route_cache, 'get_population_cache', lambda population_cache=PopulationCache(10, 60, 2): population_cache)
+    monkeypatch.setattr(route_cache, 'get_data_version', lambda: [1])
+
+    with app.app_context():
+        get_cached_optimized_routes([1], client_token='client-a') #cold, leaves client-a's population behind
+        info = {}
+        warm = get_cached_optimized_routes([1, 2], client_token='client-a', run_info=info)
+        assert warm[0]['warm'] and info['cache'] == 'bypass' and not info['coalesced']
+        assert len(cache) == 1
+
+        info = {}
+        cold = get_cached_optimized_routes([1, 2], run_info=info)
+        assert not cold[0]['warm'] and info['cache'] == 'miss'
+        assert [run['warm_start'] for run in runs] == [False, True, False]
+
+        info = {}
+        get_cached_optimized_routes([1, 2], client_token='client-b', run_info=info)
+        assert info['cache'] == 'hit' #the cold result is shared with everyone
@@ -0,0 +1,61 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app import api, app
+from app.distance_matrix import LocationDistanceMatrix
+from app.route_order import exact_order, max_exact_stops
+
+
+def make_matrix(count, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = list(range(101, 101 + count))
+    return LocationDistanceMatrix(ids, 51.5 + rng.uniform(-0.05, 0.05, count), -0.12 + rng.uniform(-0.08, 0.08, count))
+
+
+def brute_force(location_ids, distance_matrix, start_id=None, end_id=None): #Shortest length over every permutation
+    lengths = [
+        distance_matrix.route_distance(list(order)) for order in itertools.permutations(location_ids)
+        if (start_id is None or order[0] == start_id) and (end_id is None or order[-1] == end_id)
+    ]
+    return min(lengths)
+
+
+@pytest.mark.parametrize('n', range(1, 8))
+@pytest.mark.parametrize('seed', range(3))
+def test_exact_order_matches_permutation_search(n, seed):
+    distance_matrix = make_matrix(20, seed)
+    location_ids = list(np.random.default_rng(seed).choice(distance_matrix.location_ids, n, replace=False).tolist())
+    fixed = [(None, None)] if n < 2 else [(None, None), (location_ids[0], None), (None, location_ids[-1]), (location_ids[-1], location_ids[0])]
+    for start_id, end_id in fixed:
+        ordered, length = exact_order(location_ids, distance_matrix, start_id, end_id)
+        assert sorted(ordered) == sorted(location_ids)
+        assert start_id is None or ordered[0] == start_id
+        assert end_id is None or ordered[-1] == end_id
+        if n > 1:
+            assert length == pytest.approx(distance_matrix.route_distance(ordered), rel=1e-5)
+            assert length == pytest.approx(brute_force(location_ids, distance_matrix, start_id, end_id), rel=1e-5)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, 'get_distance_matrix', lambda: make_matrix(max_exact_stops + 3))
+    monkeypatch.setattr(api, 'recalculate_route_geometry', lambda location_ids, travel_mode: None)
+    return app.test_client()
+
+
+def test_reorder_endpoint_rejects_too_many_stops(client):
+    location_ids = list(range(101, 101 + max_exact_stops + 1))
+    response = client.post('/api/v1/routes/reorder', json={'location_ids': location_ids})
+    assert response.status_code == 400
+    assert str(max_exact_stops) in response.get_json()['error']
+
+
+def test_reorder_endpoint_orders_the_largest_allowed_route(client):
+    location_ids = list(range(101, 101 + max_exact_stops))
+    response = client.post('/api/v1/routes/reorder', json={'location_ids': location_ids, 'start_id': 105})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['location_ids'][0] == 105 and sorted(body['location_ids']) == location_ids
+    assert body['straight_line_distance']['optimized'] <= body['straight_line_distance']['original']
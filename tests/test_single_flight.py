@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.single_flight import SingleFlight, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="cross-worker coalescing needs fcntl")
+
+
+def lock_files(lock_dir):
+    return [name for name in os.listdir(lock_dir) if name.endswith('.lock')]
+
+
+def test_lock_files_are_removed_after_each_call(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    for i in range(20):
+        assert flight.do(f'key-{i}', lambda i=i: i) == (i, False)
+    assert lock_files(tmp_path) == []
+
+
+def run_in_worker(lock_dir, runs_path, results):
+    def slow():
+        with open(runs_path, 'a') as f:
+            f.write('run\n')
+        time.sleep(0.5)
+        return {'routes': 3}
+    results.put(SingleFlight(lock_dir=lock_dir).do('same-key', slow))
+
+
+def test_workers_share_one_run_and_leave_no_lock_file(tmp_path):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    runs_path = str(tmp_path / 'runs.txt')
+    lock_dir = str(tmp_path / 'locks')
+    os.makedirs(lock_dir)
+    workers = [context.Process(target=run_in_worker, args=(lock_dir, runs_path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join()
+    with open(runs_path) as f:
+        assert f.read().count('run') == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    assert all(result == {'routes': 3} for result, _ in outcomes)
+    assert lock_files(lock_dir) == []
+
+
+def test_abandoned_lock_files_are_cleaned_up(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path), timeout=1, result_ttl=1)
+    stale = tmp_path / 'abandoned.lock'
+    stale.touch()
+    os.utime(stale, (time.time() - 60, time.time() - 60))
+    held = tmp_path / 'held.lock' #old, but a live worker still holds it
+    held.touch()
+    os.utime(held, (time.time() - 60, time.time() - 60))
+    with open(held, 'a') as held_file:
+        fcntl.flock(held_file, fcntl.LOCK_EX)
+        flight.do('other-key', lambda: 1)
+        assert lock_files(tmp_path) == ['held.lock']
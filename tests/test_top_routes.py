@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+import pytest
+
+from app import app, nsga_core
+from app.distance_matrix import LocationDistanceMatrix
+from app.nsga_core import creator, pick_top_routes
+from app.pareto_archive import ParetoArchive
+
+
+def individual(route, distance, satisfaction):
+    ind = creator.Individual(route)
+    ind.fitness.values = (distance, satisfaction)
+    return ind
+
+
+def grid_matrix(count):
+    ids = list(range(1, count + 1))
+    return LocationDistanceMatrix(ids, [51.5 + (i % 4) * 0.01 for i in ids], [-0.1 + (i // 4) * 0.01 for i in ids])
+
+
+def test_pick_top_routes_skips_duplicates_and_reorderings():
+    front = [individual([1, 2, 3, 4, 5], 100, 0.9)]
+    pop = [
+        individual([1, 2, 3, 4, 5], 100, 0.9),
+        individual([5, 4, 3, 2, 1], 110, 0.9), #same stops, another order
+        individual([1, 2, 3, 4, 6], 120, 0.8),
+        individual([1, 2, 3, 4, 6], 120, 0.8),
+        individual([1, 2, 3, 4, 7], 130, 0.7),
+    ]
+    routes = pick_top_routes(front, pop, [], grid_matrix(8))
+    assert [sorted(route) for route in routes] == [[1, 2, 3, 4, 5], [1, 2, 3, 4, 6], [1, 2, 3, 4, 7]]
+
+
+def test_pick_top_routes_requires_required_stops():
+    pop = [individual([1, 2, 3, 4, 5], 100, 0.9), individual([1, 2, 3, 4, 8], 90, 0.95)]
+    routes = pick_top_routes(pop, pop, [5], grid_matrix(8))
+    assert [sorted(route) for route in routes] == [[1, 2, 3, 4, 5]]
+
+
+def test_archive_rejects_routes_without_required_stops():
+    archive = ParetoArchive(max_size=10, required_stops=[7])
+    assert not archive.insert([1, 2, 3], 10.0, 1.0)
+    assert archive.insert([1, 7, 3], 20.0, 0.5)
+    assert len(archive) == 1
+
+
+@pytest.mark.parametrize('preferences', [[1], [4]])
+@pytest.mark.parametrize('seed', range(4))
+def test_optimized_routes_returns_three_distinct_routes(monkeypatch, preferences, seed):
+    monkeypatch.setattr(nsga_core, 'get_route_data', lambda coordinates, travel_mode='walking': {}) #no routing provider in tests
+    random.seed(seed)
+    np.random.seed(seed)
+    with app.app_context():
+        routes = nsga_core.get_optimized_routes(preferences)
+    assert len(routes) == 3
+    assert len({frozenset(loc['id'] for loc in route['locations']) for route in routes}) == 3